@@ -0,0 +1,192 @@
+"""Headless batch mode for the Cybersecurity Advisor.
+
+Reads JSON lines such as ``{"id": "q1", "prompt": "What is phishing?"}`` or
+``{"id": "s1", "image": "capture.png"}`` and writes one JSON result per line
+in completion order.  Requests run with bounded concurrency under request
+and token rate caps; ``--resume`` skips ids already answered in the output file.
+Duplicate prompts or images in flight at the same time share one request.
+
+    python advisor_cli.py prompts.jsonl -o results.jsonl --concurrency 4 --rate 2
+"""
+
+import argparse
+import base64
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import http_pool
+import tracing
+from advisor_core import (
+    GeminiClient,
+    load_api_key,
+    local_answer,
+    short_summary_complete,
+    summarize_response_short,
+)
+from image_prep import CaptureProcessor
+from response_cache import normalize_prompt
+from single_flight import SingleFlight, flight_key
+
+
+def read_jobs(stream):
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield {"id": str(lineno), "error": f"invalid JSON: {exc}"}
+            continue
+        if isinstance(job, str):
+            job = {"prompt": job}
+        elif not isinstance(job, dict):
+            yield {"id": str(lineno), "error": f"line {lineno}: expected an object or a string"}
+            continue
+        job.setdefault("id", str(lineno))
+        job["id"] = str(job["id"])
+        yield job
+
+
+def completed_ids(path) -> set:
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written last line from an interrupted run
+                if "error" not in result:
+                    done.add(str(result.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class BatchRunner:
+    def __init__(self, client: GeminiClient, complex_mode=False, rate: float = 0.0, tpm: float = 0.0, processor=None):
+        self.client = client
+        self.complex_mode = complex_mode
+        # A bucket of one refilled at ``rate`` spaces request starts 1 / rate apart.
+        # Without --rate/--tpm the limits configured in the environment stay as they are
+        if rate > 0 or tpm > 0:
+            for backend in client.router.backends:
+                backend.limiter.configure(rpm=rate * 60.0 if rate > 0 else None, tpm=tpm or None, burst=1)
+        self.processor = processor or CaptureProcessor()
+        self.flights = SingleFlight()
+
+    def run_job(self, job: dict) -> dict:
+        result = {"id": job["id"]}
+        if "error" in job:
+            result["error"] = job["error"]
+            return result
+        started = time.perf_counter()
+        try:
+            answer = None if self.complex_mode or "image" in job else local_answer(job["prompt"])
+            if answer is not None:
+                # Glossary definitions and local indicator verdicts need no request,
+                # so they skip the rate cap too
+                result.update(kind="text", response=answer, summary=answer, local=True, elapsed=0.0)
+                return result
+            # Short mode only keeps two sentences, so stop the stream once they are in
+            options = {} if self.complex_mode else {"stream": True, "stop_when": short_summary_complete}
+            if "image" in job:
+                result["kind"] = "image"
+                with open(job["image"], "rb") as fh:
+                    raw = fh.read()
+                key = flight_key("image", raw, self.complex_mode)
+                request = lambda: self.client.analyze_image(
+                    base64.b64encode(raw).decode("ascii"), processor=self.processor, **options
+                )
+            else:
+                result["kind"] = "text"
+                key = flight_key("text", normalize_prompt(job["prompt"]), self.complex_mode)
+                request = lambda: self.client.query_text(job["prompt"], **options)
+            # Jobs that join an identical in-flight request skip the rate cap too
+            text, shared = self.flights.do(key, request)
+            if shared:
+                result["shared"] = True
+            result["response"] = text
+            if self.complex_mode and result["kind"] == "text":
+                result["summary"] = text.strip()
+            else:
+                result["summary"] = summarize_response_short(text)
+        except Exception as exc:
+            result["error"] = str(exc)
+        result["elapsed"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def run(self, jobs, out, concurrency: int = 4, skip=frozenset()) -> dict:
+        counts = {"ok": 0, "error": 0, "skipped": 0}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = set()
+            for job in jobs:
+                if job["id"] in skip:
+                    counts["skipped"] += 1
+                    continue
+                # Keep at most 2x concurrency jobs in memory for very large inputs
+                while len(pending) >= 2 * concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._write(done, out, counts)
+                pending.add(pool.submit(self.run_job, job))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self._write(done, out, counts)
+        return counts
+
+    @staticmethod
+    def _write(done, out, counts):
+        for future in done:
+            result = future.result()
+            counts["error" if "error" in result else "ok"] += 1
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run advisor prompts and screenshots in batch.")
+    parser.add_argument("input", help="JSONL file of prompts/images, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-r", "--rate", type=float, default=0.0, help="max requests per second (0 = no cap)")
+    parser.add_argument("--tpm", type=float, default=0.0, help="max input tokens per minute (0 = no cap)")
+    parser.add_argument("--complex", action="store_true", help="return full answers instead of short summaries")
+    parser.add_argument("--resume", action="store_true", help="skip ids already answered in --output")
+    parser.add_argument("--api-key", default=None, help="defaults to GEMINI_API_KEY or api_key.txt")
+    parser.add_argument("--trace-jsonl", default=None, help="append per-request spans to this JSON-lines file")
+    parser.add_argument("--trace-prom", default=None, help="write span percentiles to this Prometheus textfile")
+    args = parser.parse_args(argv)
+
+    api_key = args.api_key or load_api_key()
+    if not api_key:
+        parser.error("no API key: set GEMINI_API_KEY or pass --api-key")
+    if args.resume and args.output == "-":
+        parser.error("--resume needs --output")
+
+    tracing.configure(jsonl_path=args.trace_jsonl, prom_path=args.trace_prom)
+    http_pool.configure(pool_size=max(args.concurrency, 1))
+    skip = completed_ids(args.output) if args.resume else frozenset()
+    runner = BatchRunner(GeminiClient(api_key), complex_mode=args.complex, rate=args.rate, tpm=args.tpm)
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "a" if args.resume else "w", encoding="utf-8")
+    try:
+        counts = runner.run(read_jobs(src), out, concurrency=max(args.concurrency, 1), skip=skip)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+        tracing.tracer.shutdown()
+    print(
+        f"{counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped",
+        file=sys.stderr,
+    )
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
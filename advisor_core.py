@@ -0,0 +1,329 @@
+"""GUI-free advisor logic shared by the desktop app and the batch CLI.
+
+Nothing in here imports PySide6: prompts, payload construction, the Gemini
+client and the response post-processing all live here so they can run in
+scripts and pipelines.  The backends, glossary and indicator rules load on
+first use, keeping them off the desktop app's startup path.
+"""
+
+import os
+import pathlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from scheduler import PRIORITY_INTERACTIVE, RequestCancelled, RetryPolicy
+
+###############################################################################
+# ────────────────────────────── CONFIG ───────────────────────────────────── #
+###############################################################################
+
+API_KEY_ENV = "GEMINI_API_KEY"
+API_KEY_FILE = pathlib.Path("api_key.txt")
+MODEL_NAME = "gemini-2.0-flash"
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 1024,
+}
+TEXT_PROMPT_PREFIX = "You are a cybersecurity expert advisor. Explain in plain language: "
+IMAGE_PROMPT = (
+    "As a cybersecurity expert, analyze this screenshot for threats and "
+    "explain findings in simple terms."
+)
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a user and a cybersecurity advisor in a few short "
+    "sentences. Keep the user's situation, the threats discussed and the advice given; "
+    "drop greetings and repetition.\n\n"
+)
+WATCH_PROMPT = (
+    "As a cybersecurity expert, these images are the parts of a window that just changed. "
+    "Check them for threats such as phishing pages, fake login forms or suspicious links "
+    "and explain findings in simple terms."
+)
+TILE_PROMPT = (
+    "As a cybersecurity expert, check this image for threats such as phishing pages, fake "
+    "login forms, suspicious links or scam messages. It is part {index} of {count} of a "
+    "larger window. Reply with one short plain-language sentence per threat, one per line, "
+    "quoting any suspicious address. If there is none, reply exactly: NO THREATS"
+)
+NO_THREATS_VERDICT = "I didn't spot any threats in this window."
+TILE_FAILED_NOTE = "Part of the window could not be checked, so scan it again to be sure."
+TILE_WORKERS = 4  # Tile requests in flight at once, shared by all scans
+
+
+def load_api_key() -> str:
+    key = os.getenv(API_KEY_ENV, "").strip()
+    if key:
+        return key
+    if API_KEY_FILE.exists():
+        try:
+            return API_KEY_FILE.read_text().strip()
+        except Exception:
+            pass
+    return ""
+
+###############################################################################
+# ───────────────────────────── GEMINI CLIENT ─────────────────────────────── #
+###############################################################################
+
+def build_text_payload(prompt: str, history=None) -> dict:
+    """``history`` is a list of earlier Gemini ``contents`` entries, oldest first."""
+    return {
+        "contents": [
+            *(history or []),
+            {"role": "user", "parts": [{"text": TEXT_PROMPT_PREFIX + prompt}]},
+        ],
+        "generationConfig": dict(GENERATION_CONFIG),
+    }
+
+
+def build_image_payload(data: str, mime_type: str = "image/png") -> dict:
+    return build_images_payload([(data, mime_type)])
+
+
+def build_images_payload(images, prompt: str = IMAGE_PROMPT) -> dict:
+    """``images`` is a list of (base64 data, mime_type) pairs."""
+    parts = [{"text": prompt}]
+    parts += [{"inline_data": {"mime_type": mime, "data": data}} for data, mime in images]
+    return {
+        "contents": [{"parts": parts}],
+        "generationConfig": dict(GENERATION_CONFIG),
+    }
+
+
+_tile_pool = None
+_tile_pool_lock = threading.Lock()
+
+
+def _tile_executor() -> ThreadPoolExecutor:
+    global _tile_pool
+    with _tile_pool_lock:
+        if _tile_pool is None:
+            _tile_pool = ThreadPoolExecutor(max_workers=TILE_WORKERS, thread_name_prefix="tile")
+        return _tile_pool
+
+
+class GeminiClient:
+    """Builds advisor requests; its ``router`` decides which backend answers them."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = MODEL_NAME,
+        retry_policy: RetryPolicy = None,
+        router=None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.retry_policy = retry_policy or RetryPolicy()
+        if router is None:
+            from backends import get_router
+
+            router = get_router(api_key, model)
+        self.router = router
+        self.priority = priority  # Admission order when the rate limiter is queueing
+
+    def generate(self, payload: dict, stream=False, on_partial=None, stop_when=None, cancelled=None) -> str:
+        """Run one request and return the reply text.
+
+        When streaming, ``on_partial`` receives the accumulated text after each
+        chunk and ``stop_when(text)`` returning True ends the stream early.
+        """
+        return self.router.generate(
+            payload,
+            stream=stream,
+            on_partial=on_partial,
+            stop_when=stop_when,
+            cancelled=cancelled,
+            retry_policy=self.retry_policy,
+            priority=self.priority,
+        )
+
+    def query_text(self, prompt: str, history=None, **kwargs) -> str:
+        from indicators import default_engine
+
+        # Anything the local indicator checks noticed goes along with the question
+        prompt += default_engine().assess(prompt).notes()
+        return self.generate(build_text_payload(prompt, history), **kwargs)
+
+    def summarize_history(self, summary: str, turns) -> str:
+        """Rolling summary of ``summary`` plus the conversation ``turns``."""
+        lines = [f"Earlier summary: {summary}"] if summary else []
+        for turn in turns:
+            lines += [f"User: {turn.user}", f"Advisor: {turn.model}"]
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": SUMMARY_PROMPT + "\n".join(lines)}]}],
+            "generationConfig": dict(GENERATION_CONFIG, maxOutputTokens=256),
+        }
+        return self.generate(payload)
+
+    def analyze_image(self, data: str, mime_type: str = "image/png", processor=None, **kwargs) -> str:
+        frame = None
+        if processor is not None:
+            from image_prep import open_b64
+            from tiling import needs_tiling
+
+            image = open_b64(data)
+            if needs_tiling(image.size, processor.max_size):
+                return self.analyze_tiles(image, processor, **kwargs)
+            frame = processor.process_image(image, original=data)
+            cached = processor.lookup(frame, IMAGE_PROMPT)
+            if cached is not None:
+                return cached
+            data, mime_type = frame.data, frame.mime_type
+        text = self.generate(build_image_payload(data, mime_type), **kwargs)
+        if frame is not None:
+            processor.remember(frame, text, IMAGE_PROMPT)
+        return text
+
+    def analyze_changes(self, data: str, differ, processor=None, **kwargs):
+        """Analyze only what changed since the last frame analyzed with ``differ``.
+
+        Returns None without any request when the change is not significant;
+        when the analysis fails, ``differ`` keeps its previous baseline.
+        """
+        from image_prep import CaptureProcessor, open_b64
+
+        image = open_b64(data)
+        change = differ.update(image)
+        if not change.significant:
+            return None
+        try:
+            return self._analyze_change(image, data, change, processor or CaptureProcessor(), **kwargs)
+        except Exception:
+            differ.rollback()  # Compare the next frame with the last one analyzed
+            raise
+
+    def _analyze_change(self, image, data, change, processor, **kwargs):
+        from image_prep import content_key
+        from tiling import needs_tiling
+
+        if change.full_frame and needs_tiling(image.size, processor.max_size):
+            return self.analyze_tiles(image, processor, **kwargs)
+        if change.full_frame:
+            frames = [processor.process_image(image, original=data)]
+        else:
+            frames = [processor.process_image(image.crop(box)) for box in change.regions]
+        prompt = IMAGE_PROMPT if change.full_frame else WATCH_PROMPT
+        key = content_key(frames, prompt)
+        cached = processor.lookup_key(key)
+        if cached is not None:
+            return cached
+        payload = build_images_payload([(f.data, f.mime_type) for f in frames], prompt)
+        text = self.generate(payload, **kwargs)
+        processor.remember_key(key, text)
+        return text
+
+    def analyze_tiles(self, image, processor, cancelled=None, **_streaming) -> str:
+        """Analyze an oversized capture as overlapping tiles in parallel and
+        merge the per-tile findings into one verdict.
+
+        Tile replies are short lists, so they are requested whole rather than
+        streamed; wall time is about ``ceil(tiles / TILE_WORKERS)`` requests.
+        Each tile's reply is remembered on its own, so when only part of the
+        screen changed, only the tiles that changed are sent again.
+        """
+        from tiling import merge_findings, plan_tiles
+
+        cancelled = cancelled or threading.Event()
+        boxes = plan_tiles(image.size, processor.max_size)
+
+        def analyze(index, box):
+            if cancelled.is_set():
+                raise RequestCancelled()
+            # Cropping and encoding run here too, so they overlap other tiles' requests
+            frame = processor.process_image(image.crop(box))
+            prompt = TILE_PROMPT.format(index=index, count=len(boxes))
+            reply = processor.lookup(frame, prompt)
+            if reply is None:
+                reply = self.generate(build_images_payload([(frame.data, frame.mime_type)], prompt), cancelled=cancelled)
+                processor.remember(frame, reply, prompt)
+            return reply
+
+        with tracing.span("capture.tiled"):
+            futures = [_tile_executor().submit(analyze, i, box) for i, box in enumerate(boxes, 1)]
+            replies, errors = [], []
+            for future in futures:
+                try:
+                    replies.append(future.result())
+                except Exception as exc:
+                    errors.append(exc)
+        if cancelled.is_set():
+            raise RequestCancelled()
+        if not replies:
+            raise errors[0]
+        findings = merge_findings(replies)
+        sentences = [f if f.endswith((".", "!", "?")) else f + "." for f in findings]
+        if errors:
+            sentences.append(TILE_FAILED_NOTE)
+        return " ".join(sentences) or NO_THREATS_VERDICT
+
+###############################################################################
+# ─────────────────────────── POST-PROCESSING ─────────────────────────────── #
+###############################################################################
+
+_FILLER_RE = re.compile(
+    r"(Stay safe!|Let me know if you have more questions!|Hope that helps!|Think of it like this:)",
+    re.I,
+)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?]) +")
+_TTS_MARKUP_RE = re.compile(r"[\*_`~\[\]#>-]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_DEFINED_AFTER = (":", " is ", " are ", " means ", " refers to ", " stands for ")
+
+
+def _already_explained(summary: str, match) -> bool:
+    folded = summary.lower()
+    if match.entry.definition.lower() in folded:
+        return True
+    surface = summary[match.start:match.end].lower()
+    return any(surface + sep in folded for sep in _DEFINED_AFTER)
+
+
+def short_summary_complete(text: str) -> bool:
+    # True once the first two sentences summarize_response_short keeps are final
+    text = _FILLER_RE.sub("", text)
+    return len(_SENTENCE_SPLIT_RE.split(text.strip())) > 2
+
+
+def summarize_response_short(text: str) -> str:
+    # Short, clear, easy-to-understand summary (1-2 sentences, no ...)
+    # Remove playful endings
+    text = _FILLER_RE.sub("", text)
+    # Get first 1-2 sentences, no ...
+    sentences = _SENTENCE_SPLIT_RE.split(text.strip())
+    summary = " ".join(sentences[:2]).strip()
+    # Append the first glossary term found that the summary doesn't already
+    # explain; everyday words like "risk" are left alone
+    from glossary import default_glossary
+
+    for match in default_glossary().find(summary):
+        if not match.entry.common and not _already_explained(summary, match):
+            summary = summary.rstrip('.') + ". " + match.entry.explanation()
+            break
+    return summary.strip()
+
+
+def local_answer(prompt: str):
+    """Glossary definition for simple "what is X?" prompts, or a verdict on a pasted
+    link, sender or file hash the local indicator checks are sure about; None otherwise."""
+    from glossary import default_glossary
+    from indicators import default_engine
+
+    answer = default_glossary().answer(prompt)
+    if answer is None:
+        answer = default_engine().assess(prompt).answer()
+    return answer
+
+
+def clean_for_tts(text: str) -> str:
+    # Remove markdown formatting and extra whitespace
+    text = _TTS_MARKUP_RE.sub('', text)  # Remove markdown chars
+    text = _WHITESPACE_RE.sub(' ', text)  # Collapse whitespace
+    text = text.replace('•', 'bullet point').replace('-', ' ')  # Make lists clearer
+    return text.strip()
@@ -0,0 +1,436 @@
+"""HTTP service mode for the Cybersecurity Advisor.
+
+Serves many users from one asyncio process instead of one desktop app each.
+All sessions share one connection pool, response cache and set of
+rate-limited backends, so a prompt answered for one user is free for the next
+and the quota is paced for the whole service; recent scan verdicts are kept
+per session.  Model calls are blocking and run on a bounded thread pool; the
+event loop only parses, streams and looks things up.
+
+    python advisor_service.py --port 8080 --workers 64
+
+    POST /v1/session                    {"session": "<id>"}, a new conversation
+    POST /v1/chat   {"prompt": "...", "session": "<id>", "complex": false, "stream": false}
+    POST /v1/scan   an image/* body (``?session=<id>&stream=1``) or {"image": "<base64>", ...}
+    GET  /healthz   backends, rate limits, cache and session counts
+
+Session ids are issued by the server and expire after an hour idle; requests
+without one are answered without history.
+
+Streaming replies are server-sent events: ``delta`` events carrying new text,
+then one ``done`` event with the same JSON a plain request returns, or
+``error``.  Set ``CYBERGUARD_SERVICE_TOKEN`` to require it as a Bearer token.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from aiohttp import web
+from PIL import Image
+
+import http_pool
+import tracing
+from advisor_core import (
+    GENERATION_CONFIG,
+    MODEL_NAME,
+    GeminiClient,
+    load_api_key,
+    local_answer,
+    short_summary_complete,
+    summarize_response_short,
+)
+from conversation import Conversation
+from http_pool import Base64Blob
+from image_prep import CaptureProcessor
+from response_cache import ResponseCache, cache_key
+from scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestCancelled
+from single_flight import SingleFlight, flight_key
+
+SERVICE_TOKEN = os.getenv("CYBERGUARD_SERVICE_TOKEN")  # Required as a Bearer token when set
+DEFAULT_WORKERS = 64  # Model calls in flight at once; also the connection pool size
+CACHE_WORKERS = 4  # Response cache lookups in flight at once
+RESPONSE_CACHE_FILE = os.getenv("CYBERGUARD_SERVICE_CACHE", "service_cache.sqlite3")
+RESPONSE_CACHE_SIZE = 4096  # Entries kept in memory; the SQLite store keeps more
+RESPONSE_CACHE_TTL = float(os.getenv("CYBERGUARD_CACHE_TTL", str(7 * 24 * 3600)))
+HISTORY_TOKEN_BUDGET = int(os.getenv("CYBERGUARD_HISTORY_TOKENS", "3000"))  # Per request
+HISTORY_RECENT_TURNS = 4
+SESSION_LIMIT = 10000  # Conversations kept; the least recently used go first
+SESSION_TTL = 3600.0  # Seconds of inactivity after which a conversation is dropped
+MAX_BODY = 20 * 1024 * 1024  # Largest request body, room for a 4K PNG as base64
+
+
+###############################################################################
+# ──────────────────────────────── SESSIONS ───────────────────────────────── #
+###############################################################################
+
+@dataclass
+class Session:
+    conversation: Conversation
+    processor: CaptureProcessor  # Its recent scan verdicts are this session's alone
+    used: float
+
+
+class Sessions:
+    """Conversation history and scan verdicts per session, bounded by count
+    and idle time.  Ids are random and issued by ``create``, never taken from
+    a client, so nobody can pick up a session by guessing its name.
+
+    Only touched from the event loop, so it needs no lock of its own.
+    """
+
+    def __init__(self, summarize=None, limit: int = SESSION_LIMIT, ttl: float = SESSION_TTL):
+        self.summarize = summarize
+        self.limit = limit
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # id -> Session, least recently used first
+
+    def create(self) -> str:
+        conversation = Conversation(HISTORY_TOKEN_BUDGET, HISTORY_RECENT_TURNS, summarize=self.summarize)
+        # A fresh id is one attempt in 2**192, so it can be no other user's
+        session_id = secrets.token_urlsafe(24)
+        self._sessions[session_id] = Session(conversation, CaptureProcessor(), time.monotonic())
+        self._expire()
+        return session_id
+
+    def get(self, session_id):
+        """The session for ``session_id``, or None when it is unknown or expired."""
+        self._expire()
+        session = self._sessions.get(session_id) if isinstance(session_id, str) else None
+        if session is not None:
+            session.used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._sessions and (
+            len(self._sessions) > self.limit or now - next(iter(self._sessions.values())).used > self.ttl
+        ):
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+###############################################################################
+# ──────────────────────────────── SERVICE ────────────────────────────────── #
+###############################################################################
+
+class AdvisorService:
+    def __init__(self, api_key: str, workers: int = DEFAULT_WORKERS, cache=None):
+        self.api_key = api_key
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="advisor")
+        # Cache lookups get their own threads so a hit never queues behind model calls
+        self.cache_executor = ThreadPoolExecutor(max_workers=CACHE_WORKERS, thread_name_prefix="advisor-cache")
+        self.cache = cache or ResponseCache(
+            RESPONSE_CACHE_FILE, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL
+        )
+        self.flights = SingleFlight()
+        self.sessions = Sessions(summarize=self._summarize_history)
+        self.router = GeminiClient(api_key).router
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.cache_executor.shutdown(wait=True)
+        self.cache.close()
+
+    # --- Handlers ---------------------------------------------------------- #
+    async def new_session(self, request):
+        return web.json_response({"session": self.sessions.create()})
+
+    async def chat(self, request):
+        body = await _json_body(request)
+        prompt = str(body.get("prompt") or "").strip()
+        if not prompt:
+            return _error("prompt is required", 400)
+        complex_mode = bool(body.get("complex"))
+        session = self._session(body)
+        conversation = session.conversation if session is not None else None
+        history = conversation.contents() if conversation is not None else None
+
+        def finish(text, **extra):
+            self._remember(conversation, prompt, text)
+            return _result(text, complex_mode, **extra)
+
+        answer = None if complex_mode else local_answer(prompt)
+        if answer is not None:
+            # Glossary definitions and local indicator verdicts skip the quota too
+            self._remember(conversation, prompt, answer)
+            return await self._reply(request, body, dict(response=answer, summary=answer, local=True))
+        key = cache_key(prompt, MODEL_NAME, GENERATION_CONFIG, complex_mode, history)
+        # A disk hit also records the entry's use (an UPDATE and a commit), so
+        # even the lookup stays off the event loop
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(self.cache_executor, self.cache.get, key)
+        if cached is not None:
+            return await self._reply(request, body, finish(cached, cached=True))
+
+        client = GeminiClient(self.api_key, priority=PRIORITY_INTERACTIVE)
+        # Short mode only keeps two sentences, so stop the stream once they are in
+        stop_when = None if complex_mode else short_summary_complete
+
+        def run(on_partial=None, cancelled=None):
+            text = client.query_text(
+                prompt, history=history, stream=True, on_partial=on_partial, stop_when=stop_when, cancelled=cancelled
+            )
+            self.cache.put(key, text)
+            return text
+
+        return await self._answer(request, body, key, run, finish)
+
+    async def scan(self, request):
+        if request.content_type.startswith("image/"):
+            options = request.query
+            raw = await request.read()
+            # Kept as bytes: base64 is only produced as the request body streams out
+            image = Base64Blob(raw) if raw else None
+        else:
+            options = await _json_body(request)
+            raw = _decode_image(options.get("image"))
+            image = Base64Blob(raw) if raw else None
+        if not image:
+            return _error("an image body or base64 'image' field is required", 400)
+        if not _is_image(raw):
+            return _error("the image is not in a format that can be read", 400)
+        session = self._session(options)
+        conversation = session.conversation if session is not None else None
+        # Verdicts are only reused within a session; identical scans in flight
+        # at once still share one call
+        processor = session.processor if session is not None else CaptureProcessor()
+        key = flight_key("scan", raw, MODEL_NAME)
+        client = GeminiClient(self.api_key, priority=PRIORITY_BACKGROUND)
+
+        def run(on_partial=None, cancelled=None):
+            return client.analyze_image(
+                image,
+                processor=processor,
+                stream=True,
+                on_partial=on_partial,
+                stop_when=short_summary_complete,
+                cancelled=cancelled,
+            )
+
+        def finish(text, **extra):
+            summary = summarize_response_short(text)
+            # The screenshot itself never enters the history, only the verdict
+            if conversation is not None:
+                conversation.add_scan(summary)
+                self._compact_later(conversation)
+            return dict(response=text, summary=summary, **extra)
+
+        return await self._answer(request, options, key, run, finish)
+
+    async def health(self, request):
+        return web.json_response(
+            {
+                "backends": self.router.snapshot(),
+                "cache": self.cache.stats(),
+                "sessions": len(self.sessions),
+                "in_flight": len(self.flights),
+                "shared": self.flights.shared,
+            }
+        )
+
+    # --- Request plumbing -------------------------------------------------- #
+    def _session(self, options):
+        session_id = options.get("session")
+        if not session_id:
+            return None  # A one-off request without history
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise web.HTTPNotFound(
+                text=json.dumps({"error": "unknown or expired session; create one with POST /v1/session"}),
+                content_type="application/json",
+            )
+        return session
+
+    async def _answer(self, request, options, key, run, finish):
+        if _flag(options.get("stream")):
+            return await self._stream(request, run, finish)
+        loop = asyncio.get_running_loop()
+        try:
+            # Identical requests in flight share one call.  It is not cancelled
+            # when a caller disconnects: others may be waiting, and the reply
+            # still lands in the cache.
+            text, shared = await loop.run_in_executor(self.executor, self.flights.do, key, run)
+        except Exception as exc:
+            return _error(str(exc), 502)
+        extra = {"shared": True} if shared else {}
+        return web.json_response(finish(text, **extra))
+
+    async def _stream(self, request, run, finish):
+        loop = asyncio.get_running_loop()
+        partials = asyncio.Queue()
+        cancelled = threading.Event()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        def on_partial(text):
+            loop.call_soon_threadsafe(partials.put_nowait, text)
+
+        def landed(future):
+            if not future.cancelled():
+                future.exception()  # Retrieved here too, in case the client left first
+            # Scheduled after every partial the call emitted, so it always comes last
+            partials.put_nowait(None)
+
+        future = loop.run_in_executor(self.executor, run, on_partial, cancelled)
+        future.add_done_callback(landed)
+        sent = ""
+        try:
+            while (text := await partials.get()) is not None:
+                if text.startswith(sent) and len(text) > len(sent):
+                    await _send_event(response, "delta", {"text": text[len(sent):]})
+                    sent = text
+            try:
+                result = finish(future.result())
+            except RequestCancelled:
+                return response
+            except Exception as exc:
+                await _send_event(response, "error", {"error": str(exc)})
+            else:
+                await _send_event(response, "done", result)
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # Client went away; the finally below stops the request
+        finally:
+            cancelled.set()
+        return response
+
+    async def _reply(self, request, options, result):
+        if not _flag(options.get("stream")):
+            return web.json_response(result)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        await _send_event(response, "done", result)
+        await response.write_eof()
+        return response
+
+    def _remember(self, conversation, prompt, reply):
+        if conversation is not None:
+            conversation.add_turn(prompt, reply)
+            self._compact_later(conversation)
+
+    def _compact_later(self, conversation):
+        if conversation.needs_compaction():
+            self.executor.submit(conversation.compact)
+
+    def _summarize_history(self, summary, turns):
+        # Runs on an executor thread from Conversation.compact
+        return GeminiClient(self.api_key, priority=PRIORITY_BACKGROUND).summarize_history(summary, turns)
+
+
+def _result(text, complex_mode, **extra) -> dict:
+    summary = text.strip() if complex_mode else summarize_response_short(text)
+    return dict(response=text, summary=summary, **extra)
+
+
+def _decode_image(value):
+    """The bytes of a base64 ``image`` field, or None when it is not valid base64."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return base64.b64decode("".join(value.split()), validate=True)
+    except ValueError:
+        return None
+
+
+def _is_image(raw: bytes) -> bool:
+    try:
+        with Image.open(io.BytesIO(raw)):
+            return True  # Only the header is read here
+    except Exception:
+        return False
+
+
+def _flag(value) -> bool:
+    return value is True or str(value).lower() in ("1", "true", "yes")
+
+
+def _error(message: str, status: int):
+    return web.json_response({"error": message}, status=status)
+
+
+async def _json_body(request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "invalid JSON"}), content_type="application/json")
+    if isinstance(body, str):
+        body = {"prompt": body}
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "expected a JSON object"}), content_type="application/json")
+    return body
+
+
+async def _send_event(response, event: str, data: dict):
+    await response.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+
+###############################################################################
+# ─────────────────────────────────── APP ─────────────────────────────────── #
+###############################################################################
+
+def make_app(service: AdvisorService, token: str = SERVICE_TOKEN) -> web.Application:
+    @web.middleware
+    async def guard(request, handler):
+        # Health checks stay open for load balancers
+        if token and request.path != "/healthz":
+            # Constant time; bytes, since compare_digest refuses non-ASCII str
+            supplied = request.headers.get("Authorization", "").encode("utf-8", "replace")
+            if not secrets.compare_digest(supplied, f"Bearer {token}".encode("utf-8")):
+                return _error("unauthorized", 401)
+        with tracing.span(f"service.{request.path.rsplit('/', 1)[-1]}"):
+            return await handler(request)
+
+    async def close(app):
+        service.close()
+
+    app = web.Application(client_max_size=MAX_BODY, middlewares=[guard])
+    app.router.add_post("/v1/session", service.new_session)
+    app.router.add_post("/v1/chat", service.chat)
+    app.router.add_post("/v1/scan", service.scan)
+    app.router.add_get("/healthz", service.health)
+    app.on_cleanup.append(close)
+    return app
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the advisor over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="model calls in flight at once")
+    parser.add_argument("--api-key", default=None, help="defaults to GEMINI_API_KEY or api_key.txt")
+    parser.add_argument("--trace-jsonl", default=None, help="append per-request spans to this JSON-lines file")
+    parser.add_argument("--trace-prom", default=None, help="write span percentiles to this Prometheus textfile")
+    args = parser.parse_args(argv)
+
+    api_key = args.api_key or load_api_key()
+    if not api_key:
+        parser.error("no API key: set GEMINI_API_KEY or pass --api-key")
+
+    tracing.configure(jsonl_path=args.trace_jsonl, prom_path=args.trace_prom)
+    workers = max(args.workers, 1)
+    http_pool.configure(pool_size=workers)
+    http_pool.warm_async()
+    try:
+        # Cancel a handler when its client disconnects, which also stops its stream
+        web.run_app(make_app(AdvisorService(api_key, workers)), host=args.host, port=args.port, handler_cancellation=True)
+    finally:
+        tracing.tracer.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
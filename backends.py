@@ -0,0 +1,563 @@
+"""Model backends and a router that hedges between them.
+
+A backend answers a Gemini-style request payload: the Gemini REST API, or any
+OpenAI-compatible chat endpoint (a llama.cpp or vLLM server, for instance).
+The router keeps per-backend latency and health statistics, sends each request
+to the backend expected to answer first, and hedges: if no answer has started
+after that backend's p95 time to first answer, a second request goes to the
+runner-up, the first to answer wins and the other is cancelled.  With a
+single backend there is nothing to hedge to: repeating the request to the
+same model would spend quota (and re-upload screenshots) for little gain, so
+such requests run on the caller's thread; hedged attempts share a bounded
+thread pool.  Backends that keep failing are skipped for a cooldown period.
+
+Extra backends come from the environment::
+
+    CYBERGUARD_FALLBACK_MODELS=gemini-2.0-flash-lite
+    CYBERGUARD_OPENAI_URL=http://127.0.0.1:8080/v1  CYBERGUARD_OPENAI_MODEL=qwen2.5-7b
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import http_pool
+import tracing
+from rate_limit import RateLimiter, estimate_payload_tokens
+from scheduler import PRIORITY_INTERACTIVE, RequestCancelled, RetryPolicy, call_with_retry, is_retryable
+
+HEDGE_ENABLED = os.getenv("CYBERGUARD_HEDGE", "1") != "0"
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_DELAY = 0.5  # Seconds; never hedge sooner than this
+HEDGE_MAX_DELAY = 15.0
+HEDGE_COLD_DELAY = 4.0  # Until a backend has MIN_SAMPLES latencies
+MIN_SAMPLES = 8
+FAILURE_THRESHOLD = 3  # Consecutive failures before a backend is benched
+FAILURE_COOLDOWN = 30.0
+LATENCY_WINDOW = 256
+HEDGE_WORKERS = int(os.getenv("CYBERGUARD_HEDGE_WORKERS", "8"))  # Attempts of hedged requests in flight at once
+_POLL = 0.1  # How often a backoff wait checks whether the request was cancelled
+
+
+class BackendError(RuntimeError):
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+###############################################################################
+# ───────────────────────────────── STATS ─────────────────────────────────── #
+###############################################################################
+
+class BackendStats:
+    """Time to first answer (ms) and failure counts for one backend."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_latency(self, ms: float):
+        with self._lock:
+            self.latencies.append(ms)
+
+    def record_success(self, ms: float):
+        with self._lock:
+            self.latencies.append(ms)
+            self.successes += 1
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= FAILURE_THRESHOLD:
+                self.benched_until = time.monotonic() + FAILURE_COOLDOWN
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.benched_until
+
+    def percentile(self, q: float):
+        """None until there are enough samples to trust."""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            values = sorted(self.latencies)
+        return tracing.percentile(values, q)
+
+    def score(self) -> float:
+        # Expected wait, inflated by the share of requests that fail
+        p50 = self.percentile(0.5)
+        if p50 is None:
+            return float("inf")
+        total = self.successes + self.failures
+        return p50 * (1.0 + 2.0 * (self.failures / total if total else 0.0))
+
+    def snapshot(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "successes": self.successes,
+            "failures": self.failures,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+        }
+
+
+###############################################################################
+# ──────────────────────────────── BACKENDS ───────────────────────────────── #
+###############################################################################
+
+class Backend:
+    label = "API"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stats = BackendStats()
+        self.limiter = RateLimiter()  # Unlimited until configured or told otherwise by the server
+
+    def generate(
+        self,
+        payload: dict,
+        stream=False,
+        on_partial=None,
+        stop_when=None,
+        cancelled=None,
+        retry_policy: RetryPolicy = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> str:
+        cancelled = cancelled or threading.Event()
+        policy = retry_policy or RetryPolicy()
+        # Every attempt, retries included, waits for quota before it goes out
+        cost = estimate_payload_tokens(payload)
+
+        def admit():
+            self.limiter.acquire(cost, priority, cancelled)
+
+        try:
+            if stream:
+                return self._stream(payload, on_partial, stop_when, cancelled, policy, admit)
+            return call_with_retry(lambda: self._throttled(admit, lambda: self._request(payload)), policy, cancelled)
+        except http_pool.HTTPStatusError as exc:
+            if exc.status_code == 429:
+                wait = self.limiter.snapshot()["paused_s"]
+                message = f"{self.label} quota reached; try again in about {max(1, round(wait))}s."
+            else:
+                message = f"{self.label} {exc.status_code}: {exc.text[:200]}"
+            raise BackendError(message, exc.status_code) from None
+
+    def _throttled(self, admit, request):
+        admit()
+        try:
+            return request()
+        except http_pool.HTTPStatusError as exc:
+            if exc.status_code == 429:
+                self.limiter.on_throttled(exc.headers, exc.text)
+            raise
+
+    def _stream(self, payload, on_partial, stop_when, cancelled, policy, admit) -> str:
+        text = ""
+
+        def attempt():
+            nonlocal text
+            lines = self._stream_lines(payload)
+            try:
+                for line in lines:
+                    if cancelled.is_set():
+                        raise RequestCancelled()
+                    if not line or not line.startswith("data:"):
+                        continue
+                    delta = self._delta(line[len("data:"):].strip())
+                    if not delta:
+                        continue
+                    text += delta
+                    if on_partial is not None:
+                        on_partial(text)
+                    if stop_when is not None and stop_when(text):
+                        break
+            finally:
+                lines.close()
+
+        # Once text has been shown a retry would duplicate it, so only retry before that
+        call_with_retry(
+            lambda: self._throttled(admit, attempt), policy, cancelled, lambda exc: not text and is_retryable(exc)
+        )
+        return text.strip()
+
+    # Subclasses: one unary request, the SSE line stream, and one SSE event's text
+    def _request(self, payload: dict) -> str:
+        raise NotImplementedError
+
+    def _stream_lines(self, payload: dict):
+        raise NotImplementedError
+
+    def _delta(self, data: str) -> str:
+        raise NotImplementedError
+
+
+class GeminiBackend(Backend):
+    label = "Gemini API"
+
+    def __init__(self, api_key: str, model: str, host: str = None):
+        super().__init__(model)
+        self.api_key = api_key
+        self.model = model
+        self.host = host
+
+    def url(self, method: str) -> str:
+        url = f"{self.host or http_pool.API_HOST}/v1beta/models/{self.model}:{method}?key={self.api_key}"
+        if method == "streamGenerateContent":
+            url += "&alt=sse"
+        return url
+
+    def _request(self, payload):
+        resp = http_pool.get_client().post(self.url("generateContent"), json=payload)
+        if resp.status_code != 200:
+            raise http_pool.HTTPStatusError(resp.status_code, resp.text, resp.headers)
+        self.limiter.observe(resp.headers)
+        return resp.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+
+    def _stream_lines(self, payload):
+        return http_pool.get_client().stream_lines(
+            self.url("streamGenerateContent"), json=payload, on_headers=self.limiter.observe
+        )
+
+    def _delta(self, data):
+        candidates = json.loads(data).get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+
+class OpenAIBackend(Backend):
+    """Any ``/v1/chat/completions`` server; Gemini payloads are translated."""
+
+    def __init__(self, base_url: str, model: str, api_key: str = None, name: str = None):
+        super().__init__(name or f"openai:{model}")
+        self.label = f"{self.name} API"
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else None
+
+    def to_openai(self, payload: dict, stream: bool = False) -> dict:
+        messages = []
+        for content in payload.get("contents", []):
+            parts = []
+            for part in content.get("parts", []):
+                if "text" in part:
+                    parts.append({"type": "text", "text": part["text"]})
+                elif "inline_data" in part:
+                    image = part["inline_data"]
+                    prefix = f"data:{image['mime_type']};base64,"
+                    if isinstance(image["data"], http_pool.Base64Blob):
+                        url = image["data"].with_prefix(prefix)  # Still streamed, never joined
+                    else:
+                        url = prefix + image["data"]
+                    parts.append({"type": "image_url", "image_url": {"url": url}})
+            if all(p["type"] == "text" for p in parts):
+                parts = "\n".join(p["text"] for p in parts)  # Plain string for text-only servers
+            role = "assistant" if content.get("role") == "model" else "user"
+            messages.append({"role": role, "content": parts})
+        config = payload.get("generationConfig", {})
+        body = {"model": self.model, "messages": messages, "stream": stream}
+        for ours, theirs in (("temperature", "temperature"), ("topP", "top_p"), ("maxOutputTokens", "max_tokens")):
+            if ours in config:
+                body[theirs] = config[ours]
+        return body
+
+    def _request(self, payload):
+        resp = http_pool.get_client().post(
+            f"{self.base_url}/chat/completions", json=self.to_openai(payload), headers=self.headers
+        )
+        if resp.status_code != 200:
+            raise http_pool.HTTPStatusError(resp.status_code, resp.text, resp.headers)
+        self.limiter.observe(resp.headers)
+        return (resp.json()["choices"][0]["message"].get("content") or "").strip()
+
+    def _stream_lines(self, payload):
+        return http_pool.get_client().stream_lines(
+            f"{self.base_url}/chat/completions",
+            json=self.to_openai(payload, stream=True),
+            headers=self.headers,
+            on_headers=self.limiter.observe,
+        )
+
+    def _delta(self, data):
+        if data == "[DONE]":
+            return ""
+        choices = json.loads(data).get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+
+###############################################################################
+# ───────────────────────────────── ROUTER ────────────────────────────────── #
+###############################################################################
+
+class _Cancel:
+    """One attempt's cancel flag, which also reads as set once the whole
+    request is cancelled."""
+
+    def __init__(self, request):
+        self._own = threading.Event()
+        self._request = request
+
+    def set(self):
+        self._own.set()
+
+    def is_set(self) -> bool:
+        return self._own.is_set() or self._request.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        # Wakes at once for this attempt's own cancel, within _POLL for the request's
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.is_set():
+            remaining = _POLL if deadline is None else min(_POLL, deadline - time.monotonic())
+            if remaining <= 0:
+                break
+            self._own.wait(remaining)
+        return self.is_set()
+
+
+class _Attempt:
+    def __init__(self, backend, cancelled):
+        self.backend = backend
+        self.cancelled = _Cancel(cancelled)
+        self.started = time.perf_counter()
+        self.first_answer = None  # perf_counter of the first streamed text
+
+    def elapsed_ms(self, until=None) -> float:
+        return ((until or time.perf_counter()) - self.started) * 1000.0
+
+
+class Router:
+    def __init__(self, backends, hedge: bool = HEDGE_ENABLED, max_hedges: int = 1):
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.max_hedges = max_hedges
+        self.hedges = 0  # Hedge requests fired
+        self.hedge_wins = 0  # ... that answered first
+        self._lock = threading.Lock()  # Requests run on many threads at once
+
+    def ordered(self) -> list:
+        """Healthy backends first, then by expected latency, then config order."""
+        ranked = sorted(
+            enumerate(self.backends), key=lambda item: (not item[1].stats.healthy, item[1].stats.score(), item[0])
+        )
+        return [backend for _, backend in ranked]
+
+    def hedge_delay(self, backend) -> float:
+        p95 = backend.stats.percentile(HEDGE_QUANTILE)
+        if p95 is None:
+            return HEDGE_COLD_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p95 / 1000.0))
+
+    def snapshot(self) -> list:
+        return [{"name": b.name, **b.stats.snapshot(), "limiter": b.limiter.snapshot()} for b in self.backends]
+
+    def generate(
+        self,
+        payload: dict,
+        stream=False,
+        on_partial=None,
+        stop_when=None,
+        cancelled=None,
+        retry_policy: RetryPolicy = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> str:
+        cancelled = cancelled or threading.Event()
+        candidates = self.ordered()
+        options = {"stream": stream, "stop_when": stop_when, "retry_policy": retry_policy, "priority": priority}
+        if self.hedge and len(candidates) > 1:
+            return self._hedged(payload, candidates, on_partial, cancelled, options)
+        return self._inline(payload, candidates, on_partial, cancelled, options)
+
+    def _inline(self, payload, candidates, on_partial, cancelled, options) -> str:
+        # Nothing to hedge to: run on the caller's thread, failing over in order
+        error = None
+        for backend in candidates:
+            attempt = _Attempt(backend, cancelled)
+
+            def forward(text, attempt=attempt):
+                if attempt.first_answer is None:
+                    attempt.first_answer = time.perf_counter()
+                if on_partial is not None:
+                    on_partial(text)
+
+            try:
+                text = backend.generate(
+                    payload, on_partial=forward if options["stream"] else None, cancelled=cancelled, **options
+                )
+            except RequestCancelled:
+                raise
+            except Exception as exc:
+                backend.stats.record_failure()
+                if attempt.first_answer is not None:
+                    raise  # Failed mid-stream after its text was shown
+                error = exc
+                continue
+            self._record_answer(attempt, [attempt])
+            return text
+        raise error or RequestCancelled()
+
+    def _hedged(self, payload, candidates, on_partial, cancelled, options) -> str:
+        fallbacks = candidates[1:]
+        hedge_targets = fallbacks[:]  # Only ever another backend
+        done = threading.Condition()  # Guards attempts, finished and winner
+        finished = deque()
+        attempts = []
+        winner = None
+
+        def claim(attempt) -> bool:
+            nonlocal winner
+            with done:
+                if winner is None:
+                    winner = attempt
+                    for other in attempts:
+                        if other is not attempt:
+                            other.cancelled.set()
+                return winner is attempt
+
+        def run(attempt):
+            def forward(text):
+                if attempt.first_answer is None:
+                    attempt.first_answer = time.perf_counter()
+                    if not claim(attempt):
+                        raise RequestCancelled()
+                if attempt.cancelled.is_set():
+                    raise RequestCancelled()
+                if on_partial is not None:
+                    on_partial(text)
+
+            result = (attempt, None, RequestCancelled())
+            try:
+                text = attempt.backend.generate(
+                    payload,
+                    on_partial=forward if options["stream"] else None,
+                    cancelled=attempt.cancelled,
+                    **options,
+                )
+                result = (attempt, text, None)
+            except Exception as exc:
+                result = (attempt, None, exc)
+            finally:
+                with done:
+                    finished.append(result)
+                    done.notify_all()
+
+        def launch(backend):
+            attempt = _Attempt(backend, cancelled)
+            with done:
+                attempts.append(attempt)
+            _attempt_pool().submit(run, attempt)
+            return attempt
+
+        def can_hedge():
+            return winner is None and hedges < self.max_hedges and hedge_targets
+
+        primary = launch(candidates[0])
+        hedge_at = time.perf_counter() + self.hedge_delay(candidates[0])
+        hedges, running, error = 0, 1, None
+        while True:
+            with done:
+                while not finished and not cancelled.is_set():
+                    timeout = hedge_at - time.perf_counter() if can_hedge() else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    done.wait(timeout)
+                outcome = finished.popleft() if finished else None
+            if cancelled.is_set():
+                for attempt in attempts:
+                    attempt.cancelled.set()
+                raise RequestCancelled()
+            if outcome is None:
+                hedges += 1
+                with self._lock:
+                    self.hedges += 1
+                tracing.record("backend.hedge_delay", (hedge_at - primary.started) * 1000.0)
+                target = hedge_targets.pop(0)
+                fallbacks.remove(target)
+                launch(target)
+                running += 1
+                continue
+            attempt, text, exc = outcome
+            running -= 1
+            if exc is None and claim(attempt):
+                self._record_answer(attempt, attempts)
+                if attempt is not primary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return text
+            if exc is not None and not isinstance(exc, RequestCancelled):
+                attempt.backend.stats.record_failure()
+                error = exc
+                if winner is attempt:
+                    raise exc  # Failed mid-stream after its text was shown
+            if running == 0:
+                if not fallbacks:
+                    raise error or RequestCancelled()
+                # Nothing left in flight: fail over straight away
+                target = fallbacks.pop(0)
+                if target in hedge_targets:
+                    hedge_targets.remove(target)
+                launch(target)
+                running += 1
+
+    @staticmethod
+    def _record_answer(attempt, attempts):
+        latency = attempt.elapsed_ms(attempt.first_answer)
+        attempt.backend.stats.record_success(latency)
+        tracing.record(f"backend.{attempt.backend.name}", latency)
+        for other in attempts:
+            # Only a lower bound, but leaving slow losers out would flatter their p95
+            if other is not attempt and other.first_answer is None and other.elapsed_ms() >= latency:
+                other.backend.stats.record_latency(other.elapsed_ms())
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _attempt_pool() -> ThreadPoolExecutor:
+    """Threads shared by every hedged request, so losers blocked in a read are bounded."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="backend")
+        return _pool
+
+
+###############################################################################
+# ──────────────────────────────── DEFAULTS ───────────────────────────────── #
+###############################################################################
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def backends_from_env(api_key: str, model: str) -> list:
+    models = [model] + [m.strip() for m in os.getenv("CYBERGUARD_FALLBACK_MODELS", "").split(",")]
+    backends = [GeminiBackend(api_key, name) for name in dict.fromkeys(m for m in models if m)]
+    # Gemini quotas are per model, so each model gets its own buckets
+    rpm, tpm = os.getenv("CYBERGUARD_RPM"), os.getenv("CYBERGUARD_TPM")
+    for backend in backends:
+        backend.limiter.configure(rpm=float(rpm) if rpm else None, tpm=float(tpm) if tpm else None)
+    base_url = os.getenv("CYBERGUARD_OPENAI_URL")
+    if base_url:
+        backends.append(
+            OpenAIBackend(base_url, os.getenv("CYBERGUARD_OPENAI_MODEL", "local"), os.getenv("CYBERGUARD_OPENAI_KEY"))
+        )
+    return backends
+
+
+def get_router(api_key: str, model: str) -> Router:
+    """Shared per key and model, so statistics outlive the short-lived clients."""
+    with _routers_lock:
+        router = _routers.get((api_key, model))
+        if router is None:
+            router = _routers[(api_key, model)] = Router(backends_from_env(api_key, model))
+        return router
@@ -0,0 +1,71 @@
+"""Shared helpers for the benchmark scripts.
+
+Every script writes the same JSON shape so ``compare.py`` can diff any two
+runs::
+
+    {"benchmark": "micro", "meta": {...},
+     "results": [{"name": "...", "value": 1.2, "unit": "us", ...}, ...]}
+
+Lower values are better for every result.
+"""
+
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def best_of(fn, repeat: int = 5, number: int = 1) -> float:
+    """Fastest of ``repeat`` runs of ``number`` calls, in seconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def result(name: str, value: float, unit: str, **extra) -> dict:
+    return {"name": name, "value": round(value, 4), "unit": unit, **extra}
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def write_results(benchmark: str, results: list, path=None, **meta) -> dict:
+    report = {
+        "benchmark": benchmark,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            **meta,
+        },
+        "results": results,
+    }
+    if path:
+        pathlib.Path(path).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    return report
+
+
+def print_results(results: list):
+    width = max((len(r["name"]) for r in results), default=10)
+    for r in results:
+        print(f"{r['name']:<{width}}  {r['value']:>12.3f} {r['unit']}")
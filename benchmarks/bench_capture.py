@@ -0,0 +1,87 @@
+"""Capture encoding benchmark: time and peak memory from frame to request body.
+
+Encodes synthetic screenshots with ``CaptureProcessor`` and drains the
+request body ``http_pool`` would send for them, without a network.  Peak
+memory is traced Python allocations (PIL's pixel buffers are not included)
+and is also reported relative to the encoded (JPEG) frame, which is the floor.
+
+    python benchmarks/bench_capture.py --json capture.json
+"""
+
+import argparse
+import base64
+import io
+import tracemalloc
+
+from _common import best_of, print_results, result, write_results
+
+from PIL import Image, ImageDraw
+
+from advisor_core import build_image_payload
+from http_pool import _encode
+from image_prep import CaptureProcessor
+
+SIZES = ((1920, 1080), (3840, 2160), (5120, 2880))
+
+
+def screenshot(size) -> str:
+    """A busy UI-like frame as base64 PNG, the form captures arrive in."""
+    width, height = size
+    image = Image.effect_noise((width // 4, height // 4), 40).convert("RGB").resize(size)
+    draw = ImageDraw.Draw(image)
+    for y in range(0, height, 24):
+        draw.text((12, y), "https://examp1e-login.com/verify?session=" + str(y) * 4, fill=(20, 20, 20))
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def drain(body) -> int:
+    if isinstance(body, bytes):
+        return len(body)
+    sent = 0
+    while chunk := body.read(16384):
+        sent += len(chunk)
+    return sent
+
+
+def bench(repeat: int) -> list:
+    results = []
+    # Keep the original PNG out of the running so the JPEG path is measured
+    processor = CaptureProcessor(max_size=(8192, 8192))
+    for size in SIZES:
+        label = f"{size[0]}x{size[1]}"
+        original = screenshot(size)
+        image = Image.open(io.BytesIO(base64.b64decode(original)))
+        image.load()
+
+        def send():
+            frame = processor.process_image(image)
+            return drain(_encode(build_image_payload(frame.data, frame.mime_type))), len(frame.data) * 3 // 4
+
+        seconds = best_of(send, repeat)
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        sent, encoded = send()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results += [
+            result(f"capture.send[{label}]", seconds * 1000.0, "ms"),
+            result(f"capture.peak[{label}]", peak / 1e6, "MB", body_mb=round(sent / 1e6, 2)),
+            result(f"capture.peak_per_frame[{label}]", peak / encoded, "x"),
+        ]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    args = parser.parse_args(argv)
+    results = bench(args.repeat)
+    print_results(results)
+    write_results("capture", results, args.json_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""End-to-end request benchmark against the local mock server.
+
+Drives ``GeminiWorker`` through a ``RequestScheduler`` exactly as the app
+does, at several concurrency levels, streamed and not, and reports latency
+percentiles and throughput.  Errors and 429s come from the mock's configured
+rates and go through the normal retry path.
+
+    python benchmarks/bench_e2e.py --requests 200 --concurrency 1,4,16 --json e2e.json
+"""
+
+import argparse
+import os
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication, Qt  # noqa: E402
+
+from _common import result, write_results  # noqa: E402
+from mock_gemini import MockConfig, start_server  # noqa: E402
+
+import http_pool  # noqa: E402
+import tracing  # noqa: E402
+from scheduler import PRIORITY_INTERACTIVE, RequestScheduler, RetryPolicy  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q * (len(values) - 1)))] if values else 0.0
+
+
+def run_load(worker_cls, requests: int, concurrency: int, stream: bool, retry: RetryPolicy) -> dict:
+    """Submit ``requests`` at once; latency is measured from when a worker starts
+    the request, queue wait separately from submission."""
+    scheduler = RequestScheduler(max_workers=concurrency)
+    latencies, waits, failures = [], [], []
+    lock = threading.Lock()
+    done = threading.Semaphore(0)
+
+    def submit(i):
+        worker = worker_cls(f"Is message {i} a phishing attempt?", "bench-key", stream=stream)
+        worker.client.retry_policy = retry
+        submitted = time.perf_counter()
+        outcome = {}
+        # Direct connections: there is no event loop to deliver queued signals to
+        worker.responseReady.connect(lambda _t: outcome.setdefault("ok", True), Qt.DirectConnection)
+        worker.error.connect(lambda e: outcome.setdefault("error", e), Qt.DirectConnection)
+
+        def finished():
+            with lock:
+                if "error" in outcome:
+                    failures.append(outcome["error"])
+                else:
+                    latencies.append(time.perf_counter() - outcome["started"])
+                    waits.append(outcome["started"] - submitted)
+            done.release()
+
+        def job():
+            outcome["started"] = time.perf_counter()
+            worker.run()
+
+        worker.finished.connect(finished, Qt.DirectConnection)
+        scheduler.submit(job, PRIORITY_INTERACTIVE, on_cancel=worker.cancel)
+        return worker
+
+    started = time.perf_counter()
+    workers = [submit(i) for i in range(requests)]  # Keep the QObjects alive
+    for _ in workers:
+        done.acquire()
+    wall = time.perf_counter() - started
+    scheduler.shutdown(timeout=1.0)
+    return {
+        "ok": len(latencies),
+        "failed": len(failures),
+        "wall_s": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.50) * 1000.0,
+        "p95": percentile(latencies, 0.95) * 1000.0,
+        "p99": percentile(latencies, 0.99) * 1000.0,
+        "queue_p50": percentile(waits, 0.50) * 1000.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--latency", type=float, default=50.0, help="mock server latency in ms")
+    parser.add_argument("--jitter", type=float, default=10.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of slow mock replies")
+    parser.add_argument("--tail", type=float, default=2000.0, help="extra ms for slow replies")
+    parser.add_argument("--reply-chars", type=int, default=600)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    from chatbot import GeminiWorker
+
+    app = QCoreApplication.instance() or QCoreApplication([])  # noqa: F841 (QObjects need an app)
+    config = MockConfig(
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail,
+        reply_chars=args.reply_chars,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=0,
+    )
+    server = start_server(config)
+    http_pool.API_HOST = server.url
+    # Quick retries keep error-rate runs about the client, not about sleeping
+    retry = RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=0.5)
+
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        http_pool.configure(pool_size=max(concurrency, 1))
+        for stream in (False, True):
+            label = f"e2e[{'stream' if stream else 'unary'},c={concurrency}]"
+            tracing.tracer.reset()
+            stats = run_load(GeminiWorker, args.requests, concurrency, stream, retry)
+            spans = {s["name"]: s for s in tracing.tracer.snapshot()}
+            ttfb = spans.get("http.ttfb", {}).get("p50", 0.0)
+            results += [
+                result(f"{label}.p50", stats["p50"], "ms"),
+                result(f"{label}.p95", stats["p95"], "ms"),
+                result(f"{label}.p99", stats["p99"], "ms"),
+                # Stored inverted so that lower is better like every other result
+                result(f"{label}.time_per_request", 1000.0 / max(stats["throughput"], 1e-9), "ms"),
+                result(f"{label}.ttfb_p50", ttfb, "ms"),
+                result(f"{label}.queue_p50", stats["queue_p50"], "ms"),
+            ]
+            print(
+                f"{label:<24} {stats['throughput']:7.1f} req/s  p50 {stats['p50']:6.1f} ms  "
+                f"p95 {stats['p95']:6.1f} ms  p99 {stats['p99']:6.1f} ms  failed {stats['failed']}"
+            )
+    server.shutdown()
+    write_results(
+        "e2e",
+        results,
+        args.json_out,
+        requests=args.requests,
+        mock=vars(config),
+        server_stats=dict(server.stats),
+    )
+
+
+if __name__ == "__main__":
+    main()
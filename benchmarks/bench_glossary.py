@@ -0,0 +1,67 @@
+"""Glossary matching cost as the glossary grows.
+
+Compares the single-pass automaton in glossary.py with the old approach of
+one ``re.search`` per term, over the same reply text, for glossaries padded
+with synthetic terms.  The automaton's time per reply should stay flat.
+
+    python benchmarks/bench_glossary.py [--sizes 200,2000,20000] [--json out.json]
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+
+from _common import best_of, print_results, result, write_results
+
+from glossary import Glossary, GlossaryEntry
+
+REPLY = (
+    "This message looks like a phishing email: the sender domain is a lookalike and the link "
+    "points to a fake login page. Do not enter your password; enable two-factor authentication "
+    "and use a password manager. If you clicked, run your antivirus and watch for ransomware, "
+    "spyware or a keylogger, and report the data breach to your security operations center. "
+) * 4
+
+
+def synthetic_entries(count, rng):
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(count)]
+    return [
+        GlossaryEntry(term=f"{word} {rng.choice(['attack', 'scam', 'malware', 'flaw'])}", definition="synthetic")
+        for word in words
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="200,1000,5000,20000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    base = Glossary.load().entries
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        entries = base + synthetic_entries(max(0, size - len(base)), rng)
+        started = time.perf_counter()
+        glossary = Glossary(entries)
+        build = time.perf_counter() - started
+        patterns = [
+            re.compile(rf"\b{re.escape(surface)}\b", re.I) for entry in entries for surface in entry.surfaces()
+        ]
+        automaton = best_of(lambda: glossary.find(REPLY), args.repeat)
+        regex = best_of(lambda: [p.search(REPLY) for p in patterns], max(1, args.repeat // 4))
+        results += [
+            result(f"glossary.build[terms={size}]", build * 1e3, "ms"),
+            result(f"glossary.find[terms={size}]", automaton * 1e6, "us"),
+            result(f"glossary.regex_loop[terms={size}]", regex * 1e6, "us"),
+        ]
+
+    print_results(results)
+    write_results("glossary", results, args.json_out)
+
+
+if __name__ == "__main__":
+    main()
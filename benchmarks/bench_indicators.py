@@ -0,0 +1,105 @@
+"""Local indicator checks over a large indicator file.
+
+Builds an engine with a synthetic blocklist, writes a file of mixed
+indicators (URLs, bare domains, look-alikes, sender headers, hashes, IPs),
+then classifies it line by line the way a pasted prompt is checked.
+
+    python benchmarks/bench_indicators.py [--lines 1000000] [--blocklist 100000] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+from _common import print_results, result, write_results
+
+from indicators import INDICATORS_FILE, IndicatorEngine
+
+LOOKALIKES = ("paypa1.com", "g00gle.com", "micros0ft.com", "arnazon.com", "linkedln.com", "faceb00k.com")
+BENIGN = ("example.com", "wikipedia.org", "python.org", "news.bbc.co.uk", "mail.google.com", "github.com")
+
+
+def word(rng, low=4, high=12) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(low, high)))
+
+
+def blocklist(count, rng) -> list:
+    lines = []
+    for i in range(count):
+        if i % 2:
+            lines.append("%064x" % rng.getrandbits(256))
+        else:
+            lines.append(f"{word(rng)}-{word(rng)}.{rng.choice(('com', 'net', 'top', 'xyz'))}")
+    return lines
+
+
+def indicator_line(rng, blocked) -> str:
+    kind = rng.randrange(8)
+    if kind == 0:
+        return f"https://{rng.choice(BENIGN)}/{word(rng)}?id={rng.randrange(10**6)}"
+    if kind == 1:
+        return f"http://{rng.choice(LOOKALIKES)}/login"
+    if kind == 2:
+        return f"{word(rng)}.{rng.choice(('com', 'org', 'xyz', 'top', 'io'))}"
+    if kind == 3:
+        return f"http://{rng.randrange(1, 255)}.{rng.randrange(255)}.{rng.randrange(255)}.{rng.randrange(255)}/x"
+    if kind == 4:
+        return f"From: PayPal <service@{word(rng)}-paypal.com>"
+    if kind == 5:
+        return rng.choice(blocked)
+    if kind == 6:
+        return "%064x" % rng.getrandbits(256)
+    return f"[www.chase.com](http://{word(rng)}.ru/verify)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--blocklist", type=int, default=100_000)
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    blocked = blocklist(args.blocklist, rng)
+    with open(INDICATORS_FILE, encoding="utf-8") as fh:
+        rules = json.load(fh)
+    started = time.perf_counter()
+    engine = IndicatorEngine(rules, blocked)
+    load = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "indicators.txt")
+        with open(path, "w", encoding="utf-8") as fh:
+            for _ in range(args.lines):
+                fh.write(indicator_line(rng, blocked) + "\n")
+        conclusive = flagged = 0
+        started = time.perf_counter()
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                assessment = engine.assess(line)
+                flagged += bool(assessment.findings)
+                conclusive += assessment.conclusive
+        classify = time.perf_counter() - started
+
+    results = [
+        result(f"indicators.load[blocklist={args.blocklist}]", load * 1000.0, "ms"),
+        result(
+            f"indicators.classify[lines={args.lines}]",
+            classify,
+            "s",
+            flagged=flagged,
+            conclusive=conclusive,
+        ),
+        result("indicators.per_line", classify / max(args.lines, 1) * 1e6, "us"),
+    ]
+    print_results(results)
+    print(f"{flagged} flagged, {conclusive} conclusive")
+    write_results("indicators", results, args.json_out, lines=args.lines, blocklist=args.blocklist)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Microbenchmarks for reply post-processing and the chat view.
+
+Covers summarize_response_short, clean_for_tts, the bubble text-cleaning
+regexes, markdown rendering and ChatArea.add_message / clear_chat at 10, 1k
+and 10k messages (offscreen, no history store).  A 100 KB markdown reply is
+also timed end to end: what adding it costs the GUI thread, the longest GUI
+event pass until it is painted, how long the render thread takes to lay it
+out, and one repaint, against rendering and laying it out inline.
+
+    python benchmarks/bench_micro.py --json micro.json
+"""
+
+import argparse
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from _common import best_of, print_results, result, write_results  # noqa: E402
+from mock_gemini import reply_text  # noqa: E402
+
+from advisor_core import clean_for_tts, summarize_response_short  # noqa: E402
+from rich_text import clean_bubble_text, markdown_to_html, render  # noqa: E402
+
+REPLY_SIZES = (600, 5_000, 50_000, 100_000)
+CHAT_SIZES = (10, 1_000, 10_000)
+LONG_REPLY = 100_000
+
+
+def markdown_reply(chars: int) -> str:
+    """A reply shaped like a long complex-mode answer: headings, lists, code."""
+    sections, total, index = [], 0, 0
+    while total < chars:
+        section = (
+            f"## Step {index + 1}\n**Why:** {reply_text(240)}\n"
+            f"- Check the `From:` address and [the link](https://examp1e.com/{index})\n"
+            f"- Do *not* open attachments 🔒\n1. Report it\n2. Delete it"
+        )
+        sections.append(section)
+        total += len(section) + 2
+        index += 1
+    return "\n\n".join(sections)
+
+
+def bench_text(repeat: int) -> list:
+    results = []
+    for size in REPLY_SIZES:
+        text = "**Warning:** " + reply_text(size) + " Stay safe! 🔒"
+        for name, fn in (
+            ("summarize_response_short", summarize_response_short),
+            ("clean_for_tts", clean_for_tts),
+            ("clean_bubble_text", clean_bubble_text),
+        ):
+            seconds = best_of(lambda: fn(text), repeat, number=20)
+            results.append(result(f"{name}[{size}]", seconds * 1e6, "us"))
+        text = markdown_reply(size)
+        for name, fn in (("markdown_to_html", markdown_to_html), ("render", render)):
+            seconds = best_of(lambda: fn(text), repeat, number=5)
+            results.append(result(f"{name}[{size}]", seconds * 1e6, "us"))
+    return results
+
+
+def bench_chat(repeat: int) -> list:
+    from PySide6.QtWidgets import QApplication
+
+    from chatbot import ChatArea
+
+    app = QApplication.instance() or QApplication([])
+    results = []
+    for count in CHAT_SIZES:
+        texts = [reply_text(80 + (i % 7) * 60) for i in range(count)]
+        append_times, layout_times, clear_times = [], [], []
+        for _ in range(max(1, repeat // 2)):
+            chat = ChatArea()
+            chat.resize(800, 600)
+            chat.show()
+            app.processEvents()
+            append_times.append(best_of(lambda: [chat.add_message(t, i % 2 == 0) for i, t in enumerate(texts)], 1))
+            # Laying out the new rows happens on the next event loop pass
+            layout_times.append(best_of(app.processEvents, 1))
+            clear_times.append(best_of(chat.clear_chat, 1))
+            app.processEvents()
+            chat.close()
+            chat.deleteLater()
+        results += [
+            result(f"chat.add_message[{count}].total", min(append_times) * 1e3, "ms"),
+            result(f"chat.add_message[{count}].per_message", min(append_times) / count * 1e6, "us"),
+            result(f"chat.layout[{count}]", min(layout_times) * 1e3, "ms"),
+            result(f"chat.clear_chat[{count}]", min(clear_times) * 1e3, "ms"),
+        ]
+    return results
+
+
+def bench_long_reply(repeat: int) -> list:
+    import time
+
+    from PySide6.QtWidgets import QApplication
+
+    from chatbot import ChatArea, ChatMessage, layout_document
+
+    app = QApplication.instance() or QApplication([])
+    text = markdown_reply(LONG_REPLY)
+
+    def pump(stalls):
+        started = time.perf_counter()
+        app.processEvents()
+        stalls.append(time.perf_counter() - started)
+        time.sleep(0.002)
+
+    add, stall, ready, paint, inline = [], [], [], [], []
+    for _ in range(repeat):
+        chat = ChatArea()
+        chat.resize(800, 600)
+        chat.show()
+        app.processEvents()
+        width, font = chat.view.itemDelegate().text_width(), chat.view.font()
+        inline.append(best_of(lambda: layout_document(ChatMessage(text, False).html, width, font), 1))
+        started = time.perf_counter()
+        msg = chat.add_message(text, False)
+        stalls = [time.perf_counter() - started]
+        while not msg.tiled:
+            pump(stalls)
+        ready.append(time.perf_counter() - started)
+        for _ in range(20):  # Visible tiles land
+            pump(stalls)
+        add.append(stalls[0])
+        stall.append(max(stalls))
+        paint.append(best_of(chat.view.viewport().repaint, 1))
+        chat.shutdown()
+        chat.close()
+        chat.deleteLater()
+    label = f"{LONG_REPLY // 1000}KB"
+    return [
+        result(f"chat.long_reply[{label}].add_message", min(add) * 1e3, "ms"),
+        result(f"chat.long_reply[{label}].worst_gui_stall", min(stall) * 1e3, "ms"),
+        result(f"chat.long_reply[{label}].ready", min(ready) * 1e3, "ms"),
+        result(f"chat.long_reply[{label}].repaint", min(paint) * 1e3, "ms"),
+        result(f"chat.long_reply[{label}].inline_layout", min(inline) * 1e3, "ms"),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-gui", action="store_true", help="only the text-processing benchmarks")
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = bench_text(args.repeat)
+    if not args.skip_gui:
+        results += bench_chat(args.repeat)
+        results += bench_long_reply(args.repeat)
+    print_results(results)
+    write_results("micro", results, args.json_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python benchmarks/compare.py baseline.json current.json --threshold 0.2
+
+Exits 1 when any result present in both files got slower by more than the
+threshold (a fraction; every result is lower-is-better).  Results below
+``--min-value`` in the baseline are too noisy to judge and are skipped.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        report = json.load(fh)
+    return {r["name"]: r for r in report["results"]}
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_value: float = 0.0):
+    rows, regressions = [], []
+    for name, base in baseline.items():
+        now = current.get(name)
+        if now is None:
+            continue
+        change = (now["value"] - base["value"]) / base["value"] if base["value"] else 0.0
+        noisy = base["value"] < min_value
+        regressed = change > threshold and not noisy
+        rows.append((name, base["value"], now["value"], base["unit"], change, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--min-value", type=float, default=0.0, help="skip baseline values below this")
+    args = parser.parse_args(argv)
+
+    rows, regressions = compare(load(args.baseline), load(args.current), args.threshold, args.min_value)
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, before, after, unit, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {before:>12.3f} -> {after:>12.3f} {unit:<3} {change:+7.1%}{flag}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Local stand-in for the Gemini REST API.
+
+Answers ``:generateContent`` with one JSON body and ``:streamGenerateContent``
+with server-sent events over chunked HTTP/1.1 keep-alive, like the real API,
+and ``/v1/chat/completions`` like an OpenAI-compatible server.  Latency (with
+an optional slow tail), streaming pace, error rates and reply size are
+configurable, so the client can be load-tested without a key or network.
+
+    python benchmarks/mock_gemini.py --port 8765 --latency 80 --error-rate 0.05
+    CYBERGUARD_API_HOST=http://127.0.0.1:8765 python chatbot.py
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SENTENCES = (
+    "This looks like a phishing attempt designed to steal your login details.",
+    "The sender address does not match the company it claims to be from.",
+    "Hover over links before clicking to see where they really lead.",
+    "Enable two-factor authentication on your important accounts.",
+    "Never share one-time codes with anyone who contacts you first.",
+    "Keep your operating system and browser up to date.",
+    "Use a password manager to create a unique password for every site.",
+    "If in doubt, contact the company through its official website.",
+)
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 50.0  # Delay before the first byte of the reply
+    jitter_ms: float = 10.0  # Uniform +/- jitter on latency_ms
+    tail_rate: float = 0.0  # Fraction of requests that are slow stragglers
+    tail_ms: float = 2000.0  # Extra delay for those
+    chunk_delay_ms: float = 5.0  # Pause between streamed chunks
+    chunks: int = 8  # Streamed replies are split into this many events
+    reply_chars: int = 600  # Approximate reply length
+    error_rate: float = 0.0  # Fraction of requests answered with 503
+    rate_limit_rate: float = 0.0  # Fraction answered with 429 + Retry-After
+    rpm: int = 0  # Enforced requests-per-minute quota, answered like Gemini's 429
+    seed: int = None
+
+
+def reply_text(chars: int) -> str:
+    parts, total, index = [], 0, 0
+    while total < chars:
+        sentence = SENTENCES[index % len(SENTENCES)]
+        parts.append(sentence)
+        total += len(sentence) + 1
+        index += 1
+    return " ".join(parts)
+
+
+def _chunk(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+
+
+def _quota_error(rpm: int, retry: float) -> dict:
+    return {
+        "error": {
+            "code": 429,
+            "message": "You exceeded your current quota.",
+            "status": "RESOURCE_EXHAUSTED",
+            "details": [
+                {
+                    "@type": "type.googleapis.com/google.rpc.QuotaFailure",
+                    "violations": [
+                        {
+                            "quotaMetric": "generativelanguage.googleapis.com/generate_content_requests",
+                            "quotaId": "GenerateRequestsPerMinutePerProjectPerModel",
+                            "quotaValue": str(rpm),
+                        }
+                    ],
+                },
+                {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{max(1, math.ceil(retry))}s"},
+            ],
+        }
+    }
+
+
+def _openai_chunk(text: str, stream: bool) -> dict:
+    key = "delta" if stream else "message"
+    return {"choices": [{"index": 0, key: {"role": "assistant", "content": text}}]}
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: MockConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.rng_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "request_bytes": 0}
+        self.stats_lock = threading.Lock()
+        self.admitted = deque()  # Times of requests counted against config.rpm
+
+    def over_quota(self) -> float:
+        """Seconds until the rpm quota frees a slot, or 0 if this request fits."""
+        if not self.config.rpm:
+            return 0.0
+        with self.stats_lock:
+            now = time.monotonic()
+            while self.admitted and now - self.admitted[0] >= 60.0:
+                self.admitted.popleft()
+            if len(self.admitted) >= self.config.rpm:
+                return 60.0 - (now - self.admitted[0])
+            self.admitted.append(now)
+            return 0.0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def roll(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def count(self, **deltas):
+        with self.stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK and every reply gains ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *_args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        server, config = self.server, self.server.config
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        server.count(requests=1, request_bytes=len(body))
+        retry = server.over_quota()
+        if retry:
+            server.count(rate_limited=1)
+            return self._send_json(429, _quota_error(config.rpm, retry))
+        delay = config.latency_ms + (server.roll() * 2 - 1) * config.jitter_ms
+        if server.roll() < config.tail_rate:
+            delay += config.tail_ms
+        time.sleep(max(0.0, delay) / 1000.0)
+
+        roll = server.roll()
+        if roll < config.error_rate:
+            server.count(errors=1)
+            return self._send_json(503, {"error": {"code": 503, "message": "mock overload"}})
+        if roll < config.error_rate + config.rate_limit_rate:
+            server.count(rate_limited=1)
+            return self._send_json(429, {"error": {"code": 429, "message": "mock quota"}}, {"Retry-After": "1"})
+        text = reply_text(config.reply_chars)
+        if ":streamGenerateContent" in self.path:
+            return self._send_stream(text, _chunk)
+        if ":generateContent" in self.path:
+            return self._send_json(200, _chunk(text))
+        if self.path.endswith("/chat/completions"):
+            if json.loads(body or b"{}").get("stream"):
+                return self._send_stream(text, lambda t: _openai_chunk(t, True), done=b"data: [DONE]\r\n\r\n")
+            return self._send_json(200, _openai_chunk(text, False))
+        return self._send_json(404, {"error": {"code": 404, "message": "unknown method"}})
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, text, chunk, done=b""):
+        config = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = max(1, -(-len(text) // max(1, config.chunks)))
+        try:
+            for start in range(0, len(text), step):
+                event = f"data: {json.dumps(chunk(text[start:start + step]))}\r\n\r\n".encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.flush()
+                time.sleep(config.chunk_delay_ms / 1000.0)
+            if done:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(done), done))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # Client stopped reading early
+
+
+def start_server(config: MockConfig = None, host: str = "127.0.0.1", port: int = 0) -> MockGeminiServer:
+    """Start a mock server on a background thread; ``port=0`` picks a free port."""
+    server = MockGeminiServer((host, port), config or MockConfig())
+    threading.Thread(target=server.serve_forever, name="mock-gemini", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local mock Gemini API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=MockConfig.latency_ms, help="ms before the reply")
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter_ms)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of slow requests")
+    parser.add_argument("--tail", type=float, default=MockConfig.tail_ms, help="extra ms for slow requests")
+    parser.add_argument("--chunk-delay", type=float, default=MockConfig.chunk_delay_ms)
+    parser.add_argument("--chunks", type=int, default=MockConfig.chunks)
+    parser.add_argument("--reply-chars", type=int, default=MockConfig.reply_chars)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0, help="enforce a requests-per-minute quota")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = MockConfig(
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail,
+        chunk_delay_ms=args.chunk_delay,
+        chunks=args.chunks,
+        reply_chars=args.reply_chars,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rpm=args.rpm,
+        seed=args.seed,
+    )
+    server = MockGeminiServer((args.host, args.port), config)
+    settings = ", ".join(f"{f.name}={getattr(config, f.name)}" for f in fields(config))
+    print(f"mock Gemini API on {server.url} ({settings})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Persistent chat transcript in SQLite.
+
+Messages, scan verdicts and response timings go to a WAL-mode database.  All
+writes are queued to one writer thread that commits them in batches, so the
+GUI thread never waits on disk; repeated updates of a streaming message are
+coalesced into one.  Row ids are assigned by SQLite, so several running
+instances can share one file.  Reads (a page of messages, a full-text search)
+are small indexed queries on a separate connection.  Search uses FTS5 when SQLite was
+built with it and falls back to LIKE otherwise.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+DEFAULT_PAGE_SIZE = 50
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS messages ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, is_user INTEGER NOT NULL,"
+    " kind TEXT NOT NULL, text TEXT NOT NULL, elapsed REAL)"
+)
+_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, content='messages', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN"
+    " INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN"
+    " INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF text ON messages BEGIN"
+    " INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);"
+    " INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text); END",
+)
+_COLUMNS = "id, created, is_user, kind, text, elapsed"
+_STOP = object()
+
+
+@dataclass
+class HistoryRow:
+    id: int
+    created: float
+    is_user: bool
+    kind: str
+    text: str
+    elapsed: float = None
+    snippet: str = None
+
+
+def _row(values, snippet=None) -> HistoryRow:
+    id_, created, is_user, kind, text, elapsed = values
+    return HistoryRow(id_, created, bool(is_user), kind, text, elapsed, snippet)
+
+
+def _fts_query(query: str) -> str:
+    # Every word becomes a quoted prefix term, so user input can't break the syntax
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in query.split())
+
+
+class ChatHistoryStore:
+    def __init__(self, path, page_size: int = DEFAULT_PAGE_SIZE):
+        self.path = str(path)
+        self.page_size = page_size
+        self._read = self._connect()
+        self._read.execute(_SCHEMA)
+        self._read.execute("CREATE INDEX IF NOT EXISTS messages_created ON messages(created)")
+        try:
+            for statement in _FTS_SCHEMA:
+                self._read.execute(statement)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False  # SQLite built without FTS5
+        self._read.commit()
+        self._read_lock = threading.Lock()
+        self._id_lock = threading.Lock()
+        self._last_handle = 0
+        self._row_ids = {}  # Handle from append -> row id, once inserted
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="chat-history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # --- Writes (queued) --------------------------------------------------- #
+    def append(self, text: str, is_user: bool, kind: str = "text", elapsed: float = None) -> int:
+        """Queue a new message and return a handle for it right away.
+
+        Handles are negative until SQLite assigns the row id; ``update`` and
+        ``page_before`` take either.
+        """
+        with self._id_lock:
+            self._last_handle -= 1
+            handle = self._last_handle
+        self._queue.put(("insert", handle, (time.time(), int(is_user), kind, text, elapsed)))
+        return handle
+
+    def update(self, message_id: int, text: str = None, kind: str = None, elapsed: float = None):
+        self._queue.put(("update", message_id, {"text": text, "kind": kind, "elapsed": elapsed}))
+
+    def purge(self):
+        """Delete every saved message, including what is still queued, and
+        compact the file so the text does not linger in free pages."""
+        self._queue.put(("purge", None, None))
+        self.flush()
+
+    def flush(self, timeout: float = None):
+        """Block until everything queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(("flush", None, done))
+        done.wait(timeout)
+
+    def close(self, timeout: float = 2.0):
+        self._queue.put((_STOP, None, None))
+        self._writer.join(timeout)
+        with self._read_lock:
+            self._read.close()
+
+    # --- Reads ------------------------------------------------------------- #
+    def last_page(self, limit: int = None) -> list:
+        return self._page("SELECT {} FROM messages ORDER BY id DESC LIMIT ?", (limit or self.page_size,))
+
+    def page_before(self, message_id: int, limit: int = None) -> list:
+        """Up to ``limit`` messages older than ``message_id``, oldest first."""
+        if message_id < 0:
+            self.flush()  # Only a message from this run; wait until it has a row id
+            message_id = self._row_id(message_id)
+            if message_id is None:
+                return []
+        return self._page(
+            "SELECT {} FROM messages WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (message_id, limit or self.page_size),
+        )
+
+    def get(self, message_id: int):
+        with self._read_lock:
+            values = self._read.execute(
+                f"SELECT {_COLUMNS} FROM messages WHERE id = ?", (message_id,)
+            ).fetchone()
+        return None if values is None else _row(values)
+
+    def search(self, query: str, limit: int = 50) -> list:
+        """Newest matching messages first, each with a short highlighted snippet."""
+        if not query.strip():
+            return []
+        with self._read_lock:
+            if self.has_fts:
+                rows = self._read.execute(
+                    "SELECT m.id, m.created, m.is_user, m.kind, m.text, m.elapsed,"
+                    " snippet(messages_fts, 0, '[', ']', '…', 12)"
+                    " FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid"
+                    " WHERE messages_fts MATCH ? ORDER BY m.id DESC LIMIT ?",
+                    (_fts_query(query), limit),
+                ).fetchall()
+                return [_row(values[:-1], values[-1]) for values in rows]
+            rows = self._read.execute(
+                f"SELECT {_COLUMNS} FROM messages WHERE text LIKE ? ORDER BY id DESC LIMIT ?",
+                (f"%{query.strip()}%", limit),
+            ).fetchall()
+        return [_row(values, values[4][:120]) for values in rows]
+
+    def _row_id(self, message_id: int):
+        if message_id > 0:
+            return message_id
+        with self._id_lock:
+            return self._row_ids.get(message_id)
+
+    def _page(self, sql, params) -> list:
+        with self._read_lock:
+            rows = self._read.execute(sql.format(_COLUMNS), params).fetchall()
+        return [_row(values) for values in reversed(rows)]
+
+    # --- Writer thread ----------------------------------------------------- #
+    def _write_loop(self):
+        db = self._connect()
+        try:
+            while True:
+                ops = [self._queue.get()]
+                # Whatever piled up while the last batch committed goes in one transaction
+                while True:
+                    try:
+                        ops.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = self._apply(db, ops)
+                if stop:
+                    return
+        finally:
+            db.close()
+
+    def _apply(self, db, ops) -> bool:
+        inserts, updates, waiters, stop, purge = {}, {}, [], False, False
+        for op, message_id, value in ops:
+            if op == "insert":
+                inserts[message_id] = list(value)
+            elif op == "update":
+                fields = {k: v for k, v in value.items() if v is not None}
+                if message_id in inserts:
+                    # Not written yet: fold the update into the pending insert
+                    row = inserts[message_id]
+                    row[2] = fields.get("kind", row[2])
+                    row[3] = fields.get("text", row[3])
+                    row[4] = fields.get("elapsed", row[4])
+                else:
+                    updates.setdefault(message_id, {}).update(fields)
+            elif op == "purge":
+                inserts.clear()
+                updates.clear()
+                purge = True
+            elif op == "flush":
+                waiters.append(value)
+            elif op is _STOP:
+                stop = True
+        row_ids = {}
+        try:
+            with db:
+                if purge:
+                    db.execute("DELETE FROM messages")
+                    if self.has_fts:
+                        # Deleted rows leave their words in the index segments until a rebuild
+                        db.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+                for handle, row in inserts.items():
+                    row_ids[handle] = db.execute(
+                        "INSERT INTO messages (created, is_user, kind, text, elapsed) VALUES (?, ?, ?, ?, ?)", row
+                    ).lastrowid
+                for message_id, fields in updates.items():
+                    row_id = row_ids.get(message_id) or self._row_id(message_id)
+                    if fields and row_id is not None:
+                        assignments = ", ".join(f"{name} = ?" for name in fields)
+                        db.execute(f"UPDATE messages SET {assignments} WHERE id = ?", (*fields.values(), row_id))
+        except sqlite3.Error:
+            row_ids = {}  # History is best effort; never take the app down over it
+        if purge:
+            try:
+                db.execute("VACUUM")
+                db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+        with self._id_lock:
+            if purge:
+                self._row_ids.clear()
+            self._row_ids.update(row_ids)
+        for waiter in waiters:
+            waiter.set()
+        return stop
@@ -1,50 +1,132 @@
+import time
+
+_STARTUP_MARKS = [("module start", time.perf_counter())]
+
 import sys
 import os
-import json
-import base64
-import io
+import argparse
+import math
 import pathlib
+import re
 import threading
-import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List
-
-from PIL import ImageGrab
-from window_select import WindowSelectDialog, grab_selected_window
-from screenshot_worker import ScreenshotWorker
-from tts import speak_text
-import requests
-from PySide6.QtCore import Qt, QPoint, QSize, QThread, Signal, QObject, QTimer
-from PySide6.QtGui import QColor, QPainter, QPalette, QFont, QAction
+
+# Screenshot, TTS, image and network modules are imported on first use so the
+# window can paint before they load; see MainWindow.scan_screen and friends.
+import http_pool
+import tracing
+from chat_history import ChatHistoryStore
+from conversation import Conversation
+from rich_text import Rendered, html_chunks, preview, render
+from scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestCancelled, RequestScheduler
+from single_flight import flight_key
+from advisor_core import (
+    API_KEY_FILE,
+    GENERATION_CONFIG,
+    MODEL_NAME,
+    GeminiClient,
+    clean_for_tts,
+    load_api_key,
+    local_answer,
+    short_summary_complete,
+    summarize_response_short,
+)
+
+_STARTUP_MARKS.append(("stdlib + advisor core imports", time.perf_counter()))
+
+from PySide6.QtCore import (
+    Qt,
+    QAbstractListModel,
+    QModelIndex,
+    QPointF,
+    QRectF,
+    QSize,
+    QSizeF,
+    QThread,
+    QThreadPool,
+    Signal,
+    QObject,
+    QTimer,
+    QEvent,
+)
+from PySide6.QtGui import (
+    QColor,
+    QPainter,
+    QPalette,
+    QFont,
+    QImage,
+    QAction,
+    QKeySequence,
+    QTextDocument,
+    QAbstractTextDocumentLayout,
+)
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
     QWidget,
     QVBoxLayout,
     QHBoxLayout,
-    QScrollArea,
     QLineEdit,
     QPushButton,
     QLabel,
+    QListView,
+    QListWidget,
+    QListWidgetItem,
+    QPlainTextEdit,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
+    QStyledItemDelegate,
+    QStyle,
     QSplitter,
     QDialog,
     QFormLayout,
     QDialogButtonBox,
     QMessageBox,
     QSizePolicy,
-    QFrame,
-    QFileDialog,
 )
 
+_STARTUP_MARKS.append(("PySide6 imports", time.perf_counter()))
+
 ###############################################################################
 # ────────────────────────────── CONFIG ───────────────────────────────────── #
 ###############################################################################
 
 APP_NAME = "Cybersecurity Advisor"
-API_KEY_ENV = "GEMINI_API_KEY"
-API_KEY_FILE = pathlib.Path("api_key.txt")
-MODEL_NAME = "gemini-2.0-flash"
 CHAT_WIDTH_MAX = 600
+HTTP_POOL_SIZE = int(os.getenv("CYBERGUARD_HTTP_POOL_SIZE", "8"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("CYBERGUARD_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("CYBERGUARD_READ_TIMEOUT", "60"))
+HTTP_KEEPALIVE = os.getenv("CYBERGUARD_KEEPALIVE", "1") != "0"
+HTTP2_ENABLED = os.getenv("CYBERGUARD_HTTP2", "0") == "1"
+STREAM_RESPONSES = os.getenv("CYBERGUARD_STREAM", "1") != "0"
+STREAM_REPAINT_MS = 50  # Minimum interval between repaints of a streaming bubble
+SYNC_RENDER_CHARS = 4000  # Longer texts are rendered, laid out and painted off the GUI thread
+BUBBLE_TILE_HEIGHT = 512  # Pixels per tile of a long text painted off the GUI thread
+MAX_CACHED_TILES = 8  # Per message and width; tiles far from the view are dropped beyond this
+MAX_RENDERED_DOCS = 8  # Long-text layouts kept on the render thread
+LAYOUT_CHUNK_CHARS = 4000  # HTML per document when a long text is laid out in pieces
+RESPONSE_CACHE_FILE = pathlib.Path("response_cache.sqlite3")
+RESPONSE_CACHE_SIZE = 256  # Entries kept in memory; the SQLite store keeps more
+HISTORY_FILE = pathlib.Path("chat_history.sqlite3")
+HISTORY_PAGE_SIZE = 50  # Messages loaded at startup and per scroll-up
+HISTORY_LOAD_MARGIN = 200  # Pixels from the top at which the next page loads
+RESPONSE_CACHE_TTL = float(os.getenv("CYBERGUARD_CACHE_TTL", str(7 * 24 * 3600)))
+CAPTURE_MAX_SIZE = (1920, 1080)  # Screenshots are downscaled to fit this box
+CAPTURE_FORMAT = os.getenv("CYBERGUARD_CAPTURE_FORMAT", "JPEG")  # JPEG, WEBP or PNG
+CAPTURE_QUALITY = int(os.getenv("CYBERGUARD_CAPTURE_QUALITY", "80"))
+WATCH_INTERVAL_MS = int(os.getenv("CYBERGUARD_WATCH_INTERVAL_MS", "5000"))
+SCAN_DEBOUNCE_MS = 800  # Further "Scan screen" clicks within this window are ignored
+WORKER_POOL_SIZE = int(os.getenv("CYBERGUARD_WORKERS", "4"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("CYBERGUARD_HISTORY_TOKENS", "3000"))  # Per request
+HISTORY_RECENT_TURNS = 4  # Sent verbatim; older turns are summarized
+TRACE_ENABLED = os.getenv("CYBERGUARD_TRACE", "1") != "0"
+TRACE_JSONL_FILE = os.getenv("CYBERGUARD_TRACE_JSONL")  # Optional JSON-lines span log
+TRACE_PROM_FILE = os.getenv("CYBERGUARD_TRACE_PROM")  # Optional node-exporter textfile
+SHUTDOWN_GRACE = 1.0  # Seconds closeEvent waits for cancelled requests to unwind
 THEME_DARK = {
     "bg": "#000000",
     "panel": "#111111",
@@ -60,187 +142,608 @@ THEME_DARK = {
 # ──────────────────────────── CORE HELPERS ───────────────────────────────── #
 ###############################################################################
 
-def load_api_key() -> str:
-    key = os.getenv(API_KEY_ENV, "").strip()
-    if key:
-        return key
-    if API_KEY_FILE.exists():
-        try:
-            return API_KEY_FILE.read_text().strip()
-        except Exception:
-            pass
-    return ""
-
 def save_api_key(key: str):
     try:
         API_KEY_FILE.write_text(key.strip())
     except Exception as exc:
         QMessageBox.warning(None, "Save error", f"Could not save key: {exc}")
 
+@dataclass
+class Reply:
+    """A model answer post-processed off the GUI thread, ready to show and speak."""
+
+    text: str
+    rendered: Rendered
+    speech: str
+
+def prepare_reply(text: str, shorten=True, clean_speech=True) -> Reply:
+    response = summarize_response_short(text) if shorten else text.strip()
+    speech = clean_for_tts(response) if clean_speech else response
+    return Reply(response, render(response), speech)
+
 ###############################################################################
 # ────────────────────────── NETWORK WORKER ──────────────────────────────── #
 ###############################################################################
 
-class GeminiWorker(QThread):
+class GeminiWorker(QObject):
+    """One Gemini request; run() executes on a RequestScheduler thread."""
+
     responseReady = Signal(str)
+    replyReady = Signal(object)  # prepare(text), computed on the worker thread
+    partialText = Signal(str)  # Accumulated text so far, only when streaming
     error = Signal(str)
+    finished = Signal()
 
-    def __init__(self, prompt: str, api_key: str, is_image=False):
+    def __init__(
+        self,
+        prompt: str,
+        api_key: str,
+        is_image=False,
+        stream=False,
+        stop_when=None,
+        processor=None,
+        differ=None,
+        history=None,
+        prepare=None,
+    ):
         super().__init__()
         self.prompt = prompt
         self.api_key = api_key
         self.is_image = is_image  # If True the prompt is base64 screenshot
+        self.stream = stream
+        self.stop_when = stop_when  # Optional callable(text) -> bool to end a stream early
+        self.processor = processor  # Optional CaptureProcessor for screenshots
+        self.differ = differ  # Optional FrameDiffer: only analyze what changed
+        self.history = history  # Earlier turns as Gemini contents, text prompts only
+        self.prepare = prepare  # Optional callable(text) -> Reply for replyReady
+        self.client = GeminiClient(api_key)
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
 
     def run(self):
         try:
-            if self.is_image:
-                text = self._analyze_image()
+            options = dict(
+                stream=self.stream,
+                on_partial=self.partialText.emit,
+                stop_when=self.stop_when,
+                cancelled=self._cancelled,
+            )
+            if self.is_image and self.differ is not None:
+                text = self.client.analyze_changes(
+                    self.prompt, self.differ, processor=self.processor, **options
+                )
+            elif self.is_image:
+                text = self.client.analyze_image(self.prompt, processor=self.processor, **options)
             else:
-                text = self._query_text()
-            self.responseReady.emit(text)
+                text = self.client.query_text(self.prompt, history=self.history, **options)
+            # None means the frame did not change enough to be worth a request
+            if text is not None and not self.is_cancelled():
+                self.responseReady.emit(text)
+                if self.prepare is not None:
+                    self.replyReady.emit(self.prepare(text))
+        except RequestCancelled:
+            pass
         except Exception as exc:
-            self.error.emit(str(exc))
-
-    # --- Internal helpers -------------------------------------------------- #
-    def _post(self, payload: dict) -> dict:
-        url = (
-            f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_NAME}:generateContent?key={self.api_key}"
-        )
-        resp = requests.post(url, json=payload, timeout=60)
-        if resp.status_code != 200:
-            raise RuntimeError(f"Gemini API {resp.status_code}: {resp.text[:200]}")
-        return resp.json()
-
-    def _query_text(self) -> str:
-        payload = {
-            "contents": [
-                {
-                    "parts": [
-                        {
-                            "text": (
-                                "You are a cybersecurity expert advisor. Explain in plain language: "
-                                + self.prompt
-                            )
-                        }
-                    ]
-                }
-            ],
-            "generationConfig": {
-                "temperature": 0.2,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 1024,
-            },
-        }
-        data = self._post(payload)
-        return data["candidates"][0]["content"]["parts"][0]["text"].strip()
-
-    def _analyze_image(self) -> str:
-        payload = {
-            "contents": [
-                {
-                    "parts": [
-                        {
-                            "text": (
-                                "As a cybersecurity expert, analyze this screenshot for threats and "
-                                "explain findings in simple terms."
-                            )
-                        },
-                        {
-                            "inline_data": {
-                                "mime_type": "image/png",
-                                "data": self.prompt,  # base64
-                            }
-                        },
-                    ]
-                }
-            ],
-            "generationConfig": {
-                "temperature": 0.2,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 1024,
-            },
-        }
-        data = self._post(payload)
-        return data["candidates"][0]["content"]["parts"][0]["text"].strip()
+            if not self.is_cancelled():
+                self.error.emit(str(exc))
+        finally:
+            self.finished.emit()
 
 ###############################################################################
 # ───────────────────────── GUI COMPONENTS ───────────────────────────────── #
 ###############################################################################
 
-import re
-class Bubble(QFrame):
-    def __init__(self, text: str, is_user: bool):
-        super().__init__()
+BUBBLE_STYLE = f"""
+p, ul, ol, pre {{ margin-top: 0px; margin-bottom: 6px; }}
+code, pre {{ background-color: {THEME_DARK['user_bubble']}; }}
+"""
+_STYLED_RE = re.compile(r"<(?:p|ul|ol|pre|code)>")  # Markup BUBBLE_STYLE applies to
+
+def layout_document(html: str, width: int, font: QFont) -> QTextDocument:
+    doc = QTextDocument()
+    doc.setUndoRedoEnabled(False)
+    doc.setDocumentMargin(0)
+    doc.setDefaultFont(font)
+    if _STYLED_RE.search(html):
+        doc.setDefaultStyleSheet(BUBBLE_STYLE)
+    doc.setHtml(html)
+    doc.setTextWidth(width)
+    doc.pageCount()  # Finishes the otherwise lazy layout now, on the calling thread
+    return doc
+
+def detached_font(font: QFont) -> QFont:
+    """A copy of ``font`` for another thread.  Plain copies share private data
+    on which Qt caches per-thread font engines, and race when both threads lay
+    out text."""
+    copy = QFont(font.families())
+    copy.fromString(font.toString())
+    return copy
+
+def text_palette_context() -> QAbstractTextDocumentLayout.PaintContext:
+    context = QAbstractTextDocumentLayout.PaintContext()
+    palette = QPalette()
+    palette.setColor(QPalette.Text, QColor(THEME_DARK["text"]))
+    context.palette = palette
+    return context
+
+class ChatMessage:
+    __slots__ = ("seq", "db_id", "text", "display", "html", "is_user", "layouts", "tiled", "version")
+
+    def __init__(self, text: str, is_user: bool, db_id=None, rendered: Rendered = None):
+        self.seq = 0
+        self.db_id = db_id  # Row id in the chat history store, None if not persisted
         self.is_user = is_user
-        # Remove *, **, _, and extra whitespace from text, and strip emojis
-        clean_text = re.sub(r'[\*_`]', '', text)
-        clean_text = re.sub(r'[\u2600-\u27BF\U0001f300-\U0001f64F\U0001f680-\U0001f6FF\U0001f700-\U0001f77F\U0001f780-\U0001f7FF\U0001f800-\U0001f8FF\U0001f900-\U0001f9FF\U0001fa00-\U0001fa6F\U0001fa70-\U0001faff\U00002702-\U000027B0]+', '', clean_text)
-        self.text_label = QLabel(clean_text)
-        self.text_label.setWordWrap(True)
-        self.text_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        self.text_label.setStyleSheet("color: " + THEME_DARK["text"])
-        self.text_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.addWidget(self.text_label)
-        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Minimum)
-        self.setMinimumWidth(200)
-        self.setMaximumWidth(800)
-        self.setStyleSheet(
-            (
-                f"background-color: {THEME_DARK['user_bubble' if is_user else 'assistant_bubble']};"
-                "border-radius: 10px; padding: 12px;"
+        self.layouts = {}  # text width -> laid-out QTextDocument, or TiledLayout if tiled
+        self.version = 0  # Bumped per edit so renders of superseded text are dropped
+        self.set_text(text, rendered)
+
+    def set_text(self, text: str, rendered: Rendered = None):
+        if rendered is None:
+            rendered = render(text, markdown=not self.is_user)
+        self.text = text
+        self.display = rendered.display
+        self.html = rendered.html
+        self.tiled = False  # Set once BubbleRenderer has laid the html out
+        self.layouts.clear()
+
+class TiledLayout:
+    """A long text laid out on the render thread, painted from finished tiles."""
+
+    __slots__ = ("width", "height", "tiles")
+
+    def __init__(self, width: int, height: float):
+        self.width = width
+        self.height = height
+        self.tiles = {}  # tile index -> QImage, or None while it is being drawn
+
+    def size(self) -> QSizeF:
+        return QSizeF(self.width, self.height)
+
+    def trim(self, first: int, last: int):
+        if len(self.tiles) > MAX_CACHED_TILES:
+            for index in [i for i in self.tiles if i < first - 1 or i > last + 1]:
+                del self.tiles[index]
+
+class BubbleRenderer(QObject):
+    """Renders, lays out and paints long bubble texts on one worker thread.
+
+    Text laid out on a thread keeps using that thread's font engines, so the
+    QTextDocuments built here never leave the render thread: the GUI thread
+    only receives their height and finished tiles to draw.  PySide holds the
+    GIL through every Qt call, so a long text is laid out as a stack of small
+    documents and the GUI thread gets to run between them.
+    """
+
+    laidOut = Signal(object)  # (msg, version, text, rendered, width, height, relayout)
+    tileReady = Signal(object)  # (msg, version, layout, index, image)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        # The thread must outlive the documents that use its font engines
+        self._pool.setExpiryTimeout(-1)
+        self._relayouts = {}  # Message -> latest width asked for by relayout, GUI thread
+        self._docs = OrderedDict()  # (msg, width) -> (html, [(top, QTextDocument)]), render thread
+        self._context = None
+
+    def layout(self, msg, text, rendered, width, font, relayout=False):
+        job = (msg, msg.version, text, rendered, width, detached_font(font), relayout)
+        self._pool.start(lambda: self._layout(*job))
+
+    def relayout(self, msg, width, font):
+        """Lay the current rendering out at a new width; repeats are ignored."""
+        if self._relayouts.get(msg) != width:
+            self._relayouts[msg] = width
+            self.layout(msg, msg.text, Rendered(msg.display, msg.html), width, font, relayout=True)
+
+    def settled(self, msg, width):
+        if self._relayouts.get(msg) == width:
+            del self._relayouts[msg]
+
+    def tile(self, msg, layout, index, font, scale):
+        job = (msg, msg.version, msg.html, layout, index, detached_font(font), scale)
+        self._pool.start(lambda: self._tile(*job))
+
+    def forget(self):
+        self._relayouts.clear()
+        self._pool.clear()
+        self._pool.start(self._docs.clear)
+
+    def shutdown(self, timeout: float):
+        self.forget()
+        self._pool.waitForDone(int(timeout * 1000))
+
+    # The methods below run on the render thread
+
+    def _stack(self, msg, html, width, font) -> list:
+        key = (msg, width)
+        cached = self._docs.get(key)
+        if cached is not None and cached[0] == html:
+            self._docs.move_to_end(key)
+            return cached[1]
+        stack, top = [], 0.0
+        for chunk in html_chunks(html, LAYOUT_CHUNK_CHARS):
+            doc = layout_document(chunk, width, font)
+            stack.append((top, doc))
+            top += doc.size().height()
+        self._docs[key] = (html, stack)
+        while len(self._docs) > MAX_RENDERED_DOCS:
+            self._docs.popitem(last=False)
+        return stack
+
+    def _layout(self, msg, version, text, rendered, width, font, relayout):
+        if msg.version != version or (relayout and self._relayouts.get(msg) != width):
+            return  # Superseded while queued, by the next streamed chunk or another resize
+        with tracing.span("gui.render"):
+            if rendered is None:
+                rendered = render(text, markdown=not msg.is_user)
+            top, doc = self._stack(msg, rendered.html, width, font)[-1]
+            height = top + doc.size().height()
+        self._emit(self.laidOut, (msg, version, text, rendered, width, height, relayout))
+
+    def _tile(self, msg, version, html, layout, index, font, scale):
+        if msg.version != version:
+            return
+        with tracing.span("gui.render_tile"):
+            stack = self._stack(msg, html, layout.width, font)
+            image = QImage(
+                math.ceil(layout.width * scale),
+                math.ceil(BUBBLE_TILE_HEIGHT * scale),
+                QImage.Format_ARGB32_Premultiplied,
             )
+            image.setDevicePixelRatio(scale)
+            image.fill(Qt.transparent)
+            if self._context is None:
+                self._context = text_palette_context()
+            top = index * BUBBLE_TILE_HEIGHT
+            painter = QPainter(image)
+            for offset, doc in stack:
+                if offset >= top + BUBBLE_TILE_HEIGHT:
+                    break
+                if offset + doc.size().height() <= top:
+                    continue
+                painter.save()
+                painter.translate(0, offset - top)
+                self._context.clip = QRectF(0, top - offset, layout.width, BUBBLE_TILE_HEIGHT)
+                doc.documentLayout().draw(painter, self._context)
+                painter.restore()
+            painter.end()
+        self._emit(self.tileReady, (msg, version, layout, index, image))
+
+    @staticmethod
+    def _emit(signal, job):
+        try:
+            signal.emit(job)
+        except RuntimeError:
+            pass  # The chat was closed while rendering
+
+class ChatModel(QAbstractListModel):
+    MessageRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._messages = []
+        self._first_seq = 0  # seq of row 0; rows map to seq - _first_seq
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        msg = self._messages[index.row()]
+        if role == Qt.DisplayRole:
+            return msg.display
+        if role == self.MessageRole:
+            return msg
+        return None
+
+    def append(self, msg: ChatMessage):
+        row = len(self._messages)
+        msg.seq = self._first_seq + row
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._messages.append(msg)
+        self.endInsertRows()
+
+    def prepend(self, msgs):
+        if not msgs:
+            return
+        self._first_seq -= len(msgs)
+        for offset, msg in enumerate(msgs):
+            msg.seq = self._first_seq + offset
+        self.beginInsertRows(QModelIndex(), 0, len(msgs) - 1)
+        self._messages[:0] = msgs
+        self.endInsertRows()
+
+    def oldest_persisted(self):
+        return next((msg for msg in self._messages if msg.db_id is not None), None)
+
+    def index_of(self, msg: ChatMessage) -> QModelIndex:
+        row = msg.seq - self._first_seq
+        if 0 <= row < len(self._messages) and self._messages[row] is msg:
+            return self.index(row)
+        return QModelIndex()
+
+    def message_changed(self, msg: ChatMessage) -> QModelIndex:
+        index = self.index_of(msg)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+        return index
+
+    def clear(self):
+        self.beginResetModel()
+        self._first_seq += len(self._messages)
+        self._messages = []
+        self.endResetModel()
+
+class BubbleDelegate(QStyledItemDelegate):
+    PADDING = 12
+    MARGIN = 6
+    RADIUS = 10
+    MAX_CACHED_WIDTHS = 4
+
+    def __init__(self, view, renderer: BubbleRenderer = None):
+        super().__init__(view)
+        self.view = view
+        self.renderer = renderer  # Lays out and paints tiled messages off the GUI thread
+        self._context = text_palette_context()
+
+    def _bubble_width(self) -> int:
+        return max(200, min(800, self.view.viewport().width() * 2 // 3))
+
+    def text_width(self) -> int:
+        return self._bubble_width() - 2 * self.PADDING
+
+    def _layout(self, msg: ChatMessage, font):
+        text_width = self.text_width()
+        layout = msg.layouts.get(text_width)
+        if layout is None:
+            if msg.tiled and self.renderer is not None:
+                # Keep painting a cached width until the render thread has this one
+                self.renderer.relayout(msg, text_width, font)
+                return next(iter(msg.layouts.values()))
+            if len(msg.layouts) >= self.MAX_CACHED_WIDTHS:
+                msg.layouts.clear()
+            layout = layout_document(msg.html, text_width, font)
+            msg.layouts[text_width] = layout
+        return layout
+
+    def sizeHint(self, option, index):
+        msg = index.data(ChatModel.MessageRole)
+        height = self._layout(msg, self.view.font()).size().height()
+        return QSize(self._bubble_width(), int(height) + 2 * (self.PADDING + self.MARGIN))
+
+    def paint(self, painter, option, index):
+        with tracing.span("gui.paint"):
+            self._paint(painter, option, index)
+
+    def _paint(self, painter, option, index):
+        msg = index.data(ChatModel.MessageRole)
+        layout = self._layout(msg, self.view.font())
+        width = self._bubble_width()
+        if msg.is_user:
+            left = option.rect.right() - width - self.MARGIN
+        else:
+            left = option.rect.left() + self.MARGIN
+        bubble = QRectF(
+            left, option.rect.top() + self.MARGIN, width, layout.size().height() + 2 * self.PADDING
         )
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        if option.state & QStyle.State_Selected:
+            painter.setPen(QColor(THEME_DARK["subtext"]))
+        else:
+            painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(THEME_DARK["user_bubble" if msg.is_user else "assistant_bubble"]))
+        painter.drawRoundedRect(bubble, self.RADIUS, self.RADIUS)
+        origin = QPointF(bubble.left() + self.PADDING, bubble.top() + self.PADDING)
+        painter.translate(origin)
+        # Only what is inside the viewport; a long reply is far taller than the view
+        visible = QRectF(self.view.viewport().rect()).translated(-origin)
+        if isinstance(layout, TiledLayout):
+            self._paint_tiles(painter, msg, layout, visible)
+        else:
+            self._context.clip = visible
+            layout.documentLayout().draw(painter, self._context)
+        painter.restore()
+
+    def _paint_tiles(self, painter, msg, layout, visible):
+        first = max(0, int(visible.top()) // BUBBLE_TILE_HEIGHT)
+        last = min(int(layout.height), int(visible.bottom())) // BUBBLE_TILE_HEIGHT
+        for index in range(first, last + 1):
+            image = layout.tiles.get(index)
+            if image is not None:
+                painter.drawImage(QPointF(0, index * BUBBLE_TILE_HEIGHT), image)
+            elif index not in layout.tiles:
+                # Drawn on the render thread; the bubble fills in when it lands
+                layout.tiles[index] = None
+                self.renderer.tile(msg, layout, index, self.view.font(), self.view.devicePixelRatioF())
+        layout.trim(first, last)
 
 class ChatArea(QWidget):
-    def __init__(self):
+    def __init__(self, history: ChatHistoryStore = None):
         super().__init__()
-        self.vbox = QVBoxLayout()
-        self.vbox.addStretch(1)
-        container = QWidget()
-        container.setLayout(self.vbox)
-
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setWidget(container)
-        self.scroll.setStyleSheet("border: none;")
-        self.scroll.setMinimumWidth(400)
-        self.scroll.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.history = history
+        self._has_older = history is not None
+        self._scroll_anchor = None  # Distance from the bottom to keep while prepending
+        self.model = ChatModel(self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self._renderer = BubbleRenderer(self)
+        self._renderer.laidOut.connect(self._apply_layout)
+        self._renderer.tileReady.connect(self._apply_tile)
+        self.view.setItemDelegate(BubbleDelegate(self.view, self._renderer))
+        self.view.setUniformItemSizes(False)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setBatchSize(500)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.setStyleSheet(f"border: none; background: {THEME_DARK['bg']};")
+        self.view.setMinimumWidth(400)
+        self.view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        copy_action = QAction("Copy", self.view)
+        copy_action.setShortcut(QKeySequence.Copy)
+        copy_action.triggered.connect(self.copy_selection)
+        self.view.addAction(copy_action)
+        self.view.setContextMenuPolicy(Qt.ActionsContextMenu)
         main_layout = QVBoxLayout(self)
-        main_layout.addWidget(self.scroll)
-
-    def add_message(self, text: str, is_user: bool):
-        bubble = Bubble(text, is_user)
-        wrapper = QHBoxLayout()
-        if is_user:
-            wrapper.addStretch(1)
-            wrapper.addWidget(bubble, stretch=2)
-        else:
-            wrapper.addWidget(bubble, stretch=2)
-            wrapper.addStretch(1)
-        wrapper.setAlignment(Qt.AlignTop)
-        self.vbox.insertLayout(self.vbox.count() - 1, wrapper)
-        QTimer.singleShot(100, lambda: self.scroll.verticalScrollBar().setValue(self.scroll.verticalScrollBar().maximum()))
+        main_layout.addWidget(self.view)
+
+        # Follow new messages while the user is at the bottom of the transcript
+        self._stick_to_bottom = True
+        bar = self.view.verticalScrollBar()
+        bar.rangeChanged.connect(self._on_range_changed)
+        bar.valueChanged.connect(self._on_scrolled)
+
+        # Streaming updates are coalesced and applied at most once per interval
+        self._pending_text = {}
+        self._repaint_timer = QTimer(self)
+        self._repaint_timer.setSingleShot(True)
+        self._repaint_timer.setInterval(STREAM_REPAINT_MS)
+        self._repaint_timer.timeout.connect(self._flush_pending)
+
+    def add_message(
+        self, text: str, is_user: bool, kind: str = "text", rendered: Rendered = None
+    ) -> ChatMessage:
+        """``kind`` "system" messages are shown but not saved to the history."""
+        with tracing.span("gui.add_message"):
+            msg = self._message(text, is_user, rendered=rendered)
+            if self.history is not None and kind != "system":
+                msg.db_id = self.history.append(text, is_user, kind)
+            self.model.append(msg)
+        # _on_range_changed scrolls once the view has laid out the new row
+        self._stick_to_bottom = True
+        return msg
+
+    def update_message(self, msg: ChatMessage, text: str, immediate=False, rendered: Rendered = None):
+        self._pending_text[msg] = (text, rendered)
+        if immediate:
+            self._flush_pending()
+        elif not self._repaint_timer.isActive():
+            self._repaint_timer.start()
+
+    def set_message_meta(self, msg: ChatMessage, kind: str = None, elapsed: float = None):
+        if self.history is not None and msg.db_id is not None:
+            self.history.update(msg.db_id, kind=kind, elapsed=elapsed)
+
+    def load_history(self) -> int:
+        """Show the most recent page of saved messages; returns how many."""
+        if self.history is None:
+            return 0
+        rows = self.history.last_page(HISTORY_PAGE_SIZE)
+        self._has_older = len(rows) == HISTORY_PAGE_SIZE
+        for row in rows:
+            self.model.append(self._message(row.text, row.is_user, row.id))
+        return len(rows)
+
+    def _load_older(self):
+        oldest = self.model.oldest_persisted()
+        if not self._has_older or oldest is None:
+            return
+        rows = self.history.page_before(oldest.db_id, HISTORY_PAGE_SIZE)
+        self._has_older = len(rows) == HISTORY_PAGE_SIZE
+        if not rows:
+            return
+        bar = self.view.verticalScrollBar()
+        self._scroll_anchor = bar.maximum() - bar.value()
+        self.model.prepend([self._message(row.text, row.is_user, row.id) for row in rows])
+
+    def _flush_pending(self):
+        self._repaint_timer.stop()
+        pending, self._pending_text = self._pending_text, {}
+        delegate = self.view.itemDelegate()
+        for msg, (text, rendered) in pending.items():
+            shown = self._set_text(msg, text, rendered)
+            if self.history is not None and msg.db_id is not None:
+                self.history.update(msg.db_id, text)
+            index = self.model.message_changed(msg) if shown else QModelIndex()
+            if index.isValid():
+                delegate.sizeHintChanged.emit(index)
+
+    def _message(self, text, is_user, db_id=None, rendered=None) -> ChatMessage:
+        if len(text) <= SYNC_RENDER_CHARS:
+            return ChatMessage(text, is_user, db_id, rendered)
+        msg = ChatMessage(text, is_user, db_id, preview(text))
+        self._layout_later(msg, text, rendered)
+        return msg
+
+    def _set_text(self, msg, text, rendered=None) -> bool:
+        """Short text is shown at once; long text keeps the bubble's current
+        look until the render thread has laid out the new one."""
+        msg.version += 1
+        if len(text) <= SYNC_RENDER_CHARS:
+            msg.set_text(text, rendered)
+            return True
+        msg.text = text
+        self._layout_later(msg, text, rendered)
+        return False
+
+    def _layout_later(self, msg, text, rendered):
+        width = self.view.itemDelegate().text_width()
+        self._renderer.layout(msg, text, rendered, width, self.view.font())
+
+    def _apply_layout(self, job):
+        msg, version, text, rendered, width, height, relayout = job
+        if relayout:
+            self._renderer.settled(msg, width)
+        if msg.version != version:
+            return
+        if not relayout:
+            msg.set_text(text, rendered)
+        elif rendered.html is not msg.html:
+            return  # The full rendering of a previewed reply landed first
+        elif len(msg.layouts) >= BubbleDelegate.MAX_CACHED_WIDTHS:
+            del msg.layouts[next(iter(msg.layouts))]
+        msg.tiled = True
+        msg.layouts[width] = TiledLayout(width, height)
+        index = self.model.message_changed(msg)
+        if index.isValid():
+            self.view.itemDelegate().sizeHintChanged.emit(index)
+
+    def _apply_tile(self, job):
+        msg, version, layout, index, image = job
+        if msg.version == version and msg.layouts.get(layout.width) is layout and index in layout.tiles:
+            layout.tiles[index] = image
+            self.model.message_changed(msg)
+
+    def _on_range_changed(self, _minimum, maximum):
+        if self._scroll_anchor is not None:
+            # Older messages were inserted above: keep the same rows in view
+            self.view.verticalScrollBar().setValue(maximum - self._scroll_anchor)
+            self._scroll_anchor = None
+        elif self._stick_to_bottom:
+            self.view.verticalScrollBar().setValue(maximum)
+
+    def _on_scrolled(self, value):
+        bar = self.view.verticalScrollBar()
+        self._stick_to_bottom = value >= bar.maximum() - 4
+        if value <= HISTORY_LOAD_MARGIN and self._has_older and bar.maximum() > 0:
+            QTimer.singleShot(0, self._load_older)
+
+    def copy_selection(self):
+        rows = sorted(index.row() for index in self.view.selectedIndexes())
+        texts = [self.model.index(row).data(Qt.DisplayRole) for row in rows]
+        if texts:
+            QApplication.clipboard().setText("\n\n".join(texts))
 
     def clear_chat(self):
-        # Remove all layouts except the last stretch
-        while self.vbox.count() > 1:
-            item = self.vbox.takeAt(0)
-            if item is not None:
-                if item.layout():
-                    # Remove all widgets from the layout
-                    layout = item.layout()
-                    while layout.count():
-                        witem = layout.takeAt(0)
-                        widget = witem.widget()
-                        if widget is not None:
-                            widget.deleteLater()
-                    layout.deleteLater()
-                elif item.widget():
-                    item.widget().deleteLater()
+        # Clears the view only; the saved history stays searchable until
+        # MainWindow.delete_history purges it
+        self._flush_pending()
+        self._has_older = False
+        self._renderer.forget()
+        self.model.clear()
+
+    def shutdown(self):
+        self._renderer.shutdown(SHUTDOWN_GRACE)
 
 ###############################################################################
 # ───────────────────────────── SETTINGS DIALOG ───────────────────────────── #
@@ -267,23 +770,155 @@ class SettingsDialog(QDialog):
         save_api_key(key)
         self.accept()
 
+class HistorySearchDialog(QDialog):
+    def __init__(self, history: ChatHistoryStore, query: str = "", parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.setWindowTitle("Search chat history")
+        self.resize(640, 480)
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit(query)
+        self.query_edit.setPlaceholderText("Search messages…")
+        self.results = QListWidget()
+        self.preview = QPlainTextEdit()
+        self.preview.setReadOnly(True)
+        layout.addWidget(self.query_edit)
+        layout.addWidget(self.results, 1)
+        layout.addWidget(self.preview, 1)
+        # Search as the user types, once they pause
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(200)
+        self._debounce.timeout.connect(self.run_search)
+        self.query_edit.textChanged.connect(lambda _: self._debounce.start())
+        self.results.currentItemChanged.connect(self._show_preview)
+        self.run_search()
+
+    def run_search(self):
+        self.results.clear()
+        self.preview.clear()
+        for row in self.history.search(self.query_edit.text()):
+            when = datetime.fromtimestamp(row.created).strftime("%Y-%m-%d %H:%M")
+            who = "You" if row.is_user else ("Scan" if row.kind == "scan" else "Advisor")
+            snippet = " ".join((row.snippet or row.text).split())
+            item = QListWidgetItem(f"{when}  {who}: {snippet}")
+            item.setData(Qt.UserRole, row.text)
+            self.results.addItem(item)
+
+    def _show_preview(self, item, _previous=None):
+        self.preview.setPlainText(item.data(Qt.UserRole) if item is not None else "")
+
+class DiagnosticsDialog(QDialog):
+    """Rolling latency percentiles from the tracing layer, refreshed live."""
+
+    COLUMNS = ("Span", "Count", "p50", "p95", "p99", "Unit")
+
+    def __init__(self, router=None, parent=None):
+        super().__init__(parent)
+        self.router = router
+        self.setWindowTitle("Diagnostics")
+        self.resize(640, 420)
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.backends_label = QLabel()
+        self.backends_label.setWordWrap(True)
+        layout.addWidget(self.backends_label)
+        buttons = QDialogButtonBox(QDialogButtonBox.Reset | QDialogButtonBox.Close)
+        buttons.button(QDialogButtonBox.Reset).clicked.connect(self._reset)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start()
+        self.refresh()
+
+    def refresh(self):
+        rows = tracing.tracer.snapshot()
+        self.table.setRowCount(len(rows))
+        for row, summary in enumerate(rows):
+            fmt = "{:.0f}" if summary["unit"] == "bytes" else "{:.1f}"
+            values = (
+                summary["name"],
+                str(summary["count"]),
+                fmt.format(summary["p50"]),
+                fmt.format(summary["p95"]),
+                fmt.format(summary["p99"]),
+                summary["unit"],
+            )
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, item)
+        if self.router is not None:
+            states = []
+            for b in self.router.snapshot():
+                state = f"{b['name']} {'ok' if b['healthy'] else 'benched'} ({b['successes']} ok, {b['failures']} failed"
+                limiter = b["limiter"]
+                if limiter["rpm"]:
+                    state += f", {limiter['rpm']:g} requests/min"
+                if limiter["paused_s"] > 0:
+                    state += f", quota pause {limiter['paused_s']:.0f}s"
+                states.append(state + ")")
+            self.backends_label.setText(
+                f"Backends: {'; '.join(states)}. Hedged {self.router.hedges}, "
+                f"{self.router.hedge_wins} answered first."
+            )
+
+    def _reset(self):
+        tracing.tracer.reset()
+        self.refresh()
+
 ###############################################################################
 # ───────────────────────────── MAIN WINDOW ──────────────────────────────── #
 ###############################################################################
 
 class MainWindow(QMainWindow):
+    ttsStateChanged = Signal(bool)
+    ttsError = Signal(str)
+    replyPrepared = Signal(object)  # Cached answers, post-processed on a scheduler thread
+
     def __init__(self):
         super().__init__()
-        self._workers = []  # Keep references to running GeminiWorker threads
+        self._workers = []  # Keep references to in-flight workers until they finish
+        self._inflight = {}  # Request key -> the worker answering it (single flight)
+        self._last_scan = 0.0
+        self.scheduler = RequestScheduler(max_workers=WORKER_POOL_SIZE)
+        self.conversation = Conversation(
+            HISTORY_TOKEN_BUDGET, HISTORY_RECENT_TURNS, summarize=self._summarize_history
+        )
         self.setWindowTitle(APP_NAME)
         self.resize(960, 720)
         self.setMinimumSize(720, 480)
         self.api_key = load_api_key()
         self.tts_enabled = False
         self.complex_mode = False
-        self._tts_proc = None
+        # Engine callbacks arrive on worker threads; signals hop to the GUI thread
+        self._tts = None
+        self._response_cache = None
+        self._capture_processor = None
+        self._watch_win_id = None
+        self._watch_busy = False  # A capture or analysis for the last tick is in flight
+        self._frame_differ = None
+        self._capture_started = None
+        self._watch_timer = QTimer(self)
+        self._watch_timer.setInterval(WATCH_INTERVAL_MS)
+        self._watch_timer.timeout.connect(self._watch_tick)
+        self.ttsStateChanged.connect(lambda speaking: self.stop_speaking_btn.setEnabled(speaking))
+        self.ttsError.connect(lambda e: self.chat.add_message(f"[Voice Error] {e}", False))
+        self.replyPrepared.connect(self._handle_ai_response)
+        # Open the pooled connection once the window is up so the first question
+        # skips the handshake without delaying the first paint
+        QTimer.singleShot(0, http_pool.warm_async)
 
-        self.chat = ChatArea()
+        self.history = self._open_history()
+        self.chat = ChatArea(self.history)
 
         # Right sidebar ------------------------------------------------------ #
         side_panel = QWidget()
@@ -313,20 +948,30 @@ class MainWindow(QMainWindow):
         self.stop_speaking_btn.setEnabled(False)
         side_layout.addWidget(self.stop_speaking_btn)
 
-        # Spinner animation (QLabel with GIF)
-        from PySide6.QtGui import QMovie
+        # Spinner animation (QLabel with GIF); the QMovie is created on first use
         self.spinner = QLabel()
         self.spinner.setAlignment(Qt.AlignCenter)
-        self.spinner_movie = QMovie(":/qt-project.org/styles/commonstyle/images/working-32.gif")
-        self.spinner.setMovie(self.spinner_movie)
+        self.spinner_movie = None
         self.spinner.hide()
         side_layout.addWidget(self.spinner)
         btn_scan = QPushButton("Scan screen for threats")
         btn_scan.clicked.connect(self.scan_screen)
         side_layout.addWidget(btn_scan)
+        self.watch_btn = QPushButton("Watch window for threats")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.clicked.connect(self.toggle_watch)
+        side_layout.addWidget(self.watch_btn)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search history…")
+        self.search_edit.returnPressed.connect(self.search_history)
+        self.search_edit.setEnabled(self.history is not None)
+        side_layout.addWidget(self.search_edit)
         btn_clear = QPushButton("Clear chat")
-        btn_clear.clicked.connect(self.chat.clear_chat)
+        btn_clear.clicked.connect(self.clear_chat)
         side_layout.addWidget(btn_clear)
+        btn_delete = QPushButton("Delete saved history")
+        btn_delete.clicked.connect(self.delete_history)
+        side_layout.addWidget(btn_delete)
         side_layout.addStretch(1)
 
         # Suggested topics
@@ -338,7 +983,8 @@ class MainWindow(QMainWindow):
             "What is ransomware?",
         ]:
             b = QPushButton(tip)
-            b.clicked.connect(lambda _, t=tip: self.send_prompt(t))
+            # Suggested topics want the advisor's full answer, not a one-line definition
+            b.clicked.connect(lambda _, t=tip: self.send_prompt(t, local=False))
             side_layout.addWidget(b)
 
         splitter = QSplitter()
@@ -368,15 +1014,57 @@ class MainWindow(QMainWindow):
         act_api = QAction("API key…", self)
         act_api.triggered.connect(self.open_settings)
         menu.addAction(act_api)
+        act_diag = QAction("Diagnostics…", self)
+        act_diag.triggered.connect(self.open_diagnostics)
+        menu.addAction(act_diag)
 
         self.apply_styles()
+        self.chat.load_history()
         # Welcome message
         self.chat.add_message(
             "Welcome! I am your Cybersecurity Advisor. Ask me anything about keeping your digital life secure.",
             is_user=False,
+            kind="system",
         )
 
     # --------------------------------------------------------------------- #
+    @property
+    def tts(self):
+        if self._tts is None:
+            from tts_engine import TTSEngine
+
+            self._tts = TTSEngine(on_state=self.ttsStateChanged.emit, on_error=self.ttsError.emit)
+        return self._tts
+
+    @property
+    def response_cache(self):
+        if self._response_cache is None:
+            from response_cache import ResponseCache
+
+            self._response_cache = ResponseCache(
+                RESPONSE_CACHE_FILE, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL
+            )
+        return self._response_cache
+
+    @property
+    def capture_processor(self):
+        if self._capture_processor is None:
+            from image_prep import CaptureProcessor
+
+            self._capture_processor = CaptureProcessor(
+                max_size=CAPTURE_MAX_SIZE, fmt=CAPTURE_FORMAT, quality=CAPTURE_QUALITY
+            )
+        return self._capture_processor
+
+    def _start_spinner(self):
+        if self.spinner_movie is None:
+            from PySide6.QtGui import QMovie
+
+            self.spinner_movie = QMovie(":/qt-project.org/styles/commonstyle/images/working-32.gif")
+            self.spinner.setMovie(self.spinner_movie)
+        self.spinner.show()
+        self.spinner_movie.start()
+
     def _wrap_widget_in_toolbar(self, w):
         from PySide6.QtWidgets import QToolBar
 
@@ -397,6 +1085,11 @@ class MainWindow(QMainWindow):
         self.setPalette(palette)
 
     # --------------------------------------------------------------------- #
+    def open_diagnostics(self):
+        from backends import get_router
+
+        DiagnosticsDialog(get_router(self.api_key, MODEL_NAME), self).exec()
+
     def open_settings(self):
         dlg = SettingsDialog(self)
         if dlg.exec():
@@ -409,61 +1102,172 @@ class MainWindow(QMainWindow):
         self.input_edit.clear()
         self.send_prompt(text)
 
-    def send_prompt(self, prompt: str):
+    def send_prompt(self, prompt: str, local: bool = True):
+        from response_cache import cache_key
+
+        history = self.conversation.contents()
+        key = cache_key(prompt, MODEL_NAME, GENERATION_CONFIG, self.complex_mode, history)
+        if key in self._inflight:
+            return  # Double click or repeated Enter: the running request answers it
         self.chat.add_message(prompt, is_user=True)
-        self.spinner.show()
-        self.spinner_movie.start()
+        # Plain definitions and clear-cut link/hash verdicts are answered locally
+        answer = local_answer(prompt) if local and not self.complex_mode else None
+        if answer is not None:
+            self._remember_turn(prompt, answer)
+            self._show_response(answer)
+            if self.tts_enabled:
+                self.tts.speak(self._clean_for_tts(answer))
+            return
+        self._start_spinner()
         if not self.api_key:
             self.spinner.hide()
             self.chat.add_message(
                 "Please set your Gemini API key first (Settings → API key).", False
             )
             return
-        worker = GeminiWorker(prompt, self.api_key)
+        shorten = not self.complex_mode
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            self._remember_turn(prompt, cached)
+            self.scheduler.submit(
+                lambda: self.replyPrepared.emit(prepare_reply(cached, shorten)), PRIORITY_INTERACTIVE
+            )
+            return
+        worker = GeminiWorker(
+            prompt,
+            self.api_key,
+            stream=STREAM_RESPONSES,
+            stop_when=self._short_summary_complete if shorten else None,
+            history=history,
+            prepare=lambda t: prepare_reply(t, shorten),
+        )
+        worker.bubble = None  # Assistant bubble grown in place while streaming
+        worker.partialText.connect(lambda t: self._handle_partial(worker, t))
         # Use concise, friendly response handler
-        worker.responseReady.connect(self._handle_ai_response)
+        worker.responseReady.connect(lambda t: self.response_cache.put(key, t))
+        worker.responseReady.connect(lambda t: self._remember_turn(prompt, t))
+        worker.replyReady.connect(
+            lambda r: self._handle_ai_response(r, worker.bubble, self._elapsed(worker))
+        )
         worker.error.connect(lambda e: self.chat.add_message(f"⚠️ {e}", False))
         worker.finished.connect(lambda: self._cleanup_worker(worker))
+        self._submit(worker, PRIORITY_INTERACTIVE, key)
+
+    def _submit(self, worker, priority, key=None):
         self._workers.append(worker)
-        worker.start()
+        worker.client.priority = priority
+        if key is not None:
+            self._inflight[key] = worker
+            worker.finished.connect(lambda: self._land(key, worker))
+        worker.submitted = time.perf_counter()
+        worker.job = self.scheduler.submit(worker.run, priority, on_cancel=worker.cancel)
 
-    def _handle_ai_response(self, text):
-        self.stop_speaking_btn.setEnabled(False)
+    def _land(self, key, worker):
+        if self._inflight.get(key) is worker:
+            del self._inflight[key]
+
+    def cancel_requests(self):
+        self.scheduler.cancel_all()
+        self._inflight.clear()
+        self._watch_busy = False
+        self._workers = [w for w in self._workers if not isinstance(w, GeminiWorker)]
         self.spinner.hide()
-        if self.complex_mode:
-            response = text.strip()
+
+    def clear_chat(self):
+        self.cancel_requests()
+        self.conversation.clear()
+        self.chat.clear_chat()
+
+    def delete_history(self):
+        answer = QMessageBox.question(
+            self,
+            "Delete saved history",
+            "Delete every saved message, cached reply and voice clip from this computer? "
+            "This cannot be undone.",
+        )
+        if answer != QMessageBox.Yes:
+            return
+        self.clear_chat()
+        if self.history is not None:
+            self.history.purge()
+        self.response_cache.clear()
+        from tts_engine import ClipCache
+
+        (self._tts.cache if self._tts is not None else ClipCache()).clear()
+
+    def _remember_turn(self, prompt, reply, scan=False):
+        if scan:
+            self.conversation.add_scan(reply)
         else:
-            response = self._summarize_response_short(text)
-        self.chat.add_message(response, False)
+            self.conversation.add_turn(prompt, reply)
+        if self.conversation.needs_compaction():
+            self.scheduler.submit(self.conversation.compact, PRIORITY_BACKGROUND)
+
+    def _summarize_history(self, summary, turns):
+        # Runs on a scheduler thread from Conversation.compact
+        if not self.api_key:
+            return None
+        return GeminiClient(self.api_key, priority=PRIORITY_BACKGROUND).summarize_history(summary, turns)
+
+    @staticmethod
+    def _open_history():
+        try:
+            return ChatHistoryStore(HISTORY_FILE, page_size=HISTORY_PAGE_SIZE)
+        except Exception:
+            return None  # Unwritable location: run without saved history
+
+    def search_history(self):
+        if self.history is None:
+            return
+        HistorySearchDialog(self.history, self.search_edit.text(), self).exec()
+
+    @staticmethod
+    def _elapsed(worker):
+        return round(time.perf_counter() - worker.submitted, 3)
+
+    def _handle_partial(self, worker, text):
+        if worker.bubble is None:
+            self.spinner.hide()
+            worker.bubble = self.chat.add_message(text, False)
+        else:
+            self.chat.update_message(worker.bubble, text)
+
+    def _show_response(self, text, bubble=None, kind="text", elapsed=None, rendered=None):
+        if bubble is None:
+            bubble = self.chat.add_message(text, False, kind, rendered)
+        else:
+            self.chat.update_message(bubble, text, immediate=True, rendered=rendered)
+        self.chat.set_message_meta(bubble, kind=kind, elapsed=elapsed)
+
+    def _handle_ai_response(self, reply: Reply, bubble=None, elapsed=None):
+        self.spinner.hide()
+        self._show_response(reply.text, bubble, elapsed=elapsed, rendered=reply.rendered)
         if self.tts_enabled:
-            try:
-                clean = self._clean_for_tts(response)
-                speak_text(clean)
-                import platform, subprocess
-                self._tts_proc = None
-                if platform.system() == "Linux":
-                    self._tts_proc = subprocess.Popen(["mpg123", "tts_output.mp3"])
-                elif platform.system() == "Darwin":
-                    self._tts_proc = subprocess.Popen(["afplay", "tts_output.mp3"])
-                elif platform.system() == "Windows":
-                    # os.startfile is not killable; skip stop for now
-                    os.startfile("tts_output.mp3")
-                self.stop_speaking_btn.setEnabled(True)
-            except Exception as e:
-                self.chat.add_message(f"[Voice Error] {e}", False)
+            self.tts.speak(reply.speech)
 
     def scan_screen(self):
-        self.spinner.show()
-        self.spinner_movie.start()
+        # Debounce repeated clicks, and never queue a second capture behind a running one
+        capture = getattr(self, "screenshot_worker", None)
+        if time.monotonic() - self._last_scan < SCAN_DEBOUNCE_MS / 1000 or (
+            capture is not None and capture.isRunning()
+        ):
+            return
+        self._last_scan = time.monotonic()
+        self._start_spinner()
         if not self.api_key:
             self.spinner.hide()
             self.chat.add_message(
                 "Please set your Gemini API key first (Settings → API key).", False
             )
             return
+        from window_select import WindowSelectDialog
+        from screenshot_worker import ScreenshotWorker
+
         # Show window selection dialog
         dlg = WindowSelectDialog(self)
-        if dlg.exec() == QDialog.Accepted and dlg.get_selected_id() is not None:
+        accepted = dlg.exec() == QDialog.Accepted
+        self._last_scan = time.monotonic()  # Clicks queued behind the dialog count as repeats
+        if accepted and dlg.get_selected_id() is not None:
             win_id = dlg.get_selected_id()
             self.chat.add_message("Capturing selected window…", False)
             self.screenshot_worker = ScreenshotWorker(win_id)
@@ -471,22 +1275,124 @@ class MainWindow(QMainWindow):
             self.screenshot_worker.error.connect(lambda e: self.chat.add_message(f"Screenshot failed: {e}", False))
             self.screenshot_worker.finished.connect(lambda: self._cleanup_worker(self.screenshot_worker))
             self._workers.append(self.screenshot_worker)
+            self._capture_started = time.perf_counter()
             self.screenshot_worker.start()
         else:
             self.spinner.hide()
             self.chat.add_message("Screenshot canceled or no window selected.", False)
 
     def _scan_screen_bg(self, b64):
+        self._record_capture()
+        key = flight_key("scan", b64, MODEL_NAME)
+        if key in self._inflight:
+            # Same window, unchanged since the last scan: its analysis is still running
+            self.chat.add_message("This screen is already being analyzed.", False, "system")
+            return
         try:
-            worker = GeminiWorker(b64, self.api_key, is_image=True)
-            worker.responseReady.connect(self._handle_scan_result)
+            worker = GeminiWorker(
+                b64,
+                self.api_key,
+                is_image=True,
+                stream=STREAM_RESPONSES,
+                stop_when=self._short_summary_complete,
+                processor=self.capture_processor,
+                prepare=lambda t: prepare_reply(t, clean_speech=False),
+            )
+            worker.bubble = None
+            worker.partialText.connect(lambda t: self._handle_partial(worker, t))
+            worker.replyReady.connect(
+                lambda r: self._handle_scan_result(r, worker.bubble, self._elapsed(worker))
+            )
             worker.error.connect(lambda e: self.chat.add_message(f"Screenshot failed: {e}", False))
             worker.finished.connect(lambda: self._cleanup_worker(worker))
-            self._workers.append(worker)
-            worker.start()
+            self._submit(worker, PRIORITY_BACKGROUND, key)
         except Exception as exc:
             self.chat.add_message(f"Screenshot failed: {exc}", False)
 
+    def toggle_watch(self):
+        if not self.watch_btn.isChecked():
+            self.stop_watch()
+            return
+        if not self.api_key:
+            self.watch_btn.setChecked(False)
+            self.chat.add_message(
+                "Please set your Gemini API key first (Settings → API key).", False
+            )
+            return
+        from window_select import WindowSelectDialog
+        from frame_diff import FrameDiffer
+
+        dlg = WindowSelectDialog(self)
+        if dlg.exec() == QDialog.Accepted and dlg.get_selected_id() is not None:
+            self._watch_win_id = dlg.get_selected_id()
+            self._frame_differ = FrameDiffer()
+            self.watch_btn.setText("Stop watching")
+            self.chat.add_message(
+                f"Watching the selected window every {WATCH_INTERVAL_MS / 1000:g}s; "
+                "I'll speak up when something on it changes.",
+                False,
+            )
+            self._watch_timer.start()
+            self._watch_tick()
+        else:
+            self.watch_btn.setChecked(False)
+
+    def stop_watch(self):
+        self._watch_timer.stop()
+        self._watch_win_id = None
+        self._frame_differ = None
+        self.watch_btn.setChecked(False)
+        self.watch_btn.setText("Watch window for threats")
+
+    def _watch_tick(self):
+        if self._watch_win_id is None or self._watch_busy:
+            return
+        from screenshot_worker import ScreenshotWorker
+
+        self._watch_busy = True
+        worker = ScreenshotWorker(self._watch_win_id)
+        worker.finished.connect(self._watch_frame)
+        worker.error.connect(self._watch_failed)
+        worker.finished.connect(lambda: self._cleanup_worker(worker))
+        self._workers.append(worker)
+        self._capture_started = time.perf_counter()
+        worker.start()
+
+    def _watch_failed(self, message):
+        self._watch_busy = False
+        self.stop_watch()
+        self.chat.add_message(f"Screen watch stopped: {message}", False)
+
+    def _record_capture(self):
+        if self._capture_started is not None:
+            tracing.record("capture.grab", (time.perf_counter() - self._capture_started) * 1000.0)
+            self._capture_started = None
+
+    def _watch_frame(self, b64):
+        self._record_capture()
+        if self._frame_differ is None:
+            self._watch_busy = False
+            return
+        worker = GeminiWorker(
+            b64,
+            self.api_key,
+            is_image=True,
+            stream=STREAM_RESPONSES,
+            stop_when=self._short_summary_complete,
+            processor=self.capture_processor,
+            differ=self._frame_differ,
+            prepare=lambda t: prepare_reply(t, clean_speech=False),
+        )
+        worker.bubble = None
+        worker.partialText.connect(lambda t: self._handle_partial(worker, t))
+        worker.replyReady.connect(
+            lambda r: self._handle_scan_result(r, worker.bubble, self._elapsed(worker))
+        )
+        worker.error.connect(lambda e: self.chat.add_message(f"Screen watch: {e}", False))
+        worker.finished.connect(lambda: self._cleanup_worker(worker))
+        worker.finished.connect(lambda: setattr(self, "_watch_busy", False))
+        self._submit(worker, PRIORITY_BACKGROUND)
+
     def _cleanup_worker(self, worker):
         try:
             self._workers.remove(worker)
@@ -496,21 +1402,26 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         # Stop any TTS playback
         self.stop_speaking()
-        # Wait for all threads to finish before closing
+        if self._tts is not None:
+            self._tts.shutdown()
+        self.stop_watch()
+        self.chat.shutdown()
+        # Cancel queued and in-flight requests instead of waiting out their timeouts
+        self.scheduler.shutdown(timeout=SHUTDOWN_GRACE)
         for worker in self._workers:
-            if worker.isRunning():
+            if isinstance(worker, QThread) and worker.isRunning():
                 worker.quit()
                 worker.wait()
+        if self._response_cache is not None:
+            self._response_cache.close()
+        if self.history is not None:
+            self.history.close()
+        tracing.tracer.shutdown()
         event.accept()
 
     def stop_speaking(self):
-        import platform
-        if self._tts_proc is not None:
-            try:
-                self._tts_proc.terminate()
-            except Exception:
-                pass
-            self._tts_proc = None
+        if self._tts is not None:
+            self._tts.stop()
         self.stop_speaking_btn.setEnabled(False)
         # On Windows, can't stop os.startfile playback
 
@@ -528,64 +1439,90 @@ class MainWindow(QMainWindow):
         else:
             self.complex_btn.setText("Enable Complex Mode")
 
-    def _summarize_response_short(self, text):
-        # Short, clear, easy-to-understand summary (1-2 sentences, no ...)
-        import re
-        explanations = {
-            'phishing': 'Phishing: a cyber attack where attackers trick you into giving up personal information. Always check the sender and links before clicking.',
-            'malware': 'Malware: malicious software designed to harm or exploit your device or data.',
-            'ransomware': 'Ransomware: malware that locks your files and demands payment to unlock them.',
-            'two-factor authentication': 'Two-factor authentication: adds an extra layer of security by requiring a second verification step.',
-            'password': 'A strong password uses a mix of letters, numbers, and symbols, and is unique for each account.',
-            'encryption': 'Encryption: protects your data by converting it into a code that only authorized parties can read.',
-            'threat': 'A threat is any potential danger to your digital security, like hackers or malware.',
-        }
-        # Remove playful endings
-        text = re.sub(r"(Stay safe!|Let me know if you have more questions!|Hope that helps!|Think of it like this:)", "", text, flags=re.I)
-        # Get first 1-2 sentences, no ...
-        sentences = re.split(r"(?<=[.!?]) +", text.strip())
-        summary = " ".join(sentences[:2]).strip()
-        # Append relevant explanation if key term present and not already explained
-        for term, explanation in explanations.items():
-            if re.search(rf'\b{re.escape(term)}\b', summary, re.I) and explanation.split(':')[0].lower() not in summary.lower():
-                summary = summary.rstrip('.') + ". " + explanation
-                break
-        return summary.strip()
+    def _short_summary_complete(self, text):
+        return short_summary_complete(text)
 
     def _clean_for_tts(self, text):
-        # Remove markdown formatting and extra whitespace
-        import re
-        text = re.sub(r'[\*_`~\[\]#>-]', '', text)  # Remove markdown chars
-        text = re.sub(r'\s+', ' ', text)  # Collapse whitespace
-        text = text.replace('•', 'bullet point').replace('-', ' ')  # Make lists clearer
-        return text.strip()
-
-    def _handle_scan_result(self, result: str):
-        # Summarize and simplify for non-technical users
-        friendly = self._summarize_response_short(result)
-        self.chat.add_message(friendly, False)
+        return clean_for_tts(text)
+
+    def _handle_scan_result(self, reply: Reply, bubble=None, elapsed=None):
+        # Already summarized and simplified for non-technical users by prepare_reply
+        self.spinner.hide()
+        # The screenshot itself never enters the history, only the verdict
+        self._remember_turn(None, reply.text, scan=True)
+        self._show_response(reply.text, bubble, kind="scan", elapsed=elapsed, rendered=reply.rendered)
         if self.tts_enabled:
-            try:
-                speak_text(friendly)
-                # Play the mp3 (cross-platform)
-                import platform, subprocess
-                if platform.system() == "Linux":
-                    subprocess.Popen(["mpg123", "tts_output.mp3"])
-                elif platform.system() == "Darwin":
-                    subprocess.Popen(["afplay", "tts_output.mp3"])
-                elif platform.system() == "Windows":
-                    os.startfile("tts_output.mp3")
-            except Exception as e:
-                self.chat.add_message(f"[Voice Error] {e}", False)
+            self.tts.speak(reply.speech)
 
 ###############################################################################
 # ──────────────────────────────── MAIN ──────────────────────────────────── #
 ###############################################################################
 
+class _FirstPaintProbe(QObject):
+    """Calls ``callback`` once, right after the first paint event in the app."""
+
+    def __init__(self, app, callback):
+        super().__init__(app)
+        self.app = app
+        self.callback = callback
+        app.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self.app.removeEventFilter(self)
+            # Let the rest of this paint pass finish before taking the time
+            QTimer.singleShot(0, self.callback)
+        return False
+
+def _print_startup_profile(stream=sys.stderr):
+    start = previous = _STARTUP_MARKS[0][1]
+    print("Startup profile (ms)      step    total", file=stream)
+    for label, stamp in _STARTUP_MARKS[1:]:
+        print(
+            f"  {label:<30} {1000 * (stamp - previous):7.1f} {1000 * (stamp - start):8.1f}",
+            file=stream,
+        )
+        previous = stamp
+
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile-startup", action="store_true")
+    parser.add_argument("--startup-budget", type=float, default=None, metavar="MS")
+    args, qt_argv = parser.parse_known_args(sys.argv)
+
+    tracing.configure(enabled=TRACE_ENABLED, jsonl_path=TRACE_JSONL_FILE, prom_path=TRACE_PROM_FILE)
+    http_pool.configure(
+        pool_size=HTTP_POOL_SIZE,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        keepalive=HTTP_KEEPALIVE,
+        http2=HTTP2_ENABLED,
+    )
+    app = QApplication(qt_argv)
+    _STARTUP_MARKS.append(("QApplication", time.perf_counter()))
     win = MainWindow()
+    _STARTUP_MARKS.append(("MainWindow()", time.perf_counter()))
+
+    if args.profile_startup or args.startup_budget is not None:
+        def on_first_paint():
+            _STARTUP_MARKS.append(("first paint", time.perf_counter()))
+            if args.profile_startup:
+                _print_startup_profile()
+            if args.startup_budget is not None:
+                # CI check: exit non-zero when time-to-first-paint is over budget
+                elapsed = 1000 * (_STARTUP_MARKS[-1][1] - _STARTUP_MARKS[0][1])
+                over = elapsed > args.startup_budget
+                print(
+                    f"time to first paint {elapsed:.1f} ms, budget {args.startup_budget:.1f} ms: "
+                    + ("OVER BUDGET" if over else "ok"),
+                    file=sys.stderr,
+                )
+                app.exit(1 if over else 0)
+
+        _FirstPaintProbe(app, on_first_paint)
+
     win.show()
+    _STARTUP_MARKS.append(("show()", time.perf_counter()))
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""Token-budgeted conversation history for multi-turn requests.
+
+The most recent turns are sent verbatim; once the turns outgrow the budget,
+older ones are folded into a rolling summary by ``compact()``, which callers
+run off the GUI thread.  Until a
+compaction lands, turns that no longer fit the budget are simply left out, so
+the history sent with a request never exceeds ``budget_tokens``.  Screenshots
+never enter the history: a scan is recorded as a short text note plus the
+verdict.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+
+DEFAULT_BUDGET_TOKENS = 3000
+DEFAULT_RECENT_TURNS = 4
+DEFAULT_SUMMARY_TOKENS = 400
+CHARS_PER_TOKEN = 4  # Rough average for English text; no tokenizer needed
+
+SCREENSHOT_NOTE = "[Shared a screenshot for a threat scan]"
+_FIRST_SENTENCE_RE = re.compile(r"^(.+?[.!?])(?:\s|$)", re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _clip(text: str, max_tokens: int, keep="head") -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…" if keep == "head" else "…" + text[-(limit - 1):]
+
+
+@dataclass
+class Turn:
+    user: str
+    model: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.user) + estimate_tokens(self.model)
+
+
+def extractive_summary(summary: str, turns) -> str:
+    """Fallback summarizer: the first sentence of every question and answer."""
+    lines = [summary] if summary else []
+    for turn in turns:
+        user = _FIRST_SENTENCE_RE.match(turn.user.strip())
+        model = _FIRST_SENTENCE_RE.match(turn.model.strip())
+        lines.append(
+            f"User asked: {(user.group(1) if user else turn.user).strip()} "
+            f"Advisor: {(model.group(1) if model else turn.model).strip()}"
+        )
+    return "\n".join(lines)
+
+
+class Conversation:
+    def __init__(
+        self,
+        budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+        recent_turns: int = DEFAULT_RECENT_TURNS,
+        summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+        summarize=None,
+    ):
+        self.budget_tokens = budget_tokens
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize  # callable(summary, turns) -> str; may do network I/O
+        self.summary = ""
+        self._turns = []
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by clear() so a late compaction is discarded
+        self._compacting = False
+
+    def add_turn(self, user: str, model: str):
+        with self._lock:
+            self._turns.append(Turn(user.strip(), model.strip()))
+
+    def add_scan(self, verdict: str):
+        self.add_turn(SCREENSHOT_NOTE, verdict)
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self.summary = ""
+            self._generation += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._turns)
+
+    def contents(self) -> list:
+        """Gemini ``contents`` entries for the history, newest turns first to be kept."""
+        with self._lock:
+            turns = list(self._turns)
+            summary = self.summary
+        budget = self.budget_tokens
+        head = []
+        if summary:
+            summary = _clip(summary, self.summary_tokens, keep="tail")
+            head = [
+                _content("user", f"Summary of our conversation so far:\n{summary}"),
+                _content("model", "Understood."),
+            ]
+            budget -= estimate_tokens(summary) + 8
+        kept = []
+        for turn in reversed(turns):
+            if turn.tokens > budget:
+                if kept:
+                    break
+                # A single huge turn (pasted text) is clipped rather than dropped
+                share = max(budget // 2, 1)
+                turn = Turn(_clip(turn.user, share), _clip(turn.model, share))
+            kept.append(turn)
+            budget -= turn.tokens
+            if budget <= 0:
+                break
+        body = []
+        for turn in reversed(kept):
+            body += [_content("user", turn.user), _content("model", turn.model)]
+        return head + body
+
+    def needs_compaction(self) -> bool:
+        """True once the turns kept verbatim no longer fit the budget, so one
+        summary request folds in a batch of turns rather than one per turn."""
+        with self._lock:
+            if self._compacting or len(self._turns) <= self.recent_turns:
+                return False
+            used = sum(turn.tokens for turn in self._turns)
+            if self.summary:
+                used += min(estimate_tokens(self.summary), self.summary_tokens) + 8
+            return used > self.budget_tokens
+
+    def compact(self):
+        """Fold all but the most recent turns into the summary.  Blocking."""
+        with self._lock:
+            if self._compacting or len(self._turns) <= self.recent_turns:
+                return
+            self._compacting = True
+            generation = self._generation
+            old = self._turns[: len(self._turns) - self.recent_turns]
+            summary = self.summary
+        try:
+            new_summary = None
+            if self.summarize is not None:
+                try:
+                    new_summary = self.summarize(summary, old)
+                except Exception:
+                    new_summary = None
+            if not new_summary:
+                new_summary = extractive_summary(summary, old)
+            with self._lock:
+                if generation == self._generation:
+                    del self._turns[: len(old)]
+                    self.summary = _clip(new_summary.strip(), self.summary_tokens, keep="tail")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+
+def _content(role: str, text: str) -> dict:
+    return {"role": role, "parts": [{"text": text}]}
@@ -0,0 +1,159 @@
+"""Cheap region-level change detection between consecutive captures.
+
+Each frame is reduced to a small grayscale thumbnail and compared to the
+last frame that was analyzed; a cell of a coarse grid counts as changed when
+any of its thumbnail pixels moved by more than a luminance threshold.  Only
+when enough cells change is the frame worth analyzing, and the changed cells
+are grouped into a few padded regions so the request can carry just those
+crops.  Comparing against the analyzed frame rather than the previous tick
+means slow changes add up until they are analyzed, and a failed analysis can
+be rolled back so its change is seen again.
+"""
+
+from dataclasses import dataclass, field
+
+from PIL import Image, ImageChops
+
+DEFAULT_GRID = (32, 18)  # columns, rows
+CELL_SAMPLES = 8  # thumbnail pixels per cell side
+
+
+@dataclass
+class FrameChange:
+    significant: bool
+    changed_fraction: float
+    regions: list = field(default_factory=list)  # pixel boxes (left, top, right, bottom)
+    full_frame: bool = False
+
+
+class FrameDiffer:
+    def __init__(
+        self,
+        grid=DEFAULT_GRID,
+        pixel_threshold: int = 12,
+        min_changed_cells: int = 2,
+        max_regions: int = 4,
+        max_region_area: float = 0.5,
+        padding: int = 1,
+    ):
+        self.grid = tuple(grid)
+        self.pixel_threshold = pixel_threshold  # 0-255 luminance change of one thumbnail pixel
+        self.min_changed_cells = min_changed_cells
+        self.max_regions = max_regions
+        self.max_region_area = max_region_area  # above this, send the whole frame
+        self.padding = padding  # cells added around every region for context
+        self._baseline = None  # (thumbnail, size) of the last frame analyzed
+        self._replaced = None  # The baseline before the last significant change
+
+    def reset(self):
+        self._baseline = None
+        self._replaced = None
+
+    def update(self, image: Image.Image) -> FrameChange:
+        """Compare ``image`` with the last analyzed frame; a significant
+        change makes ``image`` the new baseline until ``rollback``."""
+        cols, rows = self.grid
+        thumb = image.convert("L").resize((cols * CELL_SAMPLES, rows * CELL_SAMPLES), Image.BOX)
+        change = self._compare(thumb, image.size)
+        if change.significant:
+            self._replaced, self._baseline = self._baseline, (thumb, image.size)
+        return change
+
+    def rollback(self):
+        """Undo the last significant ``update``, e.g. when its analysis failed."""
+        self._baseline, self._replaced = self._replaced, None
+
+    def _compare(self, thumb, size) -> FrameChange:
+        cols, rows = self.grid
+        full = (0, 0, *size)
+        if self._baseline is None or self._baseline[1] != size:
+            return FrameChange(True, 1.0, [full], full_frame=True)
+        previous = self._baseline[0]
+
+        threshold = self.pixel_threshold
+        moved = ImageChops.difference(thumb, previous).point(lambda v: 255 if v > threshold else 0)
+        # Box-averaging the mask leaves a non-zero cell wherever any pixel moved
+        changed = [value > 0 for value in moved.resize((cols, rows), Image.BOX).tobytes()]
+        count = sum(changed)
+        fraction = count / len(changed)
+        if count < self.min_changed_cells:
+            return FrameChange(False, fraction)
+
+        boxes = [self._to_pixels(box, size) for box in _components(changed, cols, rows, self.padding)]
+        if len(boxes) > self.max_regions:
+            boxes = [_union(boxes)]
+        area = sum((r - l) * (b - t) for l, t, r, b in boxes) / (size[0] * size[1])
+        if area > self.max_region_area:
+            return FrameChange(True, fraction, [full], full_frame=True)
+        return FrameChange(True, fraction, boxes)
+
+    def _to_pixels(self, cell_box, size):
+        cols, rows = self.grid
+        c0, r0, c1, r1 = cell_box
+        width, height = size
+        return (
+            c0 * width // cols,
+            r0 * height // rows,
+            min(width, -(-c1 * width // cols)),
+            min(height, -(-r1 * height // rows)),
+        )
+
+
+def _components(changed, cols, rows, padding):
+    """Bounding boxes (in cells, end-exclusive) of 8-connected changed cells."""
+    seen = [False] * len(changed)
+    boxes = []
+    for start, is_changed in enumerate(changed):
+        if not is_changed or seen[start]:
+            continue
+        seen[start] = True
+        stack = [start]
+        c0 = r0 = 1 << 30
+        c1 = r1 = -1
+        while stack:
+            index = stack.pop()
+            row, col = divmod(index, cols)
+            c0, c1, r0, r1 = min(c0, col), max(c1, col), min(r0, row), max(r1, row)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    nr, nc = row + dr, col + dc
+                    if 0 <= nr < rows and 0 <= nc < cols:
+                        neighbour = nr * cols + nc
+                        if changed[neighbour] and not seen[neighbour]:
+                            seen[neighbour] = True
+                            stack.append(neighbour)
+        boxes.append(
+            (
+                max(0, c0 - padding),
+                max(0, r0 - padding),
+                min(cols, c1 + 1 + padding),
+                min(rows, r1 + 1 + padding),
+            )
+        )
+    return _merge_overlapping(boxes)
+
+
+def _merge_overlapping(boxes):
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = _union([a, b])
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+def _union(boxes):
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    )
@@ -0,0 +1,200 @@
+"""Local security glossary with single-pass term matching.
+
+Terms, aliases and acronyms from ``glossary.json`` are compiled once into an
+Aho-Corasick automaton, so finding every glossary term in a reply costs one
+pass over the text no matter how many terms the glossary holds.  The same
+data answers short "what is X?" and "what does X mean?" questions without a
+network round trip; requests to explain something go to the model.
+
+The bundled file has 219 entries, the terms a home user is likely to meet,
+not the thousands a full security glossary would hold; point
+``CYBERGUARD_GLOSSARY`` at a larger file with the same layout to extend it.  Entries marked ``common`` are everyday
+words ("risk", "patch") that are defined when asked about but never added
+to a reply unprompted, and acronyms only match in their own capitalization,
+so "IPs" is not read as IPS.
+"""
+
+import json
+import os
+import pathlib
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+GLOSSARY_ENV = "CYBERGUARD_GLOSSARY"
+GLOSSARY_FILE = pathlib.Path(__file__).with_name("glossary.json")
+
+# Dashes that should match a plain hyphen ("two‑factor" from a pasted tip)
+_DASHES = str.maketrans({c: "-" for c in "‐‑‒–—−"})
+_QUESTION_RE = re.compile(
+    r"^\s*(?:(?:what(?:'s| is| are)|define|definition of|meaning of)(?:\s+(?:an?|the))?\s+(?P<term>[^?.!]{1,60}?)"
+    r"|what does\s+(?P<phrase>[^?.!]{1,60}?)\s+(?:mean|stand for))\s*[?.!]*\s*$",
+    re.I,
+)
+
+
+@dataclass
+class GlossaryEntry:
+    term: str
+    definition: str
+    aliases: list = field(default_factory=list)
+    acronyms: list = field(default_factory=list)
+    common: bool = False  # An everyday word; not worth explaining unasked
+
+    def explanation(self) -> str:
+        return f"{self.term}: {self.definition}"
+
+    def answer(self) -> str:
+        name = self.term
+        if self.acronyms and self.acronyms[0].lower() != name.lower():
+            name = f"{name} ({self.acronyms[0]})"
+        return f"{name}: {self.definition}"
+
+    def surfaces(self):
+        return [self.term, *self.aliases, *self.acronyms]
+
+
+@dataclass
+class GlossaryMatch:
+    start: int
+    end: int
+    entry: GlossaryEntry
+
+
+def _fold(text: str) -> str:
+    # Lowercase without changing length so match offsets index the original text
+    folded = text.translate(_DASHES).lower()
+    if len(folded) != len(text):
+        folded = "".join(c if len(c.lower()) != 1 else c.lower() for c in text.translate(_DASHES))
+    return folded
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class Glossary:
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self._by_surface = {}
+        # Automaton as parallel arrays: goto dicts, failure links, and the
+        # (length, entry index, exact text) patterns ending at each state;
+        # exact text is set for acronyms, which must match case and all
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, entry in enumerate(self.entries):
+            words = {_fold(surface.strip()) for surface in (entry.term, *entry.aliases)}
+            for surface in entry.surfaces():
+                key = _fold(surface.strip())
+                if key and key not in self._by_surface:
+                    self._by_surface[key] = index
+                    self._add(key, index, None if key in words else surface.strip())
+        self._build_links()
+
+    @classmethod
+    def load(cls, path=None) -> "Glossary":
+        path = pathlib.Path(path or os.getenv(GLOSSARY_ENV) or GLOSSARY_FILE)
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        return cls(
+            GlossaryEntry(
+                term=item["term"],
+                definition=item["definition"],
+                aliases=item.get("aliases", []),
+                acronyms=item.get("acronyms", []),
+                common=item.get("common", False),
+            )
+            for item in data["entries"]
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, term: str):
+        index = self._by_surface.get(_fold(" ".join(term.split())))
+        return None if index is None else self.entries[index]
+
+    def find(self, text: str) -> list:
+        """Leftmost-longest, non-overlapping whole-word matches in ``text``."""
+        folded = _fold(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        best = {}  # start offset -> (end, entry index); longest pattern wins
+        state = 0
+        for pos, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = pos + 1
+            if end < len(folded) and _is_word_char(folded[end]):
+                continue
+            for length, index, exact in out[state]:
+                start = end - length
+                if start and _is_word_char(folded[start - 1]):
+                    continue
+                if exact is not None and text[start:end] != exact:
+                    continue
+                if start not in best or best[start][0] < end:
+                    best[start] = (end, index)
+        matches, covered = [], 0
+        for start in sorted(best):
+            end, index = best[start]
+            if start >= covered:
+                matches.append(GlossaryMatch(start, end, self.entries[index]))
+                covered = end
+        return matches
+
+    def answer(self, question: str):
+        """Definition for short "what is X?"-style questions about a known term, else None."""
+        match = _QUESTION_RE.match(question)
+        if match is None:
+            return None
+        candidate = match.group("term") or match.group("phrase")
+        entry = self.lookup(candidate.strip("\"'“”‘’ "))
+        return None if entry is None else entry.answer()
+
+    # --- Automaton construction ------------------------------------------- #
+    def _add(self, pattern: str, index: int, exact=None):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), index, exact))
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                link = self._fail[state]
+                while link and ch not in self._goto[link]:
+                    link = self._fail[link]
+                target = self._goto[link].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_glossary() -> Glossary:
+    """The shared glossary, loaded on first use."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            try:
+                _default = Glossary.load()
+            except (OSError, ValueError, KeyError):
+                _default = Glossary([])
+        return _default
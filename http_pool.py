@@ -0,0 +1,446 @@
+"""Process-wide pooled HTTP client shared by every Gemini request.
+
+A single keep-alive session is reused so DNS, TCP and TLS setup to the API
+host are paid once per process instead of once per question.  HTTP/2 is used
+when requested and ``httpx`` (with ``h2``) is installed; otherwise the client
+falls back to a pooled ``requests`` session.
+
+Both transports report DNS/connect/TLS/TTFB/total timings and request sizes
+to ``tracing``; DNS is only separable on the ``requests`` path.  Images in a
+payload can be ``Base64Blob``s, which are base64-encoded straight into a
+streamed request body instead of being built up as one large JSON string.
+"""
+
+import base64
+import json as jsonlib
+import os
+import socket
+import sys
+import threading
+import time
+
+import tracing
+
+# Overridable to route through a proxy or point benchmarks at a local mock server
+API_HOST = os.getenv("CYBERGUARD_API_HOST", "https://generativelanguage.googleapis.com").rstrip("/")
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_KEEPALIVE_EXPIRY = 90.0
+
+
+BODY_CHUNK = 64 * 1024  # Base64 characters produced per read of a streamed body
+
+
+class Base64Blob:
+    """Binary data sent as a base64 JSON string without ever being one.
+
+    Requests whose payload holds a blob get a streamed body: the JSON around
+    it is serialized once, and the blob is base64-encoded chunk by chunk as
+    the socket takes it.  ``raw`` is any bytes-like object (a ``memoryview``
+    of an encode buffer avoids even a bytes copy); ``text`` wraps data that is
+    already base64.  Blobs are read-only, so retries and hedged requests can
+    all stream the same one.
+    """
+
+    __slots__ = ("raw", "text", "prefix")
+
+    def __init__(self, raw=None, text: str = None, prefix: str = ""):
+        self.raw = memoryview(raw).cast("B") if raw is not None else None
+        self.text = text
+        self.prefix = prefix  # Sent before the data, e.g. "data:image/png;base64,"
+
+    def __len__(self):
+        encoded = len(self.text) if self.text is not None else (self.raw.nbytes + 2) // 3 * 4
+        return len(self.prefix) + encoded
+
+    def __str__(self):
+        # A full copy; only for callers that really need the text
+        return b"".join(self.chunks()).decode("ascii")
+
+    def with_prefix(self, prefix: str) -> "Base64Blob":
+        return Base64Blob(self.raw, self.text, prefix)
+
+    def head(self, size: int) -> bytes:
+        """At least the first ``size`` decoded bytes, e.g. to read an image header."""
+        if self.raw is not None:
+            return bytes(self.raw[:size])
+        return base64.b64decode(self.text[: (size + 2) // 3 * 4])
+
+    def decoded(self):
+        """The binary data; a view, not a copy, when the blob holds raw bytes."""
+        return self.raw if self.raw is not None else base64.b64decode(self.text)
+
+    def chunks(self):
+        if self.prefix:
+            yield self.prefix.encode("ascii")
+        if self.text is not None:
+            for start in range(0, len(self.text), BODY_CHUNK):
+                yield self.text[start:start + BODY_CHUNK].encode("ascii")
+            return
+        step = BODY_CHUNK // 4 * 3  # Whole 3-byte groups, so chunks need no padding
+        for start in range(0, self.raw.nbytes, step):
+            yield base64.b64encode(self.raw[start:start + step])
+
+
+class HTTPStatusError(RuntimeError):
+    def __init__(self, status_code: int, text: str, headers=None):
+        super().__init__(f"HTTP {status_code}: {text[:200]}")
+        self.status_code = status_code
+        self.text = text
+        self.headers = dict(headers or {})
+
+
+class PooledClient:
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        keepalive: bool = True,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = False,
+    ):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive = keepalive
+        self.http2 = False
+        self._httpx = None
+        self._session = None
+        if http2:
+            self._httpx = self._make_httpx_client(keepalive_expiry)
+            self.http2 = self._httpx is not None
+        if self._httpx is None:
+            self._session = self._make_requests_session()
+
+    # --- Construction ------------------------------------------------------ #
+    def _make_httpx_client(self, keepalive_expiry: float):
+        try:
+            import httpx
+            import h2  # noqa: F401  (httpx needs it for http2=True)
+        except ImportError:
+            return None
+        limits = httpx.Limits(
+            max_connections=self.pool_size,
+            max_keepalive_connections=self.pool_size if self.keepalive else 0,
+            keepalive_expiry=keepalive_expiry,
+        )
+        timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+        return httpx.Client(http2=True, limits=limits, timeout=timeout)
+
+    def _make_requests_session(self):
+        # Imported here so importing this module stays cheap at app startup
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = _traced_adapter(HTTPAdapter)(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            pool_block=False,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Connection"] = "keep-alive" if self.keepalive else "close"
+        return session
+
+    # --- Requests ---------------------------------------------------------- #
+    def post(self, url: str, json=None, headers=None):
+        body = _encode(json)
+        headers = _headers(body, headers)
+        with tracing.span("http.total"):
+            if self._httpx is not None:
+                trace = _HttpxTrace()
+                resp = self._httpx.post(url, content=_content(body), headers=headers, extensions=trace.extensions)
+                trace.finish()
+                return resp
+            resp = self._session.post(
+                url, data=body, headers=headers, timeout=(self.connect_timeout, self.read_timeout)
+            )
+            tracing.record("http.ttfb", resp.elapsed.total_seconds() * 1000.0)
+            return resp
+
+    def stream_lines(self, url: str, json=None, headers=None, on_headers=None):
+        """Yield decoded response lines as they arrive.
+
+        Closing the generator early closes the response, so callers can stop
+        reading a long reply without waiting for the server to finish it.
+        ``on_headers`` receives the headers of a successful response first.
+        """
+        body = _encode(json)
+        headers = _headers(body, headers)
+        with tracing.span("http.stream_total"):
+            if self._httpx is not None:
+                trace = _HttpxTrace()
+                with self._httpx.stream(
+                    "POST", url, content=_content(body), headers=headers, extensions=trace.extensions
+                ) as resp:
+                    trace.finish()
+                    if resp.status_code != 200:
+                        resp.read()
+                        raise HTTPStatusError(resp.status_code, resp.text, resp.headers)
+                    if on_headers is not None:
+                        on_headers(resp.headers)
+                    yield from resp.iter_lines()
+                return
+            yield from self._stream_requests(url, body, headers, on_headers)
+
+    def _stream_requests(self, url, body, headers, on_headers):
+        resp = self._session.post(
+            url,
+            data=body,
+            headers=headers,
+            stream=True,
+            timeout=(self.connect_timeout, self.read_timeout),
+        )
+        tracing.record("http.ttfb", resp.elapsed.total_seconds() * 1000.0)
+        try:
+            if resp.status_code != 200:
+                raise HTTPStatusError(resp.status_code, resp.text, resp.headers)
+            if on_headers is not None:
+                on_headers(resp.headers)
+            resp.encoding = resp.encoding or "utf-8"
+            yield from resp.iter_lines(decode_unicode=True)
+        finally:
+            resp.close()
+
+    def warm(self, url: str = None):
+        # Any response (even a 404) leaves an established connection in the pool.
+        url = url or API_HOST
+        try:
+            if self._httpx is not None:
+                self._httpx.head(url)
+            else:
+                self._session.head(url, timeout=(self.connect_timeout, self.read_timeout))
+        except Exception:
+            pass
+
+    def close(self):
+        if self._httpx is not None:
+            self._httpx.close()
+        if self._session is not None:
+            self._session.close()
+
+
+###############################################################################
+# ──────────────────────────────── TRACING ────────────────────────────────── #
+###############################################################################
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_BLOB_TEXT = f"\x00blob-{os.urandom(8).hex()}"  # Stands in for a blob while serializing ...
+_BLOB_MARK = jsonlib.dumps(_BLOB_TEXT)  # ... and is then found and cut out again
+
+
+class _StreamedBody:
+    """File-like JSON body whose blobs are base64-encoded as it is read.
+
+    It has a length, so it goes out with ``Content-Length`` rather than
+    chunked, and peak memory is one chunk however large the images are.
+    """
+
+    def __init__(self, pieces):
+        self._pieces = pieces  # bytes and Base64Blob, in body order
+        self._length = sum(len(piece) for piece in pieces)
+        self._chunks = None
+        self._pending = b""
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for piece in self._pieces:
+            if isinstance(piece, Base64Blob):
+                yield from piece.chunks()
+            elif piece:
+                yield piece
+
+    def read(self, size: int = -1) -> bytes:
+        # Short reads are fine for file-likes; only b"" means the end
+        if self._chunks is None:
+            self._chunks = iter(self)
+        if size is None or size < 0:
+            data = bytes(self._pending) + b"".join(self._chunks)
+            self._pending = b""
+            return data
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return b""
+            self._pending = memoryview(chunk)
+        data, self._pending = bytes(self._pending[:size]), self._pending[size:]
+        return data
+
+
+def _encode(payload):
+    # Serialized once here so the request size can be recorded for free
+    blobs = []
+
+    def stash(value):
+        if isinstance(value, Base64Blob):
+            blobs.append(value)
+            return _BLOB_TEXT
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+    text = jsonlib.dumps(payload, default=stash)
+    if not blobs:
+        body = text.encode("utf-8")
+    else:
+        pieces = []
+        parts = text.split(_BLOB_MARK)
+        for blob, before in zip(blobs, parts):
+            pieces += [before.encode("utf-8") + b'"', blob, b'"']
+        pieces.append(parts[-1].encode("utf-8"))
+        body = _StreamedBody(pieces)
+    tracing.record("http.request_bytes", len(body))
+    return body
+
+
+def _headers(body, extra):
+    headers = {**_JSON_HEADERS, **extra} if extra else _JSON_HEADERS
+    if isinstance(body, _StreamedBody):
+        headers = {**headers, "Content-Length": str(len(body))}
+    return headers
+
+
+def _content(body):
+    # httpx streams iterables; with Content-Length set it does not chunk them
+    return iter(body) if isinstance(body, _StreamedBody) else body
+
+
+def _traced_connection(base):
+    """``base`` urllib3 connection class that times DNS, TCP connect and TLS."""
+
+    class TracedConnection(base):
+        def _new_conn(self):
+            from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+            from urllib3.util import connection
+
+            # Resolve once, timed on its own, then connect to each address in
+            # turn as urllib3 would; a numeric host needs no second lookup
+            started = time.perf_counter()
+            try:
+                infos = socket.getaddrinfo(
+                    self._dns_host.strip("[]"), self.port, connection.allowed_gai_family(), socket.SOCK_STREAM
+                )
+            except (socket.gaierror, UnicodeError) as exc:
+                raise NameResolutionError(self.host, self, exc) from exc
+            resolved = time.perf_counter()
+            tracing.record("http.dns", (resolved - started) * 1000.0)
+            error = NewConnectionError(self, "Failed to establish a new connection: no addresses")
+            for *_, sockaddr in infos:
+                try:
+                    sock = connection.create_connection(
+                        (sockaddr[0], self.port),
+                        self.timeout,
+                        source_address=self.source_address,
+                        socket_options=self.socket_options,
+                    )
+                    break
+                except socket.timeout:
+                    error = ConnectTimeoutError(
+                        self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+                    )
+                except OSError as exc:
+                    error = NewConnectionError(self, f"Failed to establish a new connection: {exc}")
+            else:
+                raise error
+            sys.audit("http.client.connect", self, self.host, self.port)
+            connected = time.perf_counter()
+            tracing.record("http.connect", (connected - resolved) * 1000.0)
+            self._traced_new_conn_ms = (connected - started) * 1000.0
+            return sock
+
+        def connect(self):
+            started = time.perf_counter()
+            self._traced_new_conn_ms = 0.0
+            super().connect()
+            if hasattr(self, "ssl_context"):
+                total = (time.perf_counter() - started) * 1000.0
+                tracing.record("http.tls", max(0.0, total - self._traced_new_conn_ms))
+
+    TracedConnection.__name__ = f"Traced{base.__name__}"
+    return TracedConnection
+
+
+def _traced_adapter(adapter_cls):
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TracedHTTPPool(HTTPConnectionPool):
+        ConnectionCls = _traced_connection(HTTPConnection)
+
+    class TracedHTTPSPool(HTTPSConnectionPool):
+        ConnectionCls = _traced_connection(HTTPSConnection)
+
+    class TracedAdapter(adapter_cls):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {"http": TracedHTTPPool, "https": TracedHTTPSPool}
+
+    return TracedAdapter
+
+
+class _HttpxTrace:
+    """Collects httpcore trace events for one request (connect includes DNS)."""
+
+    _SPANS = {
+        "connection.connect_tcp": "http.connect",
+        "connection.start_tls": "http.tls",
+    }
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._open = {}
+        self.extensions = {"trace": self._on_event}
+
+    def _on_event(self, event: str, _info):
+        now = time.perf_counter()
+        prefix, _, phase = event.rpartition(".")
+        if phase == "started":
+            self._open[prefix] = now
+        elif phase == "complete":
+            begun = self._open.pop(prefix, None)
+            if prefix in self._SPANS and begun is not None:
+                tracing.record(self._SPANS[prefix], (now - begun) * 1000.0)
+            elif prefix.endswith("receive_response_headers"):
+                tracing.record("http.ttfb", (now - self.started) * 1000.0)
+
+    def finish(self):
+        self._open.clear()
+
+
+###############################################################################
+# ─────────────────────────── SHARED INSTANCE ────────────────────────────── #
+###############################################################################
+
+_client = None
+_client_lock = threading.Lock()
+_client_options = {}
+
+
+def configure(**options):
+    """Set options for the shared client; replaces it if already created."""
+    global _client
+    with _client_lock:
+        _client_options.clear()
+        _client_options.update(options)
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_client() -> PooledClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PooledClient(**_client_options)
+    return _client
+
+
+def warm_async(url: str = None) -> threading.Thread:
+    thread = threading.Thread(target=lambda: get_client().warm(url), daemon=True)
+    thread.start()
+    return thread
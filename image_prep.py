@@ -0,0 +1,132 @@
+"""Capture processing between window grab and the Gemini image request.
+
+Screenshots are clamped to a maximum resolution and re-encoded as JPEG or
+WebP, which shrinks 4K/multi-monitor payloads by an order of magnitude.  A
+digest of every encoded frame lets a capture identical to a recently analyzed
+one reuse its verdict instead of paying for another request.  The match is
+exact on purpose: perceptual hashes cannot tell apart screens that differ only
+in their text, such as the address of a phishing page.
+"""
+
+import base64
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image
+
+import tracing
+from http_pool import Base64Blob
+
+DEFAULT_MAX_SIZE = (1920, 1080)
+DEFAULT_FORMAT = "JPEG"
+DEFAULT_QUALITY = 80
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+@dataclass
+class PreparedFrame:
+    data: Base64Blob  # The encoded image, base64-encoded only as it is sent
+    mime_type: str
+    digest: str  # Of the encoded image; equal only for identical content
+    size: tuple
+
+
+def open_b64(b64_image) -> Image.Image:
+    """Decode a base64 ``str`` or a ``Base64Blob`` (no base64 pass if it holds raw bytes)."""
+    raw = b64_image.decoded() if isinstance(b64_image, Base64Blob) else base64.b64decode(b64_image)
+    image = Image.open(io.BytesIO(raw))
+    image.load()
+    return image
+
+
+def content_digest(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class CaptureProcessor:
+    def __init__(
+        self,
+        max_size=DEFAULT_MAX_SIZE,
+        fmt: str = DEFAULT_FORMAT,
+        quality: int = DEFAULT_QUALITY,
+        recent_frames: int = 64,
+        recent_ttl: float = 600.0,
+    ):
+        self.max_size = tuple(max_size)
+        self.format = fmt.upper()
+        self.quality = quality
+        self.recent_frames = recent_frames
+        self.recent_ttl = recent_ttl
+        self._recent = OrderedDict()  # Content key -> (timestamp, verdict), oldest first
+        self._lock = threading.Lock()
+
+    def process(self, b64_png) -> PreparedFrame:
+        return self.process_image(open_b64(b64_png), original=b64_png)
+
+    def process_image(self, image: Image.Image, original=None) -> PreparedFrame:
+        with tracing.span("capture.encode"):
+            frame = self._prepare(image, original)
+        tracing.record("capture.image_bytes", len(frame.data))
+        return frame
+
+    def _prepare(self, image, original):
+        resized = image.width > self.max_size[0] or image.height > self.max_size[1]
+        if resized:
+            image = image.copy()
+            image.thumbnail(self.max_size, Image.LANCZOS)
+        fmt = self.format
+        if fmt not in MIME_TYPES:
+            fmt = DEFAULT_FORMAT
+        if fmt == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        # The encoder writes straight into this buffer and the request body
+        # reads a view of it, so the frame is never copied into a string
+        buf = io.BytesIO()
+        if fmt == "PNG":
+            image.save(buf, format=fmt, optimize=True)
+        else:
+            image.save(buf, format=fmt, quality=self.quality)
+        data = Base64Blob(buf.getbuffer())
+        if original is not None and not resized and len(original) <= len(data):
+            # Flat UI captures can compress better as the original PNG
+            if not isinstance(original, Base64Blob):
+                original = Base64Blob(text=original)
+            data, fmt = original, "PNG"
+        # Keyed on the bytes the model is sent; encoding is deterministic, so
+        # the same pixels always give the same digest
+        return PreparedFrame(data, MIME_TYPES[fmt], content_digest(data.decoded()), image.size)
+
+    # --- Recent verdicts --------------------------------------------------- #
+    def lookup(self, frame: PreparedFrame, prompt: str = ""):
+        """The verdict of a recent request for exactly this frame and prompt."""
+        return self.lookup_key(content_key([frame], prompt))
+
+    def remember(self, frame: PreparedFrame, verdict: str, prompt: str = ""):
+        self.remember_key(content_key([frame], prompt), verdict)
+
+    def lookup_key(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._recent.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] > self.recent_ttl:
+                del self._recent[key]
+                return None
+            return entry[1]
+
+    def remember_key(self, key: str, verdict: str):
+        with self._lock:
+            self._recent.pop(key, None)
+            self._recent[key] = (time.time(), verdict)
+            while len(self._recent) > self.recent_frames:
+                self._recent.popitem(last=False)
+
+
+def content_key(frames, prompt: str = "") -> str:
+    """Verdict cache key for ``frames`` analyzed together under ``prompt``."""
+    return content_digest("\0".join([prompt, *(f.digest for f in frames)]).encode("utf-8"))
@@ -0,0 +1,424 @@
+"""Local checks for pasted links, email headers and file hashes.
+
+Rules from ``indicators.json``, plus any blocklist files listed in
+``CYBERGUARD_BLOCKLISTS``, are compiled once into hash sets and a
+deletion-neighbourhood index of brand names, so a prompt is checked in
+microseconds before anything is sent to the model.  Blocklisted hashes and
+domains, homoglyph look-alikes of brand domains, brand domains embedded in
+someone else's and links whose text names a brand's site but go to a
+suspicious address are conclusive and answered locally; weaker signs
+(misspelt brands, links whose text and address merely differ, raw-IP links,
+risky TLDs, short links, mismatched sender headers) go to the model with the
+prompt.
+"""
+
+import ipaddress
+import json
+import os
+import pathlib
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+INDICATORS_ENV = "CYBERGUARD_INDICATORS"
+BLOCKLISTS_ENV = "CYBERGUARD_BLOCKLISTS"  # os.pathsep-separated text files, one indicator per line
+INDICATORS_FILE = pathlib.Path(__file__).with_name("indicators.json")
+DANGER = 2  # Conclusive: answered without the model
+WARNING = 1  # Passed to the model alongside the prompt
+FUZZY_MIN_LENGTH = 6  # Brand names shorter than this only match look-alikes exactly
+HOST_CACHE_SIZE = 4096
+
+_URL_RE = re.compile(r"\b(?:https?|ftp)://[^\s<>\"'`)\]]+", re.I)
+_DOMAIN_RE = re.compile(r"(?<![\w@./:-])((?:[\w-]{1,63}\.)+[^\W\d_]{2,63})(?![\w-]|\.\w)")
+_EMAIL_RE = re.compile(r"[\w.+-]+@((?:[\w-]{1,63}\.)+[\w-]{2,63})")
+_HASH_RE = re.compile(r"\b(?:[0-9a-f]{64}|[0-9a-f]{40}|[0-9a-f]{32})\b", re.I)
+_IP_RE = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+_MD_LINK_RE = re.compile(r"\[([^\]]{1,300})\]\((\S+?)\)")
+_HTML_LINK_RE = re.compile(r"<a\s[^>]*?href\s*=\s*[\"']?([^\"'\s>]+)[^>]*>(.{1,300}?)</a>", re.I | re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_HEADER_RE = re.compile(r"^(from|reply-to|return-path):[ \t]*(.*)$", re.I | re.M)
+_INT_HOST_RE = re.compile(r"^(?:0x[0-9a-f]+|\d+)$", re.I)
+_SPLIT_RE = re.compile(r"[.-]")
+_REFANG = (("hxxp", "http"), ("[.]", "."), ("(.)", "."), ("[:]", ":"))
+
+
+@dataclass
+class Finding:
+    kind: str  # "blocklist", "lookalike", "link-text", "raw-ip", "risky-tld", ...
+    severity: int
+    indicator: str
+    detail: str
+
+
+@dataclass
+class Assessment:
+    findings: list = field(default_factory=list)
+
+    @property
+    def conclusive(self) -> bool:
+        return any(f.severity >= DANGER for f in self.findings)
+
+    def answer(self):
+        """A local reply when the findings are conclusive, else None."""
+        if not self.conclusive:
+            return None
+        ranked = sorted(self.findings, key=lambda f: -f.severity)[:3]
+        advice = (
+            "Don't open or run that file; delete it and run a virus scan if you already did."
+            if ranked[0].kind == "blocklist-hash"
+            else "Don't click the link, sign in or download anything from it."
+        )
+        return "Don't trust this: " + "; ".join(f.detail for f in ranked) + ". " + advice
+
+    def notes(self) -> str:
+        """The findings as a note for the model, or "" when there are none."""
+        if not self.findings:
+            return ""
+        return "\n\n(Automatic checks on this message found: " + "; ".join(f.detail for f in self.findings) + ".)"
+
+
+def refang(text: str) -> str:
+    """Undo the usual defanging: ``hxxp://evil[.]com`` -> ``http://evil.com``."""
+    for old, new in _REFANG:
+        text = text.replace(old, new)
+    return text
+
+
+###############################################################################
+# ───────────────────────────────── ENGINE ────────────────────────────────── #
+###############################################################################
+
+class IndicatorEngine:
+    def __init__(self, rules: dict, blocklist_lines=()):
+        self.brands = {d.lower(): name for d, name in rules.get("brands", {}).items()}
+        self.risky_tlds = {t.lower().lstrip(".") for t in rules.get("risky_tlds", [])}
+        self.shorteners = {d.lower() for d in rules.get("shorteners", [])}
+        self.brand_shorteners = {d.lower(): name for d, name in rules.get("brand_shorteners", {}).items()}
+        self.redirectors = tuple(d.lower() for d in rules.get("redirectors", []))
+        self.two_level = {s.lower() for s in rules.get("two_level_suffixes", [])}
+        self.file_extensions = {e.lower() for e in rules.get("file_extensions", [])}
+        self.blocked_domains = {d.lower() for d in rules.get("blocked_domains", [])}
+        self.blocked_ips = set(rules.get("blocked_ips", []))
+        self.blocked_hashes = {h.lower() for h in rules.get("blocked_hashes", [])}
+        self._confusables = str.maketrans(rules.get("confusables", {}))
+        for line in blocklist_lines:
+            self.add_blocked(line)
+        # Brand label skeletons, plus every one-character deletion of the longer
+        # ones: two names within one edit share a key, so a fuzzy look-alike
+        # check is a handful of dict lookups
+        self._brand_by_skeleton = {}
+        self._brand_nearby = {}
+        self._brand_tokens = {}  # Brand label -> brand domain, for "paypal-login.com"
+        self._brand_sites = {}  # Brand name -> its sites, for sender display names
+        self._site_brands = {}  # Brand site -> brand name
+        for domain, name in self.brands.items():
+            site = self.registrable(domain)
+            label = site.split(".")[0]
+            skeleton = self.skeleton(label)
+            self._brand_by_skeleton.setdefault(skeleton, domain)
+            self._brand_tokens.setdefault(label, domain)
+            self._brand_sites.setdefault(name.lower(), set()).add(site)
+            self._site_brands[site] = name
+            if len(skeleton) >= FUZZY_MIN_LENGTH:
+                for variant in _deletions(skeleton) | {skeleton}:
+                    self._brand_nearby.setdefault(variant, domain)
+        for domain, name in self.brand_shorteners.items():
+            self._site_brands.setdefault(domain, name)  # aka.ms is Microsoft's own
+        names = sorted((n for n in self._brand_sites if len(n) >= 3), key=len, reverse=True)
+        self._brand_name_re = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b") if names else None
+        self.check_host = lru_cache(maxsize=HOST_CACHE_SIZE)(self._check_host)
+
+    @classmethod
+    def load(cls, path=None, blocklists=None) -> "IndicatorEngine":
+        path = pathlib.Path(path or os.getenv(INDICATORS_ENV) or INDICATORS_FILE)
+        with open(path, encoding="utf-8") as fh:
+            rules = json.load(fh)
+        if blocklists is None:
+            blocklists = [p for p in os.getenv(BLOCKLISTS_ENV, "").split(os.pathsep) if p]
+        return cls(rules, _read_lines(blocklists))
+
+    def add_blocked(self, indicator: str):
+        """Add one blocklist entry: a file hash, an IP address or a domain/URL."""
+        indicator = refang(indicator.strip()).lower()
+        if not indicator or indicator.startswith("#"):
+            return
+        if _HASH_RE.fullmatch(indicator):
+            self.blocked_hashes.add(indicator)
+        elif _is_ip(indicator):
+            self.blocked_ips.add(indicator)
+        else:
+            host = _host(indicator if "://" in indicator else "http://" + indicator)
+            if host:
+                self.blocked_domains.add(host)
+
+    # --- Checks ------------------------------------------------------------ #
+    def assess(self, text: str) -> Assessment:
+        text = refang(text)
+        findings, seen = [], set()
+
+        def add(found):
+            for finding in found:
+                if (finding.kind, finding.indicator) not in seen:
+                    seen.add((finding.kind, finding.indicator))
+                    findings.append(finding)
+
+        # Each scan is skipped when the text cannot contain what it looks for
+        hosts = []
+        if "://" in text:
+            for url in _URL_RE.findall(text):
+                host = _host(url)
+                if host:
+                    hosts.append(host)
+                    if _is_ip(host) or _INT_HOST_RE.match(host):
+                        add([Finding("raw-ip", WARNING, host, f"a link goes straight to the IP address {host}")])
+        lowered = text.lower()
+        if "." in text:
+            for domain in _DOMAIN_RE.findall(lowered):
+                if domain.rsplit(".", 1)[-1] not in self.file_extensions:
+                    hosts.append(domain)
+            if "@" in text:
+                hosts += _EMAIL_RE.findall(lowered)
+            if self.blocked_ips:
+                for ip in _IP_RE.findall(text):
+                    if ip in self.blocked_ips:
+                        add([Finding("blocklist", DANGER, ip, f"{ip} is on the blocklist of known bad addresses")])
+        for host in hosts:
+            add(self.check_host(host))
+        if len(text) >= 32:
+            for digest in _HASH_RE.findall(lowered):
+                if digest in self.blocked_hashes:
+                    add([Finding("blocklist-hash", DANGER, digest, f"the hash {digest[:12]}… matches a known malicious file")])
+        if "](" in text or "<a" in lowered:
+            add(self._link_text(text))
+        if ":" in text and _HEADER_RE.search(text):
+            add(self._headers(text))
+        return Assessment(findings)
+
+    def _check_host(self, host: str) -> tuple:
+        if _is_ip(host) or _INT_HOST_RE.match(host):
+            if host in self.blocked_ips:
+                return (Finding("blocklist", DANGER, host, f"{host} is on the blocklist of known bad addresses"),)
+            return ()
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            if ".".join(labels[i:]) in self.blocked_domains:
+                return (Finding("blocklist", DANGER, host, f"{host} is on the blocklist of known bad sites"),)
+        if any(".".join(labels[i:]) in self.brands for i in range(len(labels) - 1)):
+            return ()  # The real thing, or one of its subdomains
+        site = self.registrable(host)
+        if self.brand_of(site) is not None:
+            return ()  # The brand's own country site, e.g. www.amazon.com.au
+        found = []
+        lookalike = self._lookalike(site)
+        if lookalike is not None:
+            brand, exact = lookalike
+            how = "look-alike characters" if exact else "a misspelling"
+            found.append(Finding("lookalike", DANGER if exact else WARNING, host, f"{host} uses {how} to imitate {brand}"))
+        else:
+            embedded = self._embedded_brand(labels)
+            if embedded is not None:
+                brand, severity = embedded
+                found.append(
+                    Finding(
+                        "brand-in-host", severity, host,
+                        f"{host} does not belong to {self.brands[brand]} even though it contains {brand}",
+                    )
+                )
+            else:
+                name = site.split(".")[0]  # amazon.fr is Amazon under another ending, not a mention
+                tokens = [t for t in _SPLIT_RE.split(host) if len(t) >= 4 and t in self._brand_tokens and t != name]
+                if tokens and site not in self.shorteners:
+                    brand = self._brand_tokens[tokens[0]]
+                    found.append(
+                        Finding("brand-in-host", WARNING, host, f"{host} mentions {self.brands[brand]} but does not belong to {brand}")
+                    )
+            if not host.isascii() or "xn--" in host:
+                found.append(Finding("idn", WARNING, host, f"{host} uses international characters that can disguise an address"))
+        tld = labels[-1]
+        if tld in self.risky_tlds:
+            found.append(Finding("risky-tld", WARNING, host, f"{host} uses the .{tld} ending, which is common in scams"))
+        if site in self.shorteners:
+            found.append(Finding("shortener", WARNING, host, f"{host} is a link shortener that hides where the link really goes"))
+        return tuple(found)
+
+    def _lookalike(self, site: str):
+        """``(brand domain, exact)`` when ``site`` imitates a brand, else None."""
+        label = _unicode(site.split(".")[0])
+        skeleton = self.skeleton(label)
+        brand = self._brand_by_skeleton.get(skeleton)
+        if brand is not None:
+            brand_label = self.registrable(brand).split(".")[0]
+            if label != brand_label:
+                # dhi.com and lrs.gov are real sites one ASCII letter from a
+                # brand; only disguises nobody types by accident are certain
+                return brand, _disguised(label, brand_label)
+            return None  # Same name under another ending, e.g. amazon.fr
+        if len(skeleton) < FUZZY_MIN_LENGTH - 1:
+            return None
+        for key in (skeleton, *_deletions(skeleton)):
+            brand = self._brand_nearby.get(key)
+            if brand is not None:
+                return brand, False
+        return None
+
+    def _embedded_brand(self, labels):
+        """``(brand domain, severity)`` for a brand domain in the middle of
+        someone else's, as in paypal.com.account-check.io, else None."""
+        for i in range(len(labels) - 2):
+            for n in (2, 3):
+                candidate = ".".join(labels[i:i + n])
+                if i + n < len(labels) and candidate in self.brands:
+                    # amazon.com.be may be a country suffix missing from two_level_suffixes
+                    rest = labels[i + n:]
+                    return candidate, WARNING if len(rest) == 1 and len(rest[0]) == 2 else DANGER
+        return None
+
+    def _link_text(self, text: str) -> list:
+        found = []
+        pairs = [(label, url) for label, url in _MD_LINK_RE.findall(text)]
+        pairs += [(_TAG_RE.sub("", label), url) for url, label in _HTML_LINK_RE.findall(text)]
+        for label, url in pairs:
+            label = label.lower()
+            shown = _URL_RE.search(label)
+            shown = _host(shown.group()) if shown else next(iter(_DOMAIN_RE.findall(label)), "")
+            target = _host(url)
+            if not shown or not target:
+                continue
+            shown_site = self.registrable(shown)
+            target_site = self.registrable(target)
+            if shown_site == target_site:
+                continue
+            shown_brand = self.brand_of(shown_site)
+            if shown_brand is not None and shown_brand == self.brand_of(target_site):
+                continue  # amazon.com shown, amazon.co.uk or aka.ms linked
+            # Newsletters link through click trackers and shorteners, so the
+            # mismatch alone is only a warning; a brand shown over an address
+            # that is itself suspicious is certain
+            severity = WARNING
+            if shown_brand is not None and not self.is_redirector(target):
+                if any(f.kind != "shortener" for f in self.check_host(target)):
+                    severity = DANGER
+            found.append(
+                Finding("link-text", severity, target, f"a link that shows {shown_site} really goes to {target_site}")
+            )
+        return found
+
+    def _headers(self, text: str) -> list:
+        found, sender = [], None
+        for name, value in _HEADER_RE.findall(text):
+            address = _EMAIL_RE.search(value.lower())
+            if address is None:
+                continue
+            site = self.registrable(address.group(1))
+            if name.lower() == "from":
+                sender = site
+                display = value[: address.start()].lower()
+                named = self._brand_name_re.search(display) if self._brand_name_re else None
+                if named and (self.brand_of(site) or "").lower() != named.group(1):
+                    brand_name = self.brands[next(iter(self._brand_sites[named.group(1)]))]
+                    found.append(
+                        Finding("sender", WARNING, site, f"the sender calls itself {brand_name} but writes from {site}")
+                    )
+            elif sender is not None and site != sender:
+                found.append(Finding("reply-to", WARNING, site, f"replies go to {site}, not the sender's {sender}"))
+        return found
+
+    # --- Names ------------------------------------------------------------- #
+    def registrable(self, host: str) -> str:
+        """The part of ``host`` someone registered: ``login.paypal.co.uk`` -> ``paypal.co.uk``."""
+        labels = host.rstrip(".").split(".")
+        if len(labels) >= 3 and ".".join(labels[-2:]) in self.two_level:
+            return ".".join(labels[-3:])
+        return ".".join(labels[-2:])
+
+    def is_redirector(self, host: str) -> bool:
+        """True for link shorteners and email click trackers."""
+        if self.registrable(host) in self.shorteners:
+            return True
+        return any(host == d or host.endswith("." + d) for d in self.redirectors)
+
+    def brand_of(self, site: str):
+        """The brand name when ``site`` is one of its sites, country sites such
+        as ``amazon.com.au`` included, else None."""
+        name = self._site_brands.get(site)
+        if name is None:
+            label, _, suffix = site.partition(".")
+            domain = self._brand_tokens.get(label)
+            if domain is not None and suffix in self.two_level and domain not in self.two_level:
+                name = self.brands[domain]
+        return name
+
+    def skeleton(self, label: str) -> str:
+        """What ``label`` looks like: homoglyphs, digits and accents folded away."""
+        text = label.lower()
+        if not text.isascii():
+            text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+        text = text.translate(self._confusables)
+        return text.replace("rn", "m").replace("vv", "w").replace("-", "")
+
+
+def _disguised(label: str, brand_label: str) -> bool:
+    """True when ``label`` needs a non-ASCII homoglyph, a digit or a multi-letter
+    swap (rn for m, vv for w) to look like ``brand_label``."""
+    if not label.isascii() or any(c.isdigit() for c in label):
+        return True
+    return any(pair in label and pair not in brand_label for pair in ("rn", "vv"))
+
+
+def _deletions(word: str):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _is_ip(value: str) -> bool:
+    if not value or not (value[0].isdigit() or value[0] in "[:"):
+        return False
+    try:
+        ipaddress.ip_address(value.strip("[]"))
+    except ValueError:
+        return False
+    return True
+
+
+def _host(url: str) -> str:
+    try:
+        host = urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+    return host.rstrip(".")
+
+
+def _unicode(label: str) -> str:
+    if label.startswith("xn--"):
+        try:
+            return label.encode("ascii").decode("idna")
+        except UnicodeError:
+            pass
+    return label
+
+
+def _read_lines(paths):
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                yield from fh
+        except OSError:
+            continue  # A missing blocklist must not stop the app
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_engine() -> IndicatorEngine:
+    """The shared engine, loaded on first use."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            try:
+                _default = IndicatorEngine.load()
+            except (OSError, ValueError):
+                _default = IndicatorEngine({})
+        return _default
@@ -0,0 +1,295 @@
+"""Client-side request and token quotas, paced before the server rejects us.
+
+Gemini enforces requests-per-minute and tokens-per-minute quotas per model.
+A ``RateLimiter`` holds one token bucket for each, charges every request its
+estimated token cost (text length plus 258 tokens per 768 px image tile, the
+way Gemini bills images) and admits waiting requests highest priority first,
+keeping a slice of each bucket for interactive requests.  Limits can be set up
+front or learned: quota headers (``x-ratelimit-*``), the quota value in a 429
+body and ``Retry-After`` / ``retryDelay`` all adjust the buckets or pause
+admission until the server is ready again.
+"""
+
+import base64
+import heapq
+import io
+import itertools
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+
+import tracing
+from http_pool import Base64Blob
+from scheduler import PRIORITY_INTERACTIVE, RequestCancelled
+
+CHARS_PER_TOKEN = 4
+IMAGE_TILE = 768  # Gemini bills images per 768x768 tile ...
+IMAGE_TILE_TOKENS = 258  # ... at this many tokens each
+SMALL_IMAGE = 384  # Images at most this size on both sides are a single tile
+BURST_FRACTION = 0.1  # Bucket capacity as a share of the per-minute limit
+RESERVE_FRACTION = 0.2  # Share of each bucket only interactive requests may use
+LEARN_FACTOR = 0.9  # A 429 with no stated quota caps us just below the rate that hit it
+LEARN_TTL = 600.0  # ... until this many seconds pass without another 429
+MAX_PAUSE = 120.0  # Longest Retry-After honoured, in seconds
+_POLL = 0.1
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value) -> float:
+    """Seconds in ``"23s"``, ``"6m0s"``, ``"150ms"`` or a bare number; None if unreadable."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _UNITS[unit] for number, unit in parts)
+
+
+###############################################################################
+# ─────────────────────────────── ESTIMATES ───────────────────────────────── #
+###############################################################################
+
+def image_tokens(b64_data) -> int:
+    try:
+        from PIL import Image
+
+        # The header is enough for the size; skip decoding the whole screenshot
+        if isinstance(b64_data, Base64Blob):
+            head = b64_data.head(6144)
+        else:
+            head = base64.b64decode(b64_data[:8192])
+        width, height = Image.open(io.BytesIO(head)).size
+    except Exception:
+        return IMAGE_TILE_TOKENS * 4  # Unknown: assume a full-screen capture
+    if width <= SMALL_IMAGE and height <= SMALL_IMAGE:
+        return IMAGE_TILE_TOKENS
+    return IMAGE_TILE_TOKENS * math.ceil(width / IMAGE_TILE) * math.ceil(height / IMAGE_TILE)
+
+
+def estimate_payload_tokens(payload: dict) -> int:
+    """Input tokens of a Gemini-style payload, from text length and image sizes."""
+    chars, tokens = 0, 0
+    for content in payload.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                chars += len(part["text"])
+            elif "inline_data" in part:
+                tokens += image_tokens(part["inline_data"].get("data", ""))
+    return tokens + chars // CHARS_PER_TOKEN + 1
+
+
+###############################################################################
+# ──────────────────────────────── BUCKETS ────────────────────────────────── #
+###############################################################################
+
+class TokenBucket:
+    def __init__(self, limit_per_minute: float, burst: float = None):
+        self.level = None
+        self.configure(limit_per_minute, burst)
+        self.updated = time.monotonic()
+
+    def configure(self, limit_per_minute: float, burst: float = None):
+        """``burst`` defaults to a tenth of the limit; refill is set so no
+        60 s window admits more than ``limit_per_minute``."""
+        self.limit = float(limit_per_minute)
+        self.capacity = max(1.0, burst if burst is not None else self.limit * BURST_FRACTION)
+        self.rate = max(self.limit - self.capacity, self.limit * 0.5) / 60.0
+        self.level = self.capacity if self.level is None else min(self.level, self.capacity)
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        # A request larger than the bucket goes through once the bucket is full
+        need = min(amount + reserve * self.capacity, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = None, tpm: float = None, burst: float = None):
+        self.requests = TokenBucket(rpm, burst) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.throttled = 0  # 429s seen
+        self._base_rpm = (rpm, burst)  # What to return to when a learned limit expires
+        self._learned_until = None
+        self._admitted = deque()  # Admission times over the last minute, to learn a limit from
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def configure(self, rpm: float = None, tpm: float = None, burst: float = None):
+        with self._cond:
+            if rpm:
+                self.requests = _reconfigure(self.requests, rpm, burst)
+                self._base_rpm = (rpm, burst)
+                self._learned_until = None
+            if tpm:
+                self.tokens = _reconfigure(self.tokens, tpm)
+            self._cond.notify_all()
+
+    def acquire(self, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE, cancelled=None) -> float:
+        """Block until a request costing ``tokens`` may start; returns seconds waited.
+
+        Waiters are admitted strictly by priority, then arrival order, and
+        lower-priority requests may not dip into the interactive reserve.
+        """
+        started = time.monotonic()
+        ticket = (-priority, next(self._seq))
+        reserve = 0.0 if priority >= PRIORITY_INTERACTIVE else RESERVE_FRACTION
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise RequestCancelled()
+                    now = time.monotonic()
+                    wait = _POLL
+                    if self._waiting[0] == ticket:
+                        wait = self._wait_time(now, tokens, reserve)
+                        if wait <= 0.0:
+                            self._take(now, tokens)
+                            break
+                    self._cond.wait(min(wait, _POLL))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            tracing.record("ratelimit.wait", waited * 1000.0)
+        return waited
+
+    def observe(self, headers):
+        """Adopt the limits and remaining budget a server reports, if any."""
+        if not headers:
+            return
+        headers = {k.lower(): v for k, v in headers.items()}
+        rpm = _number(headers.get("x-ratelimit-limit-requests"))
+        tpm = _number(headers.get("x-ratelimit-limit-tokens"))
+        with self._cond:
+            if rpm:
+                self.requests = _reconfigure(self.requests, rpm)
+                self._base_rpm = (rpm, None)
+                self._learned_until = None
+            if tpm:
+                self.tokens = _reconfigure(self.tokens, tpm)
+            now = time.monotonic()
+            for bucket, name in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = _number(headers.get(f"x-ratelimit-remaining-{name}"))
+                if bucket is not None and remaining is not None:
+                    bucket.refill(now)
+                    bucket.level = min(bucket.level, remaining)
+            self._cond.notify_all()
+
+    def on_throttled(self, headers=None, body: str = None) -> float:
+        """Handle a 429: pause until the server says to retry and tighten the
+        request limit.  Returns the pause in seconds."""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        delay, quotas = _retry_info(body)
+        delay = parse_duration(headers.get("retry-after")) or delay or 1.0
+        delay = min(delay, MAX_PAUSE)
+        self.observe(headers)
+        with self._cond:
+            self.throttled += 1
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + delay)
+            if quotas.get("requests"):
+                self.requests = _reconfigure(self.requests, quotas["requests"])
+            if quotas.get("tokens"):
+                self.tokens = _reconfigure(self.tokens, quotas["tokens"])
+            if not quotas:
+                self._learn(now)
+            # Whatever budget we thought was left, the server disagrees
+            drained = [self.requests, self.tokens] if quotas.get("tokens") else [self.requests]
+            for bucket in drained:
+                if bucket is not None:
+                    bucket.refill(now)
+                    bucket.level = 0.0
+            self._cond.notify_all()
+        return delay
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "rpm": self.requests.limit if self.requests else None,
+                "tpm": self.tokens.limit if self.tokens else None,
+                "paused_s": max(0.0, self.paused_until - time.monotonic()),
+                "waiting": len(self._waiting),
+                "throttled": self.throttled,
+            }
+
+    # --- Internal helpers (called with the condition held) ----------------- #
+    def _wait_time(self, now, tokens, reserve):
+        if self._learned_until is not None and now >= self._learned_until:
+            rpm, burst = self._base_rpm
+            self.requests = _reconfigure(self.requests, rpm, burst) if rpm else None
+            self._learned_until = None
+        wait = self.paused_until - now
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_time(amount, reserve))
+        return wait
+
+    def _take(self, now, tokens):
+        if self.requests is not None:
+            self.requests.level -= 1
+        if self.tokens is not None:
+            self.tokens.level -= min(tokens, self.tokens.level)
+        self._admitted.append(now)
+        while self._admitted and now - self._admitted[0] > 60.0:
+            self._admitted.popleft()
+
+    def _learn(self, now):
+        # No stated quota: the server evidently allows a little less than what we just sent
+        recent = sum(1 for t in self._admitted if now - t <= 60.0)
+        limit = max(1.0, recent * LEARN_FACTOR)
+        if self.requests is None or limit < self.requests.limit:
+            self.requests = _reconfigure(self.requests, limit)
+        self._learned_until = now + LEARN_TTL
+
+
+def _reconfigure(bucket, limit, burst=None):
+    if bucket is None:
+        return TokenBucket(limit, burst)
+    bucket.configure(limit, burst)
+    return bucket
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _retry_info(body: str):
+    """``retryDelay`` and per-minute quota values from a Google API error body."""
+    delay, quotas = None, {}
+    try:
+        details = json.loads(body)["error"].get("details", [])
+    except Exception:
+        return delay, quotas
+    for detail in details:
+        if not isinstance(detail, dict):
+            continue
+        if "retryDelay" in detail:
+            delay = parse_duration(detail["retryDelay"])
+        for violation in detail.get("violations", []):
+            quota_id = str(violation.get("quotaId", ""))
+            value = _number(violation.get("quotaValue"))
+            if value and "PerMinute" in quota_id:
+                quotas["tokens" if "Token" in quota_id else "requests"] = value
+    return delay, quotas
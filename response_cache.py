@@ -0,0 +1,169 @@
+"""Response cache for text prompts: in-memory LRU backed by SQLite.
+
+Entries are keyed by the normalized prompt plus everything that changes the
+model's answer (model name, generationConfig, the complex/simple mode and any
+conversation history sent with the prompt).
+Both tiers evict by entry count and by age.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_DISK_ENTRIES = 5000
+DEFAULT_TTL = 7 * 24 * 3600.0
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.casefold().split()).rstrip("?!. ")
+
+
+def cache_key(prompt: str, model: str, generation_config: dict, complex_mode: bool, context=None) -> str:
+    """``context`` is the conversation history sent along, if any."""
+    material = {
+        "prompt": normalize_prompt(prompt),
+        "model": model,
+        "config": generation_config,
+        "complex": bool(complex_mode),
+    }
+    if context:
+        material["context"] = context
+    material = json.dumps(material, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path=None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._mem = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            try:
+                self._db = self._open_db(path)
+            except sqlite3.Error:
+                self._db = None  # Fall back to memory only
+
+    @staticmethod
+    def _open_db(path) -> sqlite3.Connection:
+        db = sqlite3.connect(str(path), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        db.commit()
+        return db
+
+    # --- Public API -------------------------------------------------------- #
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._mem[key]
+            value = self._disk_get(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._mem_put(key, now, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                        (key, value, now, now),
+                    )
+                    self._evict_disk(now)
+                    self._db.commit()
+                except sqlite3.Error:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._mem),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- Internal helpers -------------------------------------------------- #
+    def _mem_put(self, key, created, value):
+        self._mem[key] = (created, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        except sqlite3.Error:
+            return None
+        self._mem_put(key, created, value)
+        return value
+
+    def _evict_disk(self, now):
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
@@ -0,0 +1,172 @@
+"""Chat bubble text: model markdown to sanitized rich text.
+
+Replies arrive as loose markdown.  ``render`` turns one into the plain text
+used for copying and a small HTML subset for display (paragraphs, headings,
+bullet and numbered lists, code, bold, italic).  The reply is escaped before
+any markup is added, so nothing it contains is ever interpreted as HTML, and
+links are shown with their real address rather than made clickable.
+
+Nothing in here imports Qt and every pattern is compiled once, so replies
+can be rendered on a worker thread.
+"""
+
+import html
+import re
+from dataclasses import dataclass
+
+PREVIEW_CHARS = 2000  # Shown as plain text while a long reply is rendered
+
+_EMOJI_RE = re.compile(
+    "[\u2600-\u27bf\U0001f300-\U0001f64f\U0001f680-\U0001f6ff\U0001f700-\U0001f77f"
+    "\U0001f780-\U0001f7ff\U0001f800-\U0001f8ff\U0001f900-\U0001f9ff\U0001fa00-\U0001fa6f"
+    "\U0001fa70-\U0001faff]+"
+)
+_MARKERS = str.maketrans("", "", "*_`")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_HEADING_RE = re.compile(r"^\s*#{1,6}\s+(.*?)[\s#]*$")
+_RULE_RE = re.compile(r"^\s*([-*_])(?:\s*\1){2,}\s*$")
+_BULLET_RE = re.compile(r"^\s*[-*+•]\s+(.*)$")
+_NUMBERED_RE = re.compile(r"^\s*\d{1,3}[.)]\s+(.*)$")
+_QUOTE_RE = re.compile(r"^\s*>\s?")
+_CODE_SPAN_RE = re.compile(r"`([^`\n]+)`")
+_LINK_RE = re.compile(r"\[([^\]\n]+)\]\(([^)\s]+)\)")
+_BOLD_RE = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*|(?<!\w)__(?=\S)(.+?)(?<=\S)__(?!\w)")
+_ITALIC_RE = re.compile(r"(?<![\w*])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![\w*])|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)")
+_STRAY_RE = re.compile(r"\*+")
+_BLOCK_START_RE = re.compile(r"(?=<(?:p|ul|ol|pre|hr)>)")
+
+
+@dataclass
+class Rendered:
+    display: str  # Plain text, for copying
+    html: str  # Escaped rich text, for painting
+
+
+def strip_emoji(text: str) -> str:
+    return text if text.isascii() else _EMOJI_RE.sub("", text)
+
+
+def clean_bubble_text(text: str) -> str:
+    # Remove *, **, _ and ` markers, and strip emojis
+    return strip_emoji(text.translate(_MARKERS))
+
+
+def _link(match) -> str:
+    label, url = match.group(1), match.group(2)
+    if label == url:
+        return url
+    return f"<u>{label}</u> ({url})"
+
+
+def _format(text: str) -> str:
+    text = html.escape(text)
+    if "[" in text:
+        text = _LINK_RE.sub(_link, text)
+    if "*" in text or "_" in text:
+        text = _BOLD_RE.sub(lambda m: f"<b>{m.group(1) or m.group(2)}</b>", text)
+        text = _ITALIC_RE.sub(lambda m: f"<i>{m.group(1) or m.group(2)}</i>", text)
+        text = _STRAY_RE.sub("", text)
+    return text
+
+
+def _inline(text: str) -> str:
+    if "`" not in text:
+        return _format(text)
+    # Code spans are kept verbatim; odd pieces of the split are their contents
+    pieces = _CODE_SPAN_RE.split(text)
+    return "".join(
+        f"<code>{html.escape(piece)}</code>" if i % 2 else _format(piece).replace("`", "")
+        for i, piece in enumerate(pieces)
+    )
+
+
+def markdown_to_html(text: str) -> str:
+    blocks, lines, items = [], [], []
+    list_tag = None
+    code = None  # Lines of an open ``` block
+
+    def close():
+        nonlocal list_tag
+        if lines:
+            blocks.append("<p>" + "<br>".join(lines) + "</p>")
+            lines.clear()
+        if items:
+            blocks.append(f"<{list_tag}>" + "".join(f"<li>{item}</li>" for item in items) + f"</{list_tag}>")
+            items.clear()
+            list_tag = None
+
+    for line in strip_emoji(text).splitlines():
+        if code is not None:
+            if _FENCE_RE.match(line):
+                blocks.append("<pre>" + html.escape("\n".join(code)) + "</pre>")
+                code = None
+            else:
+                code.append(line)
+            continue
+        if line[:1].isalpha() and not items:
+            lines.append(_inline(line.strip()))  # Plain prose, the common case
+        elif not line.strip():
+            close()
+        elif _FENCE_RE.match(line):
+            close()
+            code = []
+        elif match := _HEADING_RE.match(line):
+            close()
+            blocks.append(f"<p><b>{_inline(match.group(1))}</b></p>")
+        elif _RULE_RE.match(line):
+            close()
+            blocks.append("<hr>")
+        elif match := _BULLET_RE.match(line) or _NUMBERED_RE.match(line):
+            tag = "ul" if match.re is _BULLET_RE else "ol"
+            if tag != list_tag:
+                close()
+                list_tag = tag
+            items.append(_inline(match.group(1)))
+        elif items and line[:1] in (" ", "\t"):
+            items[-1] += "<br>" + _inline(line.strip())  # Continuation of a list item
+        else:
+            if items:
+                close()
+            lines.append(_inline(_QUOTE_RE.sub("", line).strip()))
+    if code is not None:
+        blocks.append("<pre>" + html.escape("\n".join(code)) + "</pre>")
+    close()
+    if len(blocks) == 1 and blocks[0].startswith("<p>"):
+        return blocks[0][3:-4]  # A single paragraph needs no block margins
+    return "".join(blocks)
+
+
+def plain_to_html(text: str) -> str:
+    return html.escape(strip_emoji(text)).replace("\n", "<br>")
+
+
+def render(text: str, markdown: bool = True) -> Rendered:
+    """``markdown`` False shows the text as typed, for the user's own messages."""
+    body = markdown_to_html(text) if markdown else plain_to_html(text)
+    return Rendered(clean_bubble_text(text), body)
+
+
+def html_chunks(html: str, size: int) -> list:
+    """``render`` output split between top-level blocks (lines, for plain
+    text) into pieces of roughly ``size`` characters, for laying out a long
+    text piece by piece."""
+    if html.startswith("<"):
+        pieces, joiner = _BLOCK_START_RE.split(html), ""
+    else:
+        pieces, joiner = html.split("<br>"), "<br>"
+    chunks, current, length = [], [], 0
+    for piece in pieces:
+        if current and length + len(piece) > size:
+            chunks.append(joiner.join(current))
+            current, length = [], 0
+        current.append(piece)
+        length += len(piece)
+    if current:
+        chunks.append(joiner.join(current))
+    return [chunk for chunk in chunks if chunk] or [""]
+
+
+def preview(text: str) -> Rendered:
+    """Cheap stand-in for a long reply until its full rendering is ready."""
+    head = text[:PREVIEW_CHARS] + ("…" if len(text) > PREVIEW_CHARS else "")
+    return Rendered(text, plain_to_html(head))
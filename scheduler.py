@@ -0,0 +1,168 @@
+"""Bounded priority scheduler for network requests.
+
+A fixed set of daemon threads pulls jobs from a priority queue, so rapid
+clicking queues work instead of spawning threads, interactive chat runs ahead
+of screen scans, and shutdown never blocks on a slow request.  Transient API
+failures (429/5xx, dropped connections) are retried with exponential backoff
+and jitter.
+"""
+
+import heapq
+import itertools
+import random
+import sys
+import threading
+import time
+
+import http_pool
+
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BACKGROUND = 0
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+###############################################################################
+# ───────────────────────────────── RETRY ─────────────────────────────────── #
+###############################################################################
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, capped exponential]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, http_pool.HTTPStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    import requests
+
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    # httpx is only loaded when http_pool chose it, so never import it here
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(exc, (httpx.TransportError, httpx.TimeoutException))
+
+
+def call_with_retry(fn, policy: RetryPolicy = None, cancelled: threading.Event = None, retryable=is_retryable):
+    policy = policy or RetryPolicy()
+    cancelled = cancelled or threading.Event()
+    for attempt in range(policy.max_attempts):
+        if cancelled.is_set():
+            raise RequestCancelled()
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt + 1 >= policy.max_attempts or not retryable(exc):
+                raise
+            if cancelled.wait(policy.delay(attempt)):
+                raise RequestCancelled() from None
+
+
+###############################################################################
+# ──────────────────────────────── SCHEDULER ──────────────────────────────── #
+###############################################################################
+
+class Job:
+    def __init__(self, fn, priority: int, on_cancel=None):
+        self.fn = fn
+        self.priority = priority
+        self.on_cancel = on_cancel
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    def cancel(self):
+        if self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        if self.on_cancel is not None:
+            try:
+                self.on_cancel()
+            except Exception:
+                pass
+
+
+class RequestScheduler:
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = set()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"request-worker-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, priority: int = PRIORITY_INTERACTIVE, on_cancel=None) -> Job:
+        job = Job(fn, priority, on_cancel)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is shut down")
+            heapq.heappush(self._heap, (-priority, next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def active(self) -> int:
+        with self._cond:
+            return len(self._running)
+
+    def cancel_all(self):
+        with self._cond:
+            queued = [entry[2] for entry in self._heap]
+            running = list(self._running)
+            self._heap.clear()
+        for job in queued:
+            job.cancel()
+            job.done.set()
+        for job in running:
+            job.cancel()
+
+    def shutdown(self, timeout: float = 1.0):
+        """Cancel everything and wait up to ``timeout`` for running jobs."""
+        with self._cond:
+            self._closed = True
+            running = list(self._running)
+            self._cond.notify_all()
+        self.cancel_all()
+        deadline = time.monotonic() + timeout
+        for job in running:
+            job.done.wait(max(0.0, deadline - time.monotonic()))
+
+    # --- Worker threads ---------------------------------------------------- #
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._heap:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+                if job.cancelled.is_set():
+                    job.done.set()
+                    continue
+                self._running.add(job)
+            try:
+                job.fn()
+            except Exception:
+                pass  # Jobs report their own errors
+            finally:
+                with self._cond:
+                    self._running.discard(job)
+                job.done.set()
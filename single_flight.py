@@ -0,0 +1,75 @@
+"""Collapse identical in-flight requests into one call.
+
+The first caller for a key runs the call; callers arriving with the same key
+while it is running wait for it and receive the same result (or exception)
+instead of spending another round trip and quota.  Nothing is kept once the
+call returns, so this is not a cache.
+"""
+
+import hashlib
+import threading
+
+
+def flight_key(*parts) -> str:
+    """Hash of ``parts`` (str or bytes), e.g. a prompt or screenshot plus config."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = repr(part).encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # Calls answered by another caller's request
+
+    def do(self, key: str, fn):
+        """Returns ``(result, shared)``; ``shared`` is True for callers that
+        waited on someone else's call."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
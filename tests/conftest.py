@@ -0,0 +1,28 @@
+import base64
+import io
+import pathlib
+import sys
+
+import pytest
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+@pytest.fixture
+def screen():
+    """Factory for fake screenshots: ``screen(text, size)`` is a base64 PNG of
+    the text on a white window; ``encoded=False`` gives the PIL image instead."""
+    from PIL import Image, ImageDraw
+
+    def make(text: str = "", size=(800, 400), encoded: bool = True):
+        image = Image.new("RGB", size, "white")
+        ImageDraw.Draw(image).text((40, 40), text, fill="black")
+        if not encoded:
+            return image
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        return base64.b64encode(buf.getvalue()).decode("ascii")
+
+    return make
@@ -0,0 +1,34 @@
+import io
+
+from advisor_cli import BatchRunner, read_jobs
+from advisor_core import GeminiClient
+from backends import Backend, Router
+
+
+def test_read_jobs_reports_bad_lines_with_their_number():
+    src = io.StringIO('{"id": "q1", "prompt": "What is phishing?"}\n"What is MFA?"\n\n[1, 2]\n42\n{oops\n')
+    jobs = list(read_jobs(src))
+    assert jobs[0] == {"id": "q1", "prompt": "What is phishing?"}
+    assert jobs[1] == {"id": "2", "prompt": "What is MFA?"}
+    assert [job["id"] for job in jobs[2:]] == ["4", "5", "6"]
+    assert all("error" in job for job in jobs[2:])
+    assert jobs[2]["error"].startswith("line 4:")
+
+
+def runner_backend(rate=0.0, tpm=0.0):
+    backend = Backend("test")
+    backend.limiter.configure(rpm=30, tpm=1000)  # As set from CYBERGUARD_RPM / CYBERGUARD_TPM
+    BatchRunner(GeminiClient("test-key", router=Router([backend])), rate=rate, tpm=tpm)
+    return backend.limiter
+
+
+def test_runner_keeps_environment_limits_without_flags():
+    limiter = runner_backend()
+    assert limiter.requests.limit == 30
+    assert limiter.tokens.limit == 1000
+
+
+def test_runner_flags_override_limits():
+    limiter = runner_backend(rate=2.0, tpm=500)
+    assert limiter.requests.limit == 120
+    assert limiter.tokens.limit == 500
@@ -0,0 +1,67 @@
+import pytest
+
+from advisor_core import GeminiClient
+from frame_diff import FrameDiffer
+from image_prep import CaptureProcessor
+
+
+class FakeRouter:
+    def __init__(self):
+        self.payloads = []
+        self.fail = False
+
+    def generate(self, payload, **_options):
+        if self.fail:
+            raise RuntimeError("backend down")
+        self.payloads.append(payload)
+        return f"reply {len(self.payloads)}"
+
+
+def client():
+    return GeminiClient("test-key", router=FakeRouter())
+
+
+def test_analyze_image_reuses_only_identical_captures(screen):
+    advisor, processor = client(), CaptureProcessor()
+    assert advisor.analyze_image(screen("hello"), processor=processor) == "reply 1"
+    assert advisor.analyze_image(screen("hello"), processor=processor) == "reply 1"
+    assert advisor.analyze_image(screen("https://evil.example/login"), processor=processor) == "reply 2"
+
+
+def test_analyze_changes_never_reuses_a_verdict_for_new_content(screen):
+    advisor, processor = client(), CaptureProcessor()
+    # Different differs, so each capture counts as a full new frame
+    assert advisor.analyze_changes(screen("hello"), FrameDiffer(), processor=processor) == "reply 1"
+    assert advisor.analyze_changes(screen("https://evil.example"), FrameDiffer(), processor=processor) == "reply 2"
+    assert advisor.analyze_changes(screen("hello"), FrameDiffer(), processor=processor) == "reply 1"
+    assert len(advisor.router.payloads) == 2
+
+
+def test_analyze_changes_sends_changed_regions(screen):
+    advisor, processor, differ = client(), CaptureProcessor(), FrameDiffer()
+    advisor.analyze_changes(screen(""), differ, processor=processor)
+    assert advisor.analyze_changes(screen(""), differ, processor=processor) is None
+    assert advisor.analyze_changes(screen("new text"), differ, processor=processor) == "reply 2"
+    assert len(advisor.router.payloads) == 2
+
+
+def test_failed_analysis_leaves_the_change_for_the_next_frame(screen):
+    advisor, processor, differ = client(), CaptureProcessor(), FrameDiffer()
+    advisor.analyze_changes(screen(""), differ, processor=processor)
+    advisor.router.fail = True
+    with pytest.raises(RuntimeError):
+        advisor.analyze_changes(screen("new text"), differ, processor=processor)
+    advisor.router.fail = False
+    assert advisor.analyze_changes(screen("new text"), differ, processor=processor) == "reply 2"
+
+
+def test_analyze_tiles_resends_only_changed_tiles(screen):
+    advisor, processor = client(), CaptureProcessor(max_size=(300, 200))
+    first = advisor.analyze_image(screen("hello", (900, 600)), processor=processor)
+    tiles = len(advisor.router.payloads)
+    assert tiles > 1
+    assert advisor.analyze_image(screen("hello", (900, 600)), processor=processor) == first
+    assert len(advisor.router.payloads) == tiles
+    # The text sits in the top-left corner, so the far tiles are unchanged
+    advisor.analyze_image(screen("https://evil.example", (900, 600)), processor=processor)
+    assert tiles < len(advisor.router.payloads) < 2 * tiles
@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import threading
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import advisor_core
+from advisor_service import AdvisorService, make_app
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    payloads = []
+
+    def generate(self, payload, **_options):
+        payloads.append(payload)
+        return f"No threats found in request {len(payloads)}. Looks fine."
+
+    monkeypatch.setattr(advisor_core.GeminiClient, "generate", generate)
+    return payloads
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = AdvisorService("test-key", workers=4, cache=ResponseCache(str(tmp_path / "cache.sqlite3")))
+    yield service
+    service.close()
+
+
+def run(service, scenario, token=None):
+    async def main():
+        async with TestClient(TestServer(make_app(service, token=token))) as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+
+def test_sessions_are_issued_by_the_server(service, calls):
+    async def scenario(client):
+        unknown = await client.post("/v1/chat", json={"prompt": "What is a VPN used for?", "session": "alice"})
+        first = await (await client.post("/v1/session")).json()
+        second = await (await client.post("/v1/session")).json()
+        ok = await client.post("/v1/chat", json={"prompt": "What is a VPN used for?", "session": first["session"]})
+        return unknown.status, first["session"], second["session"], ok.status
+
+    unknown, first, second, ok = run(service, scenario)
+    assert unknown == 404
+    assert first != second and len(first) >= 32
+    assert ok == 200
+    assert len(service.sessions.get(first).conversation) == 1
+    assert len(service.sessions.get(second).conversation) == 0
+
+
+def test_scan_verdicts_are_not_shared_between_sessions(service, calls, screen):
+    async def scenario(client):
+        alice = (await (await client.post("/v1/session")).json())["session"]
+        bob = (await (await client.post("/v1/session")).json())["session"]
+        for session, text in ((alice, "private inbox: bank statement"), (bob, "https://evil.example"), (bob, "https://evil.example")):
+            response = await client.post("/v1/scan", json={"image": screen(text), "session": session})
+            assert response.status == 200
+        await client.post("/v1/scan", json={"image": screen("private inbox: bank statement"), "session": bob})
+
+    run(service, scenario)
+    # Bob's repeated scan is his own cache hit; Alice's verdict is never reused for him
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("image", ["not base64!!", base64.b64encode(b"not an image").decode(), 12])
+def test_bad_images_are_rejected(service, calls, image):
+    async def scenario(client):
+        response = await client.post("/v1/scan", json={"image": image})
+        return response.status, await response.json()
+
+    status, body = run(service, scenario)
+    assert status == 400
+    assert "image" in body["error"]
+    assert calls == []
+
+
+def test_bearer_token_is_required(service, calls):
+    async def scenario(client):
+        statuses = []
+        for headers in ({}, {"Authorization": "Bearer wrong"}, {"Authorization": "Bearer ünïcode"},
+                        {"Authorization": "Bearer s3cret"}):
+            statuses.append((await client.post("/v1/session", headers=headers)).status)
+        statuses.append((await client.get("/healthz")).status)
+        return statuses
+
+    assert run(service, scenario, token="s3cret") == [401, 401, 401, 200, 200]
+
+
+def test_cache_lookups_run_off_the_event_loop(service, calls, monkeypatch):
+    lookup_threads = []
+    real_get = service.cache.get
+
+    def get(key):
+        lookup_threads.append(threading.current_thread())
+        return real_get(key)
+
+    monkeypatch.setattr(service.cache, "get", get)
+
+    async def scenario(client):
+        replies = []
+        for _ in range(2):
+            replies.append(await (await client.post("/v1/chat", json={"prompt": "Is it safe to reuse passwords?"})).json())
+        return replies
+
+    first, second = run(service, scenario)
+    assert second.get("cached") and second["response"] == first["response"]
+    assert len(calls) == 1
+    assert threading.main_thread() not in lookup_threads
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+import backends
+from backends import BackendStats, Router
+
+
+class FakeBackend:
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.stats = BackendStats()
+        self.calls = 0
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def generate(self, payload, cancelled=None, **_options):
+        with self._lock:
+            self.calls += 1
+            self.threads.add(threading.current_thread())
+        if cancelled.wait(self.delay):
+            raise backends.RequestCancelled()
+        if self.error is not None:
+            raise self.error
+        return f"{self.name} answer"
+
+
+@pytest.fixture(autouse=True)
+def quick_hedge(monkeypatch):
+    monkeypatch.setattr(backends, "HEDGE_COLD_DELAY", 0.05)
+    monkeypatch.setattr(backends, "_POLL", 0.01)
+
+
+def test_single_backend_is_never_hedged():
+    only = FakeBackend("only", delay=0.3)
+    router = Router([only], hedge=True)
+    assert router.generate({}) == "only answer"
+    assert only.calls == 1
+    assert router.hedges == 0
+    assert only.threads == {threading.current_thread()}
+
+
+def test_slow_backend_is_hedged_to_another():
+    slow, fast = FakeBackend("slow", delay=2.0), FakeBackend("fast")
+    router = Router([slow, fast], hedge=True)
+    started = time.perf_counter()
+    assert router.generate({}) == "fast answer"
+    assert time.perf_counter() - started < 1.0
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+
+
+def test_fails_over_when_the_first_backend_errors():
+    broken, spare = FakeBackend("broken", error=backends.BackendError("boom", 500)), FakeBackend("spare")
+    router = Router([broken, spare], hedge=False)
+    assert router.generate({}) == "spare answer"
+    assert broken.stats.failures == 1
+    assert broken.threads == spare.threads == {threading.current_thread()}
+
+
+def test_cancelled_request_stops_waiting():
+    router = Router([FakeBackend("slow", delay=5.0), FakeBackend("slower", delay=5.0)], hedge=True)
+    cancelled = threading.Event()
+    threading.Timer(0.1, cancelled.set).start()
+    started = time.perf_counter()
+    with pytest.raises(backends.RequestCancelled):
+        router.generate({}, cancelled=cancelled)
+    assert time.perf_counter() - started < 1.0
+
+
+def test_counters_are_exact_under_concurrency():
+    slow, fast = FakeBackend("slow", delay=0.1), FakeBackend("fast")
+    router = Router([slow, fast], hedge=True)
+    threads = [threading.Thread(target=router.generate, args=({},)) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Let hedges still queued on the shared pool run (and see they were cancelled)
+    pool, backends._pool = backends._attempt_pool(), None
+    pool.shutdown(wait=True)
+    assert slow.calls + fast.calls == 16 + router.hedges
+    assert 0 < router.hedge_wins <= router.hedges
@@ -0,0 +1,116 @@
+import json
+import pathlib
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+BENCHMARKS = pathlib.Path(__file__).resolve().parent.parent / "benchmarks"
+sys.path.insert(0, str(BENCHMARKS))
+
+import compare  # noqa: E402
+from _common import result, write_results  # noqa: E402
+from mock_gemini import MockConfig, reply_text, start_server  # noqa: E402
+
+from backends import BackendError, GeminiBackend, OpenAIBackend  # noqa: E402
+from scheduler import RetryPolicy  # noqa: E402
+
+
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(**config):
+        server = start_server(MockConfig(latency_ms=0, jitter_ms=0, chunk_delay_ms=0, seed=1, **config))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def test_reply_text_reaches_the_requested_length():
+    assert reply_text(0) == ""
+    for chars in (1, 100, 600):
+        text = reply_text(chars)
+        assert chars <= len(text) < chars + 80
+        assert text.endswith(".")
+
+
+def test_gemini_backend_against_the_mock(mock_server):
+    server = mock_server(reply_chars=300, chunks=4)
+    backend = GeminiBackend("test-key", "mock-model", host=server.url)
+    partials = []
+    whole = backend.generate({"contents": []})
+    streamed = backend.generate({"contents": []}, stream=True, on_partial=partials.append)
+    assert whole == streamed == reply_text(300)
+    assert len(partials) == 4 and partials[-1] == streamed
+    assert server.stats["requests"] == 2 and server.stats["request_bytes"] > 0
+
+
+def test_openai_backend_against_the_mock(mock_server):
+    server = mock_server(reply_chars=120)
+    backend = OpenAIBackend(f"{server.url}/v1", "mock-model")
+    payload = {"contents": [{"role": "user", "parts": [{"text": "hi"}]}]}
+    assert backend.generate(payload) == backend.generate(payload, stream=True) == reply_text(120)
+
+
+def test_mock_errors_surface_as_backend_errors(mock_server):
+    server = mock_server(error_rate=1.0)
+    backend = GeminiBackend("test-key", "mock-model", host=server.url)
+    with pytest.raises(BackendError) as raised:
+        backend.generate({"contents": []}, retry_policy=RetryPolicy(max_attempts=1))
+    assert raised.value.status_code == 503
+    assert server.stats["errors"] == 1
+
+
+def test_rpm_quota_is_answered_like_gemini(mock_server):
+    server = mock_server(rpm=2)
+    url = f"{server.url}/v1beta/models/mock-model:generateContent"
+    statuses = [post(url, {})[0] for _ in range(2)]
+    status, body = post(url, {})
+    assert statuses == [200, 200] and status == 429
+    assert body["error"]["status"] == "RESOURCE_EXHAUSTED"
+    retry = [d for d in body["error"]["details"] if d["@type"].endswith("RetryInfo")]
+    assert retry and retry[0]["retryDelay"].endswith("s")
+    assert server.stats["rate_limited"] == 1
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {
+        "slower": result("slower", 10.0, "ms"),
+        "steady": result("steady", 10.0, "ms"),
+        "noisy": result("noisy", 0.01, "ms"),
+        "dropped": result("dropped", 5.0, "ms"),
+    }
+    current = {
+        "slower": result("slower", 13.0, "ms"),
+        "steady": result("steady", 11.0, "ms"),
+        "noisy": result("noisy", 0.05, "ms"),
+        "added": result("added", 1.0, "ms"),
+    }
+    rows, regressions = compare.compare(baseline, current, threshold=0.2, min_value=0.1)
+    assert regressions == ["slower"]
+    assert [row[0] for row in rows] == ["slower", "steady", "noisy"]
+
+
+def test_compare_main_exit_code(tmp_path):
+    base, same, worse = (tmp_path / name for name in ("base.json", "same.json", "worse.json"))
+    write_results("micro", [result("encode", 2.0, "ms")], base)
+    write_results("micro", [result("encode", 2.1, "ms")], same)
+    write_results("micro", [result("encode", 3.0, "ms")], worse)
+    assert compare.main([str(base), str(same)]) == 0
+    assert compare.main([str(base), str(worse), "--threshold", "0.2"]) == 1
+    assert compare.main([str(base), str(worse), "--threshold", "0.6"]) == 0
@@ -0,0 +1,62 @@
+from chat_history import ChatHistoryStore
+
+
+def open_store(path, **options):
+    return ChatHistoryStore(path / "history.sqlite3", **options)
+
+
+def test_append_update_and_read_back(tmp_path):
+    store = open_store(tmp_path)
+    handle = store.append("partial", is_user=False)
+    store.update(handle, text="partial reply, now complete", elapsed=1.5)
+    store.flush()
+    (row,) = store.last_page()
+    assert (row.text, row.elapsed, row.is_user) == ("partial reply, now complete", 1.5, False)
+    store.update(handle, kind="scan")  # After the insert committed
+    store.flush()
+    assert store.get(row.id).kind == "scan"
+    store.close()
+
+
+def test_two_instances_never_overwrite_each_other(tmp_path):
+    first, second = open_store(tmp_path), open_store(tmp_path)
+    for i in range(5):
+        first.append(f"first {i}", True)
+        second.append(f"second {i}", True)
+    first.flush()
+    second.flush()
+    texts = sorted(row.text for row in first.last_page(100))
+    assert texts == sorted([f"first {i}" for i in range(5)] + [f"second {i}" for i in range(5)])
+    first.close()
+    second.close()
+
+
+def test_paging_and_search(tmp_path):
+    store = open_store(tmp_path, page_size=3)
+    handles = [store.append(f"message {i} about phishing" if i % 2 else f"message {i}", True) for i in range(7)]
+    store.flush()
+    page = store.last_page()
+    assert [row.text for row in page] == ["message 4", "message 5 about phishing", "message 6"]
+    assert [row.text for row in store.page_before(page[0].id)] == [
+        "message 1 about phishing", "message 2", "message 3 about phishing",
+    ]
+    assert [row.text for row in store.page_before(handles[2])] == ["message 0", "message 1 about phishing"]
+    assert [row.text for row in store.search("phish")] == [
+        "message 5 about phishing", "message 3 about phishing", "message 1 about phishing",
+    ]
+    store.close()
+
+
+def test_purge_removes_saved_and_queued_messages(tmp_path):
+    store = open_store(tmp_path)
+    store.append("my bank password is hunter2", True)
+    store.flush()
+    store.append("still queued", True)
+    store.purge()
+    assert store.last_page() == []
+    assert store.search("hunter2") == []
+    store.append("after the purge", True)
+    store.flush()
+    assert [row.text for row in store.last_page()] == ["after the purge"]
+    store.close()
+    assert b"hunter2" not in (tmp_path / "history.sqlite3").read_bytes()
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+pytest.importorskip("PySide6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QModelIndex, Qt  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+import chatbot  # noqa: E402
+from chat_history import ChatHistoryStore  # noqa: E402
+from chatbot import ChatArea, ChatMessage, ChatModel  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def chat(app):
+    area = ChatArea()
+    area.resize(800, 600)
+    yield area
+    area.shutdown()
+
+
+def test_model_maps_rows_to_messages_across_prepend_and_clear(app):
+    model = ChatModel()
+    first, second = ChatMessage("first", True), ChatMessage("**second**", False)
+    model.append(first)
+    model.append(second)
+    older = [ChatMessage("older", True)]
+    model.prepend(older)
+    assert model.rowCount() == 3
+    assert [model.index(row).data(Qt.DisplayRole) for row in range(3)] == ["older", "first", "second"]
+    assert model.index_of(second).row() == 2
+    assert model.index_of(older[0]).row() == 0
+    model.clear()
+    assert model.rowCount() == 0
+    assert model.index_of(first) == QModelIndex()
+
+
+def test_messages_are_rows_not_widgets(chat):
+    widgets = len(chat.findChildren(object))
+    for i in range(200):
+        chat.add_message(f"message {i}", is_user=i % 2 == 0, kind="system")
+    assert chat.model.rowCount() == 200
+    assert len(chat.findChildren(object)) == widgets
+
+
+def test_update_message_is_coalesced_until_flushed(chat):
+    msg = chat.add_message("", is_user=False, kind="system")
+    chat.update_message(msg, "Partial")
+    chat.update_message(msg, "Partial reply")
+    assert msg.display == ""
+    chat.update_message(msg, "**Full** reply", immediate=True)
+    assert msg.display == "Full reply"
+    assert "<b>Full</b>" in msg.html
+
+
+def test_longer_messages_get_taller_bubbles(chat):
+    short = chat.add_message("One line.", is_user=False, kind="system")
+    long = chat.add_message(" ".join(["A much longer reply."] * 60), is_user=False, kind="system")
+    delegate = chat.view.itemDelegate()
+    heights = [delegate.sizeHint(None, chat.model.index_of(msg)).height() for msg in (short, long)]
+    assert heights[1] > heights[0] > 0
+
+
+def test_copy_selection_copies_the_plain_text(chat):
+    chat.add_message("Is **this** safe?", is_user=True, kind="system")
+    chat.add_message("`Yes`, it is.", is_user=False, kind="system")
+    chat.view.selectAll()
+    chat.copy_selection()
+    assert QApplication.clipboard().text() == "Is this safe?\n\nYes, it is."
+
+
+def test_clear_chat_empties_the_view_but_keeps_history(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(chatbot, "HISTORY_PAGE_SIZE", 5)
+    store = ChatHistoryStore(tmp_path / "history.sqlite3")
+    area = ChatArea(store)
+    for i in range(12):
+        area.add_message(f"saved {i}", is_user=True)
+    area.clear_chat()
+    assert area.model.rowCount() == 0
+    store.flush()
+    area.shutdown()
+
+    reopened = ChatArea(store)
+    assert reopened.load_history() == 5
+    reopened._load_older()
+    texts = [reopened.model.index(row).data(Qt.DisplayRole) for row in range(reopened.model.rowCount())]
+    assert texts == [f"saved {i}" for i in range(2, 12)]
+    reopened.shutdown()
+    store.close()
@@ -0,0 +1,54 @@
+from conversation import SCREENSHOT_NOTE, Conversation, estimate_tokens
+
+
+def chat(turns: int, words: int = 20, **options) -> Conversation:
+    conversation = Conversation(**options)
+    for i in range(turns):
+        conversation.add_turn(f"question {i} " + "word " * words, f"answer {i} " + "word " * words)
+    return conversation
+
+
+def test_short_turns_do_not_need_compaction():
+    assert not chat(12, budget_tokens=3000, recent_turns=4).needs_compaction()
+
+
+def test_compaction_once_over_budget_and_batched():
+    summaries = []
+
+    def summarize(summary, turns):
+        summaries.append(len(turns))
+        return "summary"
+
+    conversation = chat(0, budget_tokens=300, recent_turns=2, summarize=summarize)
+    requests = 0
+    for i in range(30):
+        conversation.add_turn(f"question {i} " + "word " * 20, f"answer {i} " + "word " * 20)
+        if conversation.needs_compaction():
+            conversation.compact()
+            requests += 1
+    assert 0 < requests < 10
+    assert all(count > 1 for count in summaries)
+    assert conversation.summary == "summary"
+
+
+def test_contents_stay_within_budget():
+    conversation = chat(20, budget_tokens=200, recent_turns=2)
+    texts = [part["text"] for content in conversation.contents() for part in content["parts"]]
+    assert sum(estimate_tokens(text) for text in texts) <= 200
+    assert texts[-1].startswith("answer 19")
+
+
+def test_compact_falls_back_to_extractive_summary():
+    def failing(summary, turns):
+        raise RuntimeError("offline")
+
+    conversation = chat(6, recent_turns=2, summarize=failing)
+    conversation.compact()
+    assert len(conversation) == 2
+    assert "question 0" in conversation.summary
+
+
+def test_scans_enter_history_as_text():
+    conversation = Conversation()
+    conversation.add_scan("No threats found.")
+    assert conversation.contents()[0]["parts"][0]["text"] == SCREENSHOT_NOTE
@@ -0,0 +1,90 @@
+from PIL import Image, ImageDraw
+
+from frame_diff import FrameDiffer, _components
+
+
+def frame(*boxes, size=(1280, 720)):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle(box, fill="black")
+    return image
+
+
+def test_first_frame_and_resize_are_full_changes():
+    differ = FrameDiffer()
+    first = differ.update(frame())
+    assert first.significant and first.full_frame
+    assert first.regions == [(0, 0, 1280, 720)]
+    assert differ.update(frame(size=(1920, 1080))).full_frame
+
+
+def test_identical_and_tiny_changes_are_not_significant():
+    differ = FrameDiffer()
+    differ.update(frame())
+    still = differ.update(frame())
+    assert not still.significant and still.changed_fraction == 0.0
+    # A few pixels inside one cell stay under min_changed_cells
+    assert not differ.update(frame((100, 100, 102, 102))).significant
+
+
+def test_changed_area_becomes_a_padded_region():
+    differ = FrameDiffer()
+    differ.update(frame())
+    change = differ.update(frame((400, 200, 600, 300)))
+    assert change.significant and not change.full_frame
+    assert len(change.regions) == 1
+    left, top, right, bottom = change.regions[0]
+    assert left < 400 and top < 200 and right > 600 and bottom > 300
+    assert (right - left) * (bottom - top) < 1280 * 720 / 4
+
+
+def test_separate_changes_stay_separate_until_too_many():
+    differ = FrameDiffer(padding=0)
+    differ.update(frame())
+    apart = differ.update(frame((40, 40, 120, 120), (1100, 560, 1200, 660)))
+    assert len(apart.regions) == 2
+    differ = FrameDiffer(padding=0, max_regions=1)
+    differ.update(frame())
+    merged = differ.update(frame((40, 40, 120, 120), (1100, 560, 1200, 660)))
+    assert len(merged.regions) == 1
+    assert merged.regions[0][0] <= 40 and merged.regions[0][2] >= 1200
+
+
+def test_large_change_sends_the_whole_frame():
+    differ = FrameDiffer()
+    differ.update(frame())
+    change = differ.update(frame((0, 0, 1000, 700)))
+    assert change.full_frame and change.regions == [(0, 0, 1280, 720)]
+
+
+def test_components_join_diagonal_neighbours_and_merge_overlaps():
+    cols, rows = 6, 4
+    changed = [False] * (cols * rows)
+    for row, col in ((0, 0), (1, 1), (3, 5)):
+        changed[row * cols + col] = True
+    assert sorted(_components(changed, cols, rows, padding=0)) == [(0, 0, 2, 2), (5, 3, 6, 4)]
+    # With padding the two boxes overlap and become one
+    assert _components(changed, cols, rows, padding=2) == [(0, 0, 6, 4)]
+
+
+def test_gradual_changes_add_up_against_the_analyzed_frame():
+    differ = FrameDiffer(padding=0)
+    differ.update(frame())
+    # Each tick changes one more cell (40x40 px each), under min_changed_cells
+    # compared with the tick before, but not with the frame last analyzed
+    assert not differ.update(frame((0, 0, 30, 30))).significant
+    change = differ.update(frame((0, 0, 30, 30), (200, 200, 230, 230)))
+    assert change.significant
+    assert len(change.regions) == 2
+    assert not differ.update(frame((0, 0, 30, 30), (200, 200, 230, 230))).significant
+
+
+def test_rollback_keeps_a_change_until_it_is_analyzed():
+    differ = FrameDiffer()
+    differ.update(frame())
+    changed = frame((400, 200, 600, 300))
+    assert differ.update(changed).significant
+    differ.rollback()  # Its analysis failed
+    assert differ.update(changed).significant
+    assert not differ.update(changed).significant
@@ -0,0 +1,55 @@
+import pytest
+
+from advisor_core import summarize_response_short
+from glossary import Glossary, GlossaryEntry, default_glossary
+
+
+def terms(text, glossary=None):
+    return [match.entry.term for match in (glossary or default_glossary()).find(text)]
+
+
+def test_whole_words_leftmost_longest():
+    glossary = Glossary(
+        [
+            GlossaryEntry("Phishing", "tricking people.", aliases=["phish"]),
+            GlossaryEntry("Spear phishing", "targeted phishing."),
+        ]
+    )
+    assert terms("Spear phishing and phish, but not phishy or sphishing.", glossary) == [
+        "Spear phishing", "Phishing",
+    ]
+
+
+def test_matches_offsets_in_the_original_text():
+    text = "Turn on two‑factor authentication today."  # Non-breaking hyphen
+    (match,) = default_glossary().find(text)
+    assert text[match.start:match.end] == "two‑factor authentication"
+
+
+def test_acronyms_match_their_own_case_only():
+    assert terms("Block those IPs; the rat ate the dos and don'ts.") == []
+    assert terms("An IPS and a RAT; a DoS attack.") == [
+        "Intrusion prevention system", "Remote access trojan", "Denial of service",
+    ]
+
+
+def test_answers_simple_questions():
+    glossary = default_glossary()
+    assert glossary.answer("What is a VPN?").startswith("Virtual private network (VPN):")
+    assert glossary.answer("define risk").startswith("Risk:")  # Common words still answer when asked
+    assert glossary.answer("What does MFA stand for?").startswith("Multi-factor")
+    assert glossary.answer("What is the weather like?") is None
+
+
+@pytest.mark.parametrize(
+    "prompt", ["Explain two-factor authentication", "phishing", "explain what a VPN is", "Tell me about ransomware"]
+)
+def test_explain_prompts_and_bare_terms_go_to_the_model(prompt):
+    assert default_glossary().answer(prompt) is None
+
+
+def test_summaries_skip_common_words():
+    summary = summarize_response_short("That domain carries some risk. Keep your password safe and patch often.")
+    assert ":" not in summary
+    summary = summarize_response_short("This looks like phishing. Do not click the link.")
+    assert "Phishing: " in summary
@@ -0,0 +1,125 @@
+import base64
+import json
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from urllib3.connection import HTTPConnection
+
+import http_pool
+import tracing
+
+
+class _Ok(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        reply = json.dumps({"body": body.decode(), "chunked": "Transfer-Encoding" in self.headers}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_traced_connection_keeps_urllib3_address_fallback(monkeypatch):
+    server = HTTPServer(("127.0.0.1", 0), _Ok)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    real_getaddrinfo = socket.getaddrinfo
+    lookups = []
+
+    def getaddrinfo(host, *args, **kwargs):
+        if host != "api.example.test":
+            return real_getaddrinfo(host, *args, **kwargs)
+        lookups.append(host)
+        # Nothing listens on the first address, so only a client that tries
+        # every address reaches the server
+        return [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.2", port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port)),
+        ]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    tracing.tracer.reset()
+    conn = http_pool._traced_connection(HTTPConnection)("api.example.test", port, timeout=5)
+    try:
+        conn.request("GET", "/")
+        assert conn.getresponse().data == b"ok"
+        assert conn._dns_host == "api.example.test"
+        assert lookups == ["api.example.test"]  # Resolved once, not again by urllib3
+    finally:
+        conn.close()
+        server.shutdown()
+    names = {metric["name"] for metric in tracing.tracer.snapshot()}
+    assert {"http.dns", "http.connect"} <= names
+
+
+def test_traced_connection_reports_unresolvable_hosts_like_urllib3(monkeypatch):
+    from urllib3.exceptions import NameResolutionError
+
+    def getaddrinfo(*args, **kwargs):
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    conn = http_pool._traced_connection(HTTPConnection)("nowhere.example.test", 80, timeout=1)
+    with pytest.raises(NameResolutionError):
+        conn.connect()
+
+
+def test_base64_blob_streams_the_same_text(monkeypatch):
+    monkeypatch.setattr(http_pool, "BODY_CHUNK", 8)  # Many chunks, none needing padding
+    raw = os.urandom(100)
+    text = base64.b64encode(raw).decode("ascii")
+    for blob in (http_pool.Base64Blob(bytearray(raw)), http_pool.Base64Blob(text=text)):
+        assert str(blob) == text and len(blob) == len(text)
+        assert blob.head(10)[:10] == raw[:10]
+        assert bytes(blob.decoded()) == raw
+        prefixed = blob.with_prefix("data:image/png;base64,")
+        assert str(prefixed) == "data:image/png;base64," + text and len(prefixed) == len(str(prefixed))
+
+
+def test_raw_blob_is_a_view_of_the_encode_buffer():
+    buf = bytearray(b"frame")
+    blob = http_pool.Base64Blob(buf)
+    buf[0:1] = b"F"
+    assert bytes(blob.decoded()) == b"Frame"
+
+
+def test_payload_with_blobs_streams_the_same_json(monkeypatch):
+    monkeypatch.setattr(http_pool, "BODY_CHUNK", 16)
+    images = [os.urandom(50), os.urandom(7)]
+    payload = {"contents": [{"parts": [{"text": "caf\u00e9"}] + [
+        {"inline_data": {"mime_type": "image/png", "data": http_pool.Base64Blob(raw)}} for raw in images
+    ]}]}
+    expected = json.dumps(payload, default=str).encode("utf-8")
+    body = http_pool._encode(payload)
+    assert isinstance(body, http_pool._StreamedBody)
+    assert len(body) == len(expected) and b"".join(body) == expected
+    assert http_pool._headers(body, None)["Content-Length"] == str(len(expected))
+    pieces = iter(lambda: body.read(5), b"")
+    assert b"".join(pieces) == expected
+    assert http_pool._encode({"text": "plain"}) == b'{"text": "plain"}'
+
+
+def test_streamed_body_is_sent_with_content_length():
+    server = HTTPServer(("127.0.0.1", 0), _Ok)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    raw = os.urandom(200_000)
+    payload = {"image": http_pool.Base64Blob(raw), "note": "x"}
+    try:
+        resp = http_pool.PooledClient().post(f"http://127.0.0.1:{server.server_address[1]}/", json=payload)
+    finally:
+        server.shutdown()
+    echoed = resp.json()
+    assert not echoed["chunked"]
+    assert json.loads(echoed["body"]) == {"image": base64.b64encode(raw).decode("ascii"), "note": "x"}
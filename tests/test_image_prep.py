@@ -0,0 +1,57 @@
+from http_pool import Base64Blob
+from image_prep import CaptureProcessor, content_key, open_b64
+
+
+def test_verdict_is_reused_for_identical_capture(screen):
+    processor = CaptureProcessor()
+    processor.remember(processor.process_image(screen("hello", encoded=False)), "No threats detected.")
+    assert processor.lookup(processor.process_image(screen("hello", encoded=False))) == "No threats detected."
+
+
+def test_text_only_difference_is_not_a_hit(screen):
+    processor = CaptureProcessor()
+    processor.remember(processor.process_image(screen("hello", encoded=False)), "No threats detected.")
+    assert processor.lookup(processor.process_image(screen("https://evil.example/login", encoded=False))) is None
+
+
+def test_passthrough_png_is_keyed_on_what_is_sent(screen):
+    processor = CaptureProcessor()
+    first = processor.process(screen("hello", (200, 100)))
+    assert first.mime_type == "image/png"
+    assert processor.process(screen("hello", (200, 100))).digest == first.digest
+    assert processor.process(screen("hellp", (200, 100))).digest != first.digest
+
+
+def test_prompt_is_part_of_the_key(screen):
+    processor = CaptureProcessor()
+    frame = processor.process_image(screen("hello", encoded=False))
+    processor.remember(frame, "tile reply", prompt="tile 1 of 4")
+    assert processor.lookup(frame) is None
+    assert processor.lookup(frame, prompt="tile 1 of 4") == "tile reply"
+    assert content_key([frame], "a") != content_key([frame, frame], "a")
+
+
+def test_entries_expire_and_are_bounded():
+    processor = CaptureProcessor(recent_frames=2, recent_ttl=60)
+    for key in "abc":
+        processor.remember_key(key, key.upper())
+    assert processor.lookup_key("a") is None
+    assert processor.lookup_key("c") == "C"
+    processor.recent_ttl = -1
+    assert processor.lookup_key("c") is None
+
+
+def test_frames_hold_the_encoded_bytes_not_a_base64_copy(screen):
+    processor = CaptureProcessor()
+    frame = processor.process_image(screen("hello", encoded=False))
+    assert isinstance(frame.data, Base64Blob) and frame.data.text is None
+    assert frame.mime_type == "image/jpeg" and frame.data.head(3) == b"\xff\xd8\xff"
+    assert open_b64(frame.data).size == frame.size
+    assert open_b64(str(frame.data)).size == frame.size
+
+
+def test_passthrough_png_wraps_the_original_text(screen):
+    original = screen("hello", (200, 100))
+    frame = CaptureProcessor().process(original)
+    assert frame.data.text is original
+    assert str(frame.data) == original
@@ -0,0 +1,144 @@
+import pytest
+
+from indicators import DANGER, WARNING, IndicatorEngine
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return IndicatorEngine.load(blocklists=[])
+
+
+def kinds(engine, host):
+    return {(f.kind, f.severity) for f in engine.check_host(host)}
+
+
+@pytest.mark.parametrize(
+    "host",
+    [
+        "www.amazon.com.au", "amazon.co.uk", "google.com.br", "paypal.com.mx", "apple.com.cn",
+        "ups.com.tr", "fedex.com.hk", "mail.google.com", "amazon.fr", "github.com",
+    ],
+)
+def test_brand_sites_are_clean(engine, host):
+    assert engine.check_host(host) == ()
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "Is https://www.amazon.com.au/gp/product/B0 safe?",
+        "Got a receipt from orders@amazon.com.au",
+        "Check https://www.google.com.br/search?q=x",
+    ],
+)
+def test_brand_country_sites_get_no_local_answer(engine, prompt):
+    assert engine.assess(prompt).answer() is None
+
+
+@pytest.mark.parametrize(
+    "host, brand",
+    [
+        ("paypa1.com", "paypal.com"),
+        ("arnazon.com", "amazon.com"),
+        ("аpple.com", "apple.com"),  # Cyrillic a
+        ("xn--pple-43d.com", "apple.com"),  # The same, as punycode
+        ("g00gle.com", "google.com"),
+    ],
+)
+def test_homoglyphs_are_conclusive(engine, host, brand):
+    finding = engine.check_host(host)[0]
+    assert (finding.kind, finding.severity) == ("lookalike", DANGER)
+    assert brand in finding.detail
+
+
+def test_misspelling_is_only_a_warning(engine):
+    assert ("lookalike", WARNING) in kinds(engine, "paypall.com")
+
+
+@pytest.mark.parametrize("host", ["dhi.com", "lrs.gov"])
+def test_ascii_letter_swaps_are_left_to_the_model(engine, host):
+    # Real sites one ASCII letter away from DHL and IRS
+    assert ("lookalike", WARNING) in kinds(engine, host)
+    assert engine.assess(f"Is {host} legit?").answer() is None
+
+
+def test_embedded_brand(engine):
+    assert ("brand-in-host", DANGER) in kinds(engine, "paypal.com.account-check.io")
+    assert ("brand-in-host", DANGER) in kinds(engine, "www.amazon.co.uk.evil.net")
+    # A lone country code may be a suffix the rules don't list
+    assert ("brand-in-host", WARNING) in kinds(engine, "www.amazon.com.be")
+
+
+def test_brand_mention_is_a_warning(engine):
+    assert ("brand-in-host", WARNING) in kinds(engine, "paypal-login.com")
+
+
+def test_detail_wording(engine):
+    (finding,) = engine.check_host("amazon.com.account-check.io")
+    assert "a Amazon" not in finding.detail
+    assert "does not belong to Amazon" in finding.detail
+
+
+def test_idn_and_risky_tld_warnings(engine):
+    assert ("idn", WARNING) in kinds(engine, "xn--mnchen-3ya.de")
+    assert ("risky-tld", WARNING) in kinds(engine, "prize.xyz")
+    assert ("shortener", WARNING) in kinds(engine, "bit.ly")
+
+
+def test_blocklist(engine):
+    assert engine.assess("see malware.testing.google.test/x").conclusive
+    assert engine.assess("44d88612fea8a8f36de82e1278abb02f").answer().startswith("Don't trust this")
+
+
+def test_blocklist_lines_are_refanged():
+    engine = IndicatorEngine({}, ["hxxp://bad[.]example/path", "10.0.0.9", "# comment"])
+    assert engine.assess("go to https://www.bad.example/login").conclusive
+    assert engine.assess("the host 10.0.0.9 asked").conclusive
+
+
+def test_link_text(engine):
+    found = engine.assess("[paypal.com](https://paypal-verify.top/login)").findings
+    assert ("link-text", DANGER) in {(f.kind, f.severity) for f in found}
+    # The same brand under another ending, and click trackers, are not conclusive
+    assert engine.assess("[amazon.com](https://www.amazon.co.uk/x)").findings == []
+    assessment = engine.assess("[news.example.com](https://click.tracker.net/r/1)")
+    assert not assessment.conclusive
+    assert [f.kind for f in assessment.findings] == ["link-text"]
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "[microsoft.com](https://aka.ms/setup)",
+        "[youtube.com](https://youtu.be/dQw4w9WgXcQ)",
+        "[amazon.com](https://amzn.to/3xyz)",
+    ],
+)
+def test_brand_shorteners_match_their_brand(engine, prompt):
+    assert engine.assess(prompt).findings == []
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        '<a href="https://u123.ct.sendgrid.net/ls/click?upn=abc">www.chase.com</a>',
+        "[paypal.com](https://bit.ly/3abc)",
+        "[chase.com](https://nam02.safelinks.protection.outlook.com/?url=x)",
+        "[apple.com](https://example.org/offer)",
+    ],
+)
+def test_link_mismatch_alone_is_not_conclusive(engine, prompt):
+    assessment = engine.assess(prompt)
+    assert ("link-text", WARNING) in {(f.kind, f.severity) for f in assessment.findings}
+    assert assessment.answer() is None
+
+
+def test_sender_headers(engine):
+    assert engine.assess("From: Amazon <no-reply@amazon.com.au>").findings == []
+    found = engine.assess("From: PayPal <service@secure-mail.net>\nReply-To: x@other.org").findings
+    assert {f.kind for f in found} == {"sender", "reply-to"}
+
+
+def test_registrable(engine):
+    assert engine.registrable("login.paypal.co.uk") == "paypal.co.uk"
+    assert engine.registrable("a.b.example.com") == "example.com"
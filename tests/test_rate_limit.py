@@ -0,0 +1,103 @@
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+import rate_limit
+from http_pool import Base64Blob
+from rate_limit import RateLimiter, TokenBucket, estimate_payload_tokens, image_tokens, parse_duration
+from scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestCancelled
+
+
+def test_parse_duration():
+    assert parse_duration("23s") == 23.0
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("150ms") == pytest.approx(0.15)
+    assert parse_duration("2") == 2.0
+    assert parse_duration("soon") is None
+    assert parse_duration(None) is None
+
+
+def test_image_tokens_follow_gemini_tiles(screen):
+    assert image_tokens(screen(size=(300, 200))) == 258
+    assert image_tokens(screen(size=(1920, 1080))) == 258 * 3 * 2
+    assert image_tokens("not an image") == 258 * 4
+
+
+def test_image_tokens_read_only_the_header_of_blobs(screen):
+    data = screen(size=(1920, 1080))
+    raw = base64.b64decode(data)
+    assert image_tokens(Base64Blob(raw)) == image_tokens(Base64Blob(text=data)) == image_tokens(data)
+    payload = {"contents": [{"parts": [{"inline_data": {"data": Base64Blob(raw)}}]}]}
+    assert estimate_payload_tokens(payload) == 258 * 6 + 1
+
+
+def test_payload_tokens_count_text_and_images(screen):
+    payload = {"contents": [{"parts": [{"text": "x" * 400}, {"inline_data": {"data": screen(size=(100, 100))}}]}]}
+    assert estimate_payload_tokens(payload) == 100 + 258 + 1
+
+
+def test_bucket_never_admits_more_than_the_limit_per_minute():
+    bucket = TokenBucket(60)
+    assert bucket.capacity == 6
+    assert bucket.capacity + 60 * bucket.rate <= 60
+    bucket.level = 0.0
+    assert bucket.wait_time(1) == pytest.approx(1 / bucket.rate)
+    # Larger than the bucket: wait for a full bucket rather than forever
+    assert bucket.wait_time(100) == pytest.approx(bucket.capacity / bucket.rate)
+
+
+def test_unlimited_limiter_never_waits():
+    limiter = RateLimiter()
+    assert all(limiter.acquire(tokens=10_000) < 0.05 for _ in range(20))
+
+
+def test_background_requests_leave_the_reserve_to_interactive_ones():
+    limiter = RateLimiter(rpm=6, burst=5)
+    for _ in range(4):
+        limiter.acquire(priority=PRIORITY_BACKGROUND)
+    cancelled = threading.Event()
+    threading.Timer(0.2, cancelled.set).start()
+    # One request is left, but it is the interactive reserve
+    with pytest.raises(RequestCancelled):
+        limiter.acquire(priority=PRIORITY_BACKGROUND, cancelled=cancelled)
+    assert limiter.acquire(priority=PRIORITY_INTERACTIVE) < 0.05
+
+
+def test_configure_only_changes_the_limits_given():
+    limiter = RateLimiter(rpm=30, tpm=1000)
+    limiter.configure(tpm=500)
+    assert limiter.snapshot()["rpm"] == 30
+    assert limiter.snapshot()["tpm"] == 500
+
+
+def test_observe_adopts_server_limits_and_remaining_budget():
+    limiter = RateLimiter()
+    limiter.observe({"X-RateLimit-Limit-Requests": "120", "X-RateLimit-Remaining-Requests": "0"})
+    assert limiter.snapshot()["rpm"] == 120
+    assert limiter.requests.level == 0.0
+
+
+def test_throttled_without_quota_learns_a_lower_limit(monkeypatch):
+    monkeypatch.setattr(rate_limit, "MAX_PAUSE", 0.0)
+    limiter = RateLimiter()
+    for _ in range(10):
+        limiter.acquire()
+    limiter.on_throttled({"Retry-After": "5"})
+    assert limiter.snapshot()["rpm"] == pytest.approx(9.0)
+    assert limiter.throttled == 1
+
+
+def test_throttled_body_sets_the_pause_and_quota():
+    body = json.dumps({"error": {"details": [
+        {"retryDelay": "3s"},
+        {"violations": [{"quotaId": "GenerateContentInputTokensPerModelPerMinute", "quotaValue": "32000"}]},
+    ]}})
+    limiter = RateLimiter(rpm=60)
+    started = time.monotonic()
+    assert limiter.on_throttled({}, body) == 3.0
+    assert limiter.paused_until >= started + 3.0
+    assert limiter.snapshot()["tpm"] == 32000
+    assert limiter.tokens.level == 0.0
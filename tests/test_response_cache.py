@@ -0,0 +1,74 @@
+import time
+
+from response_cache import ResponseCache, cache_key, normalize_prompt
+
+CONFIG = {"temperature": 0.2}
+
+
+def test_keys_normalize_the_prompt_and_cover_what_changes_the_answer():
+    assert normalize_prompt("  What IS   phishing?? ") == "what is phishing"
+    key = cache_key("What is phishing?", "gemini", CONFIG, False)
+    assert key == cache_key("what is  phishing", "gemini", CONFIG, False)
+    assert key != cache_key("What is phishing?", "gemini", CONFIG, True)
+    assert key != cache_key("What is phishing?", "other-model", CONFIG, False)
+    assert key != cache_key("What is phishing?", "gemini", {"temperature": 0.9}, False)
+    assert key != cache_key("What is phishing?", "gemini", CONFIG, False, [{"role": "user"}])
+
+
+def test_memory_tier_is_lru():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"  # b is now the least recently used
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ResponseCache(path)
+    cache.put("k", "answer")
+    cache.close()
+    reopened = ResponseCache(path)
+    assert reopened.get("k") == "answer"
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_entries_expire(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl=60)
+    cache.put("k", "answer")
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("k") is None
+    cache.close()
+
+
+def test_disk_tier_keeps_the_most_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", max_entries=1, max_disk_entries=2)
+    cache.put("a", "1")
+    time.sleep(0.01)
+    cache.put("b", "2")
+    time.sleep(0.01)
+    cache.get("a")  # From disk: a becomes the most recently used
+    time.sleep(0.01)
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    cache.close()
+
+
+def test_clear_forgets_both_tiers(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    cache.put("k", "answer")
+    cache.clear()
+    assert cache.get("k") is None
+    cache.close()
+
+
+def test_unusable_path_falls_back_to_memory(tmp_path):
+    cache = ResponseCache(tmp_path / "missing" / "cache.sqlite3")
+    cache.put("k", "answer")
+    assert cache.get("k") == "answer"
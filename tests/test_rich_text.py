@@ -0,0 +1,54 @@
+from rich_text import clean_bubble_text, html_chunks, markdown_to_html, preview, render
+
+
+def test_reply_markup_is_escaped_before_formatting():
+    html = markdown_to_html('**Warning:** <script>alert("x")</script> & <b>bold</b>')
+    assert "<script>" not in html and "&lt;script&gt;" in html
+    assert "&lt;b&gt;bold&lt;/b&gt;" in html
+    assert html.startswith("<b>Warning:</b>")
+
+
+def test_links_show_their_real_address():
+    html = markdown_to_html("[Log in to your bank](http://evil.example/login)")
+    assert html == "<u>Log in to your bank</u> (http://evil.example/login)"
+    assert "href" not in html
+
+
+def test_blocks():
+    html = markdown_to_html("# Steps\n\n1. Stop\n2. Check the sender\n\n- one\n  more\n* two\n\n---\n```\n<code> *kept*\n```")
+    assert html == (
+        "<p><b>Steps</b></p>"
+        "<ol><li>Stop</li><li>Check the sender</li></ol>"
+        "<ul><li>one<br>more</li><li>two</li></ul>"
+        "<hr>"
+        "<pre>&lt;code&gt; *kept*</pre>"
+    )
+
+
+def test_inline_code_is_verbatim_and_stray_markers_go():
+    assert markdown_to_html("Run `rm -rf *` now *please") == "Run <code>rm -rf *</code> now please"
+    assert markdown_to_html("snake_case_name stays") == "snake_case_name stays"
+    assert markdown_to_html("an _italic_ word") == "an <i>italic</i> word"
+
+
+def test_render_user_text_as_typed():
+    rendered = render("**hi** <there>\nok 🙂", markdown=False)
+    assert rendered.html == "**hi** &lt;there&gt;<br>ok "
+    assert rendered.display == "hi <there>\nok "
+    assert clean_bubble_text("`code` _x_ 🔒") == "code x "
+
+
+def test_html_chunks_split_between_blocks():
+    html = render("# A\n\n" + "\n\n".join(f"Paragraph {i} " + "x" * 50 for i in range(10))).html
+    chunks = html_chunks(html, 200)
+    assert len(chunks) > 1
+    assert "".join(chunks) == html
+    assert all(chunk.startswith("<p>") for chunk in chunks)
+    assert html_chunks("a<br>b<br>c", 1) == ["a", "b", "c"]
+
+
+def test_preview_is_plain_and_truncated():
+    rendered = preview("<b>" + "x" * 3000)
+    assert rendered.html.startswith("&lt;b&gt;")
+    assert rendered.html.endswith("…")
+    assert len(rendered.html) < 2100
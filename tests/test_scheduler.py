@@ -0,0 +1,26 @@
+import sys
+import types
+
+import requests
+
+import http_pool
+import scheduler
+
+
+def test_retryable_errors():
+    assert scheduler.is_retryable(http_pool.HTTPStatusError(429, "slow down"))
+    assert scheduler.is_retryable(http_pool.HTTPStatusError(503, "unavailable"))
+    assert not scheduler.is_retryable(http_pool.HTTPStatusError(400, "bad request"))
+    assert scheduler.is_retryable(requests.ConnectionError())
+    assert not scheduler.is_retryable(ValueError())
+
+
+def test_httpx_transport_errors_are_retryable(monkeypatch):
+    fake = types.ModuleType("httpx")
+    fake.TransportError = type("TransportError", (Exception,), {})
+    fake.TimeoutException = type("TimeoutException", (fake.TransportError,), {})
+    fake.ConnectError = type("ConnectError", (fake.TransportError,), {})
+    monkeypatch.setitem(sys.modules, "httpx", fake)
+    assert scheduler.is_retryable(fake.ConnectError())
+    assert scheduler.is_retryable(fake.TimeoutException())
+    assert not scheduler.is_retryable(ValueError())
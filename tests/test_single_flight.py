@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, flight_key
+
+
+def test_flight_key_separates_parts():
+    assert flight_key("ab", "c") != flight_key("a", "bc")
+    assert flight_key("text", "hi", False) != flight_key("text", "hi", True)
+    assert flight_key("image", b"png") == flight_key("image", b"png")
+
+
+def test_concurrent_callers_share_one_call():
+    flights, release = SingleFlight(), threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    def caller():
+        results.append(flights.do("k", slow))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    while not flights.in_flight("k"):
+        time.sleep(0.001)
+    followers = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flights.shared < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    assert len(flights) == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flights, release = SingleFlight(), threading.Event()
+    errors = []
+
+    def failing():
+        release.wait(5)
+        raise ValueError("boom")
+
+    def caller():
+        try:
+            flights.do("k", failing)
+        except ValueError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=caller) for _ in range(2)]
+    threads[0].start()
+    while not flights.in_flight("k"):
+        time.sleep(0.001)
+    threads[1].start()
+    while flights.shared < 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 2
+    # Nothing is remembered once the call returns
+    assert flights.do("k", lambda: "fresh") == ("fresh", False)
+    with pytest.raises(KeyError):
+        flights.do("x", lambda: {}["missing"])
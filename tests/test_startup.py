@@ -0,0 +1,49 @@
+"""Time to first paint of the desktop app, checked against a budget.
+
+The app runs in a child process on Qt's offscreen platform, with the window
+picker, screenshot worker and TTS engine replaced by empty modules so the
+check needs no display, capture backend or voices.  Raise the budget with
+``CYBERGUARD_STARTUP_BUDGET_MS`` on slow machines.
+"""
+
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+STARTUP_BUDGET_MS = float(os.getenv("CYBERGUARD_STARTUP_BUDGET_MS", "1500"))
+# Imported on first scan, message or menu use, not at startup
+DEFERRED = ("PIL", "image_prep", "frame_diff", "tiling", "glossary", "indicators", "backends", "response_cache")
+
+LAUNCHER = f"""
+import runpy, sys, types
+for name in ("window_select", "screenshot_worker", "tts_engine"):
+    sys.modules[name] = types.ModuleType(name)
+sys.path.insert(0, {str(REPO_ROOT)!r})
+sys.argv = ["chatbot.py", "--startup-budget", sys.argv[1]]
+try:
+    runpy.run_path({str(REPO_ROOT / "chatbot.py")!r}, run_name="__main__")
+finally:
+    print("imported:", ",".join(name for name in {DEFERRED!r} if name in sys.modules), file=sys.stderr)
+"""
+
+
+def test_first_paint_within_budget(tmp_path):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", GEMINI_API_KEY="test-key", CYBERGUARD_TRACE="0")
+    result = subprocess.run(
+        [sys.executable, "-c", LAUNCHER, str(STARTUP_BUDGET_MS)],
+        cwd=tmp_path,  # The chat history and caches are created here
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    report = result.stderr.strip()
+    assert "time to first paint" in report, report
+    assert result.returncode == 0, report
+    assert report.endswith("imported:"), report
@@ -0,0 +1,46 @@
+from tiling import merge_findings, needs_tiling, plan_tiles, split_findings
+
+
+def test_needs_tiling_only_when_shrunk_enough():
+    assert not needs_tiling((1920, 1080), (1600, 1600))
+    assert needs_tiling((5120, 1440), (1600, 1600))
+
+
+def test_single_tile_for_a_small_capture():
+    assert plan_tiles((800, 600), (1024, 1024)) == [(0, 0, 800, 600)]
+
+
+def test_tiles_cover_the_capture_with_overlapping_seams():
+    size, overlap = (5120, 1440), 160
+    tiles = plan_tiles(size, (1024, 1024), overlap=overlap)
+    assert len(tiles) <= 8
+    assert min(left for left, _, _, _ in tiles) == 0 and min(top for _, top, _, _ in tiles) == 0
+    assert max(right for _, _, right, _ in tiles) == 5120
+    assert max(bottom for _, _, _, bottom in tiles) == 1440
+    row = sorted({(left, right) for left, _, right, _ in tiles})
+    for (_, right), (left, _) in zip(row, row[1:]):
+        assert right - left >= overlap
+
+
+def test_tiles_grow_to_stay_within_max_tiles():
+    tiles = plan_tiles((7680, 4320), (1024, 1024), max_tiles=4)
+    assert len(tiles) <= 4
+    assert tiles[0][2] - tiles[0][0] > 1024
+
+
+def test_split_findings_drops_bullets_and_all_clear_lines():
+    reply = "- **Fake login page at paypa1.com**\n2) Urgent payment request\nNo threats found\n\n"
+    assert split_findings(reply) == ["Fake login page at paypa1.com", "Urgent payment request"]
+
+
+def test_merge_findings_removes_duplicates_seen_by_neighbouring_tiles():
+    replies = [
+        "- Suspicious link to paypa1.com/login\n- Urgent payment request",
+        "- Suspicious link to paypa1.com/login page\n- Password field on an unsecured form",
+        "Nothing suspicious here.",
+    ]
+    assert merge_findings(replies) == [
+        "Suspicious link to paypa1.com/login",
+        "Urgent payment request",
+        "Password field on an unsecured form",
+    ]
@@ -0,0 +1,29 @@
+import os
+
+from tts_engine import ClipCache, split_sentences
+
+
+def test_split_sentences_merges_short_ones():
+    chunks = split_sentences("Hi. This is fine. " + "A much longer sentence that stands on its own. End.")
+    assert chunks[0] == "Hi. This is fine. A much longer sentence that stands on its own."
+    assert chunks[-1] == "End."
+
+
+def test_disk_cache_is_capped_and_evicts_least_recently_used(tmp_path):
+    cache = ClipCache(tmp_path, max_memory_clips=0, max_disk_bytes=250)
+    for i, key in enumerate("abc"):
+        cache.put(key, bytes(100))
+        os.utime(tmp_path / f"{key}.mp3", (i, i))
+    # Writing c went over the cap, so the oldest clip went
+    assert sorted(p.stem for p in tmp_path.glob("*.mp3")) == ["b", "c"]
+    assert cache.get("b") is not None  # Played again, so now the newest
+    cache.put("d", bytes(100))
+    assert sorted(p.stem for p in tmp_path.glob("*.mp3")) == ["b", "d"]
+
+
+def test_clear_removes_every_clip(tmp_path):
+    cache = ClipCache(tmp_path)
+    cache.put("a", b"clip")
+    cache.clear()
+    assert cache.get("a") is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,83 @@
+"""Overlapping tiles for captures too large to analyze in one image.
+
+An ultrawide or multi-monitor capture squeezed into one request is downscaled
+until small text such as URLs is unreadable.  Cut into overlapping tiles near
+the model's working resolution instead, every part keeps its detail, the tiles
+can be analyzed in parallel, and anything crossing a seam appears whole in at
+least one tile.  The per-tile findings are merged and deduplicated afterwards.
+"""
+
+import math
+import re
+
+DEFAULT_OVERLAP = 160  # Pixels shared by neighbouring tiles
+DEFAULT_MAX_TILES = 8
+MIN_SCALE = 1.5  # Only tile when one image would be shrunk by at least this factor
+SIMILARITY = 0.6  # Token overlap above which two findings are the same finding
+
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]+|\d+[.)])\s*")
+_NONE_RE = re.compile(r"^\W*(?:no threats?|nothing suspicious|none)\b", re.I)
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9./:@-]*[a-z0-9]|[a-z0-9]")
+
+
+def needs_tiling(size, max_size, min_scale: float = MIN_SCALE) -> bool:
+    width, height = size
+    return max(width / max_size[0], height / max_size[1]) >= min_scale
+
+
+def plan_tiles(size, tile_size, overlap: int = DEFAULT_OVERLAP, max_tiles: int = DEFAULT_MAX_TILES) -> list:
+    """Boxes ``(left, top, right, bottom)`` covering ``size``, row by row.
+
+    Tiles are ``tile_size`` where possible; if that would take more than
+    ``max_tiles``, they grow (and get downscaled when encoded) until it does not.
+    """
+    width, height = size
+    tile_w, tile_h = tile_size
+    while True:
+        cols, rows = _count(width, tile_w, overlap), _count(height, tile_h, overlap)
+        if cols * rows <= max_tiles:
+            break
+        tile_w, tile_h = int(tile_w * 1.25), int(tile_h * 1.25)
+    tile_w, tile_h = min(tile_w, width), min(tile_h, height)
+    return [
+        (left, top, left + tile_w, top + tile_h)
+        for top in _starts(height, tile_h, rows)
+        for left in _starts(width, tile_w, cols)
+    ]
+
+
+def _count(length, tile, overlap):
+    if length <= tile:
+        return 1
+    return math.ceil((length - overlap) / (tile - overlap))
+
+
+def _starts(length, tile, count):
+    # Spread evenly, so every seam overlaps by at least the requested amount
+    if count == 1:
+        return [0]
+    step = (length - tile) / (count - 1)
+    return [round(i * step) for i in range(count)]
+
+
+def split_findings(reply: str) -> list:
+    findings = []
+    for line in reply.splitlines():
+        line = _BULLET_RE.sub("", line).strip().strip("*").strip()
+        if line and not _NONE_RE.match(line):
+            findings.append(line)
+    return findings
+
+
+def merge_findings(replies, similarity: float = SIMILARITY) -> list:
+    """Findings from all ``replies`` in order, dropping ones already reported
+    by another tile (neighbouring tiles see the same link or form)."""
+    kept, seen = [], []
+    for reply in replies:
+        for finding in split_findings(reply):
+            tokens = set(_TOKEN_RE.findall(finding.lower()))
+            if any(len(tokens & other) >= similarity * len(tokens | other) for other in seen):
+                continue
+            kept.append(finding)
+            seen.append(tokens)
+    return kept
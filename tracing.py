@@ -0,0 +1,208 @@
+"""Lightweight latency tracing.
+
+``span(name)`` times a block and ``record(name, value)`` stores a measurement.
+Each metric keeps a bounded window of recent values for rolling p50/p95/p99,
+plus a running count and sum.  Recording is a clock read and a deque append;
+nothing touches disk on the caller's thread.  Exporters run on one background
+thread: a JSON-lines event log and/or a Prometheus node-exporter textfile.
+
+Metric names ending in ``_bytes`` are sizes; everything else is milliseconds.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_WINDOW = 1024  # Recent values kept per metric for percentiles
+DEFAULT_EXPORT_INTERVAL = 10.0
+PROMETHEUS_PREFIX = "cyberguard"
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Metric:
+    __slots__ = ("name", "values", "count", "total")
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    @property
+    def unit(self) -> str:
+        return "bytes" if self.name.endswith("_bytes") else "ms"
+
+    def summary(self) -> dict:
+        values = sorted(self.values)
+        return {
+            "name": self.name,
+            "unit": self.unit,
+            "count": self.count,
+            "sum": self.total,
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+        }
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, _exc, _tb):
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self.name, (time.perf_counter() - self.start) * 1000.0, **self.attrs)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    def __init__(self, window: int = DEFAULT_WINDOW, enabled: bool = True):
+        self.window = window
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._events = deque()  # (timestamp, name, value, attrs) awaiting the JSONL exporter
+        self._jsonl_path = None
+        self._prom_path = None
+        self._interval = DEFAULT_EXPORT_INTERVAL
+        self._exporter = None
+        self._stop = threading.Event()
+
+    # --- Recording --------------------------------------------------------- #
+    def span(self, name: str, **attrs):
+        return _Span(self, name, attrs) if self.enabled else _NO_SPAN
+
+    def record(self, name: str, value: float, **attrs):
+        if not self.enabled:
+            return
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, Metric(name, self.window))
+        metric.values.append(value)
+        metric.count += 1
+        metric.total += value
+        if self._jsonl_path is not None:
+            self._events.append((time.time(), name, value, attrs))
+
+    # --- Reading ----------------------------------------------------------- #
+    def snapshot(self) -> list:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return [metric.summary() for metric in metrics]
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+
+    # --- Export ------------------------------------------------------------ #
+    def configure_export(self, jsonl_path=None, prom_path=None, interval: float = DEFAULT_EXPORT_INTERVAL):
+        self._jsonl_path = jsonl_path or None
+        self._prom_path = prom_path or None
+        self._interval = interval
+        if (self._jsonl_path or self._prom_path) and self._exporter is None:
+            self._exporter = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._exporter.start()
+
+    def flush(self):
+        if self._jsonl_path is not None:
+            self._write_jsonl()
+        if self._prom_path is not None:
+            self._write_prometheus()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._exporter is not None:
+            self._exporter.join(timeout=2.0)
+            self._exporter = None
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def _export_loop(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.flush()
+            except OSError:
+                pass  # Exporting is best effort; a full disk must not stop the app
+
+    def _write_jsonl(self):
+        lines = []
+        while self._events:
+            ts, name, value, attrs = self._events.popleft()
+            event = {"ts": round(ts, 3), "name": name, "value": round(value, 3)}
+            if attrs:
+                event["attrs"] = attrs
+            lines.append(json.dumps(event, default=str))
+        if lines:
+            with open(self._jsonl_path, "a", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + "\n")
+
+    def _write_prometheus(self):
+        lines = []
+        for unit, kind in (("milliseconds", "ms"), ("bytes", "bytes")):
+            family = f"{PROMETHEUS_PREFIX}_{'span' if kind == 'ms' else 'size'}_{unit}"
+            summaries = [s for s in self.snapshot() if s["unit"] == kind]
+            if not summaries:
+                continue
+            lines.append(f"# TYPE {family} summary")
+            for s in summaries:
+                label = 'name="{}"'.format(s["name"].replace("\\", "\\\\").replace('"', '\\"'))
+                for q in ("p50", "p95", "p99"):
+                    lines.append(f'{family}{{{label},quantile="0.{q[1:]}"}} {s[q]:.3f}')
+                lines.append(f"{family}_sum{{{label}}} {s['sum']:.3f}")
+                lines.append(f"{family}_count{{{label}}} {s['count']}")
+        # node-exporter may read at any moment, so replace the file atomically
+        tmp = f"{self._prom_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+        os.replace(tmp, self._prom_path)
+
+
+###############################################################################
+# ─────────────────────────── SHARED INSTANCE ────────────────────────────── #
+###############################################################################
+
+tracer = Tracer()
+
+
+def span(name: str, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def record(name: str, value: float, **attrs):
+    tracer.record(name, value, **attrs)
+
+
+def configure(enabled: bool = True, jsonl_path=None, prom_path=None, interval: float = DEFAULT_EXPORT_INTERVAL):
+    tracer.enabled = enabled
+    tracer.configure_export(jsonl_path, prom_path, interval)
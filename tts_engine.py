@@ -0,0 +1,344 @@
+"""Background text-to-speech pipeline.
+
+Replies are split into sentences that are synthesized concurrently; playback
+starts as soon as the first sentence is ready and the rest follow in order.
+Clips are held in memory (or unique temp files when a player needs a path,
+removed once played), never in a shared output file, and a content-hash cache
+means repeated phrases are synthesized once.  The on-disk part of that cache
+is capped and evicts the least recently played clips first.
+"""
+
+import hashlib
+import io
+import os
+import pathlib
+import platform
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+DEFAULT_CACHE_DIR = pathlib.Path("tts_cache")
+DEFAULT_MEMORY_CLIPS = 128
+DEFAULT_DISK_BYTES = 32 * 1024 * 1024  # Clips kept in the cache directory
+DEFAULT_SYNTH_WORKERS = 3
+MIN_CHUNK_CHARS = 40  # Very short sentences are merged with the next one
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text: str, min_chars: int = MIN_CHUNK_CHARS) -> list:
+    chunks, current = [], ""
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        current = f"{current} {sentence}".strip()
+        if len(current) >= min_chars:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+###############################################################################
+# ─────────────────────────────── SYNTHESIS ───────────────────────────────── #
+###############################################################################
+
+_speak_text_lock = threading.Lock()
+
+
+def default_synthesize(text: str) -> bytes:
+    """Return MP3 bytes for ``text``."""
+    try:
+        from gtts import gTTS
+    except ImportError:
+        gTTS = None
+    if gTTS is not None:
+        buf = io.BytesIO()
+        gTTS(text).write_to_fp(buf)
+        return buf.getvalue()
+    # tts.speak_text always writes tts_output.mp3, so calls must not overlap
+    from tts import speak_text
+
+    with _speak_text_lock:
+        speak_text(text)
+        return pathlib.Path("tts_output.mp3").read_bytes()
+
+
+class ClipCache:
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        max_memory_clips: int = DEFAULT_MEMORY_CLIPS,
+        max_disk_bytes: int = DEFAULT_DISK_BYTES,
+    ):
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir is not None else None
+        self.max_memory_clips = max_memory_clips
+        self.max_disk_bytes = max_disk_bytes
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            clip = self._mem.get(key)
+            if clip is not None:
+                self._mem.move_to_end(key)
+                return clip
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.mp3"
+        try:
+            clip = path.read_bytes()
+            os.utime(path)  # The modification time orders eviction
+        except OSError:
+            return None
+        self._remember(key, clip)
+        return clip
+
+    def put(self, key: str, clip: bytes):
+        self._remember(key, clip)
+        if self.cache_dir is None or len(clip) > self.max_disk_bytes:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_dir / f"{key}.{threading.get_ident()}.tmp"
+            tmp.write_bytes(clip)
+            os.replace(tmp, self.cache_dir / f"{key}.mp3")
+            self._evict()
+        except OSError:
+            pass
+
+    def clear(self):
+        """Forget every clip, in memory and on disk."""
+        with self._lock:
+            self._mem.clear()
+        if self.cache_dir is None:
+            return
+        with self._disk_lock:
+            for path in self.cache_dir.glob("*.mp3"):
+                _remove_quietly(path)
+
+    def _evict(self):
+        # Clips are written after a synthesis round trip, so a directory scan is cheap here
+        with self._disk_lock:
+            clips = []
+            for path in self.cache_dir.glob("*.mp3"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                clips.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in clips)
+            for _, size, path in sorted(clips, key=lambda clip: clip[0]):
+                if total <= self.max_disk_bytes:
+                    break
+                _remove_quietly(path)
+                total -= size
+
+    def _remember(self, key, clip):
+        with self._lock:
+            self._mem[key] = clip
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_memory_clips:
+                self._mem.popitem(last=False)
+
+
+###############################################################################
+# ──────────────────────────────── ENGINE ─────────────────────────────────── #
+###############################################################################
+
+class _Utterance:
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.proc = None
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        self.cancelled.set()
+        with self.lock:
+            if self.proc is not None:
+                try:
+                    self.proc.terminate()
+                except Exception:
+                    pass
+
+
+class TTSEngine:
+    def __init__(
+        self,
+        synthesize=default_synthesize,
+        cache: ClipCache = None,
+        max_workers: int = DEFAULT_SYNTH_WORKERS,
+        on_state=None,
+        on_error=None,
+    ):
+        self.synthesize = synthesize
+        self.cache = cache if cache is not None else ClipCache()
+        self.on_state = on_state  # callable(bool speaking), called from a worker thread
+        self.on_error = on_error  # callable(str), called from a worker thread
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-synth")
+        self._current = None
+        self._lock = threading.Lock()
+
+    def speak(self, text: str):
+        """Start speaking ``text``, interrupting any reply still playing."""
+        chunks = split_sentences(text)
+        if not chunks:
+            return
+        utterance = _Utterance()
+        with self._lock:
+            previous, self._current = self._current, utterance
+        if previous is not None:
+            previous.cancel()
+        futures = [self._pool.submit(self._clip_for, chunk, utterance) for chunk in chunks]
+        threading.Thread(
+            target=self._play, args=(utterance, futures), name="tts-player", daemon=True
+        ).start()
+
+    def stop(self):
+        with self._lock:
+            current, self._current = self._current, None
+        if current is not None:
+            current.cancel()
+
+    def is_speaking(self) -> bool:
+        with self._lock:
+            return self._current is not None
+
+    def shutdown(self):
+        self.stop()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Worker side ------------------------------------------------------- #
+    def _clip_for(self, text: str, utterance: _Utterance):
+        if utterance.cancelled.is_set():
+            return None
+        key = self.cache.key(text)
+        clip = self.cache.get(key)
+        if clip is None:
+            with tracing.span("tts.synthesize"):
+                clip = self.synthesize(text)
+            self.cache.put(key, clip)
+        return clip
+
+    def _clips(self, utterance, futures):
+        for future in futures:
+            if utterance.cancelled.is_set():
+                return
+            clip = future.result()
+            if clip:
+                yield clip
+
+    def _play(self, utterance, futures):
+        self._notify_state(True)
+        try:
+            system = platform.system()
+            if system == "Linux" and shutil.which("mpg123"):
+                self._play_piped(utterance, self._clips(utterance, futures))
+            elif system == "Windows":
+                self._play_windows(utterance, self._clips(utterance, futures))
+            else:
+                player = "afplay" if system == "Darwin" else "mpg123"
+                self._play_files(utterance, self._clips(utterance, futures), player)
+        except Exception as exc:
+            if not utterance.cancelled.is_set() and self.on_error is not None:
+                self.on_error(str(exc))
+        finally:
+            for future in futures:
+                future.cancel()
+            with self._lock:
+                if self._current is utterance:
+                    self._current = None
+                    finished = True
+                else:
+                    finished = self._current is None
+            if finished:
+                self._notify_state(False)
+
+    def _start(self, utterance, args, **kwargs):
+        with utterance.lock:
+            if utterance.cancelled.is_set():
+                return None
+            utterance.proc = subprocess.Popen(args, **kwargs)
+            return utterance.proc
+
+    def _play_piped(self, utterance, clips):
+        # One decoder fed MP3 frames back to back gives gapless playback
+        proc = self._start(
+            utterance, ["mpg123", "-q", "-"], stdin=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        if proc is None:
+            return
+        try:
+            for clip in clips:
+                proc.stdin.write(clip)
+                proc.stdin.flush()
+            proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            return
+        proc.wait()
+
+    def _play_files(self, utterance, clips, player):
+        for clip in clips:
+            path = _write_temp_clip(clip)
+            try:
+                proc = self._start(utterance, [player, path])
+                if proc is None:
+                    return
+                proc.wait()
+            finally:
+                _remove_quietly(path)
+
+    def _play_windows(self, utterance, clips):
+        # MCI plays MP3 without extra packages and, unlike os.startfile, says
+        # when a clip is done, so each temp file is removed after playing
+        import ctypes
+
+        mci = ctypes.windll.winmm.mciSendStringW
+        mode = ctypes.create_unicode_buffer(32)
+        alias = f"cyberguard_tts_{threading.get_ident()}"
+        for clip in clips:
+            path = _write_temp_clip(clip)
+            try:
+                if mci(f'open "{path}" type mpegvideo alias {alias}', None, 0, None):
+                    raise OSError("Windows could not open the voice clip")
+                mci(f"play {alias}", None, 0, None)
+                while not utterance.cancelled.wait(0.05):
+                    mci(f"status {alias} mode", mode, len(mode), None)
+                    if mode.value != "playing":
+                        break
+            finally:
+                mci(f"close {alias}", None, 0, None)
+                _remove_quietly(path)
+            if utterance.cancelled.is_set():
+                return
+
+    def _notify_state(self, speaking: bool):
+        if self.on_state is not None:
+            try:
+                self.on_state(speaking)
+            except Exception:
+                pass
+
+
+def _write_temp_clip(clip: bytes) -> str:
+    fd, path = tempfile.mkstemp(prefix="cyberguard-tts-", suffix=".mp3")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(clip)
+    return path
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass